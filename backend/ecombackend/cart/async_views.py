@@ -0,0 +1,118 @@
+from asgiref.sync import sync_to_async
+from django.db.models import aprefetch_related_objects
+from django.http import JsonResponse
+
+from ecombackend.async_api import AsyncAPIView
+from products import inventory
+from products.models import Product
+from .models import Cart, CartItem
+from .serializers import CartSerializer, CartLineSerializer, CartTotalsSerializer, BulkCartSerializer
+from .views import CART_ITEMS_PREFETCH, parse_quantity, wants_lean
+from . import services
+
+
+# Async versions of cart.views, used when served by ecombackend.asgi
+
+async def mutation_response(request, item, status=200):
+    if wants_lean(request):
+        return JsonResponse({
+            "item": CartLineSerializer(item).data,
+            "cart": CartTotalsSerializer(item.cart).data,
+        }, status=status)
+
+    cart = await Cart.objects.prefetch_related(CART_ITEMS_PREFETCH).aget(pk=item.cart_id)
+    return JsonResponse(CartSerializer(cart).data, status=status)
+
+
+class CartView(AsyncAPIView):
+
+    async def get(self, request):
+        cart, created = await Cart.objects.prefetch_related(CART_ITEMS_PREFETCH).aget_or_create(user=request.user)
+        if created:
+            await aprefetch_related_objects([cart], CART_ITEMS_PREFETCH)
+        return JsonResponse(CartSerializer(cart).data)
+
+
+class CartSummaryView(AsyncAPIView):
+
+    async def get(self, request):
+        cart = await Cart.objects.only("id", "item_count", "total_quantity", "subtotal").filter(user=request.user).afirst()
+        return JsonResponse(CartTotalsSerializer(cart or Cart()).data)
+
+
+class AddToCartView(AsyncAPIView):
+    throttle_scope = "cart"
+
+    async def post(self, request):
+        product_id = request.data.get("product_id")
+        quantity = parse_quantity(request.data.get("quantity", 1))
+
+        if not product_id:
+            return JsonResponse({"error": "product_id is required"}, status=400)
+        if quantity is None:
+            return JsonResponse({"error": "Invalid quantity"}, status=400)
+
+        try:
+            product = await Product.objects.aget(id=product_id, is_active=True)
+        except (Product.DoesNotExist, ValueError):
+            return JsonResponse({"error": "Product not found"}, status=404)
+
+        try:
+            item = await sync_to_async(services.add_item)(request.user, product, quantity)
+        except inventory.OutOfStock as e:
+            return JsonResponse({"error": str(e)}, status=409)
+
+        return await mutation_response(request, item, status=201)
+
+
+# Update quantity
+class UpdateCartItemView(AsyncAPIView):
+    throttle_scope = "cart"
+
+    async def patch(self, request, item_id):
+        quantity = parse_quantity(request.data.get("quantity"))
+
+        if quantity is None:
+            return JsonResponse({"error": "Invalid quantity"}, status=400)
+
+        try:
+            item = await sync_to_async(services.set_quantity)(request.user, item_id, quantity)
+        except CartItem.DoesNotExist:
+            return JsonResponse({"error": "Item not found"}, status=404)
+        except inventory.OutOfStock as e:
+            return JsonResponse({"error": str(e)}, status=409)
+
+        return await mutation_response(request, item)
+
+
+# Remove item
+class RemoveCartItemView(AsyncAPIView):
+    throttle_scope = "cart"
+
+    async def delete(self, request, item_id):
+        try:
+            item = await sync_to_async(services.remove_item)(request.user, item_id)
+        except CartItem.DoesNotExist:
+            return JsonResponse({"error": "Item not found"}, status=404)
+
+        item.quantity = 0  # the line is gone
+        return await mutation_response(request, item)
+
+
+class BulkCartView(AsyncAPIView):
+    throttle_scope = "cart"
+
+    async def post(self, request):
+        serializer = BulkCartSerializer(data=request.data)
+        if not serializer.is_valid():
+            return JsonResponse(serializer.errors, status=400)
+
+        try:
+            cart = await sync_to_async(services.apply_operations)(request.user, serializer.validated_data["operations"])
+        except services.UnknownProducts as e:
+            return JsonResponse({"error": str(e)}, status=404)
+        except inventory.OutOfStock as e:
+            return JsonResponse({"error": str(e)}, status=409)
+
+        await aprefetch_related_objects([cart], CART_ITEMS_PREFETCH)
+        return JsonResponse(CartSerializer(cart).data)
@@ -0,0 +1,151 @@
+import logging
+import re
+import secrets
+from functools import lru_cache
+
+import redis
+from django.conf import settings
+from django.db import transaction
+
+from products import inventory
+from products.models import Product
+from . import services
+
+logger = logging.getLogger(__name__)
+
+# Guest carts live in Redis, not Postgres: one hash per cart token
+# ({product_id: quantity}) that expires GUEST_CART_TTL seconds after its
+# last change. The client keeps the token and sends it back in this header.
+TOKEN_HEADER = "X-Cart-Token"
+KEY_PREFIX = "guestcart:"
+TOKEN_RE = re.compile(r"^[A-Za-z0-9_-]{32}$")
+
+
+@lru_cache(maxsize=None)
+def client():
+    return redis.Redis.from_url(settings.GUEST_CART_REDIS_URL)
+
+
+def ttl():
+    return getattr(settings, "GUEST_CART_TTL", 7 * 24 * 60 * 60)
+
+
+def new_token():
+    return secrets.token_urlsafe(24)
+
+
+def token_from(request):
+    """The request's guest cart token, or None if it is missing or malformed."""
+    token = request.headers.get(TOKEN_HEADER, "")
+    return token if TOKEN_RE.match(token) else None
+
+
+def _key(token):
+    return f"{KEY_PREFIX}{token}"
+
+
+def get_items(token):
+    return {int(product_id): int(quantity) for product_id, quantity in client().hgetall(_key(token)).items()}
+
+
+def has_item(token, product_id):
+    return client().hexists(_key(token), product_id)
+
+
+def add(token, product_id, quantity):
+    """Add to a line and refresh the TTL. Returns the line's new quantity."""
+    pipe = client().pipeline()
+    pipe.hincrby(_key(token), product_id, quantity)
+    pipe.expire(_key(token), ttl())
+    new_quantity, _ = pipe.execute()
+    return new_quantity
+
+
+def set_quantity(token, product_id, quantity):
+    pipe = client().pipeline()
+    pipe.hset(_key(token), product_id, quantity)
+    pipe.expire(_key(token), ttl())
+    pipe.execute()
+
+
+def remove(token, product_id):
+    pipe = client().pipeline()
+    pipe.hdel(_key(token), product_id)
+    pipe.expire(_key(token), ttl())
+    pipe.execute()
+
+
+def _merging_key(token):
+    return f"{KEY_PREFIX}{token}:merging"
+
+
+def claim(token):
+    """
+    Move a guest cart aside for merging and return its items ({} if there is
+    none). RENAME is atomic, so of two concurrent logins only one gets it.
+    """
+    try:
+        client().rename(_key(token), _merging_key(token))
+    except redis.ResponseError:
+        # No such key
+        return {}
+    return {int(product_id): int(quantity) for product_id, quantity in client().hgetall(_merging_key(token)).items()}
+
+
+def unclaim(token):
+    """Put a claimed cart back after a failed merge, unless the guest has started a new one."""
+    client().renamenx(_merging_key(token), _key(token))
+
+
+def forget(token):
+    client().delete(_merging_key(token))
+
+
+def merge_into(user, token):
+    """
+    Move a guest cart into the user's Cart in one bulk operation
+    (services.apply_operations), adding to lines the user already has.
+
+    Lines for products that are gone or inactive are dropped, as are lines
+    whose stock can't be held any more. The guest cart is deleted once the
+    merge has committed; if the merge fails or can't be done at all it is
+    left as it was.
+    Returns the number of lines merged.
+    """
+    items = claim(token)
+    if not items:
+        return 0
+
+    try:
+        merged = _merge(user, token, items)
+    except Exception:
+        unclaim(token)
+        raise
+    if merged is None:
+        # Nothing was merged, keep the cart for the next login
+        unclaim(token)
+        return 0
+    transaction.on_commit(lambda: forget(token))
+    return merged
+
+
+def _merge(user, token, items):
+    active = set(Product.objects.filter(pk__in=items, is_active=True).values_list("pk", flat=True))
+    operations = [
+        {"op": "add", "product_id": product_id, "quantity": quantity}
+        for product_id, quantity in items.items()
+        if product_id in active and quantity > 0
+    ]
+    while operations:
+        try:
+            services.apply_operations(user, operations)
+            break
+        except services.UnknownProducts as e:
+            # Deleted since the query above
+            operations = [op for op in operations if op["product_id"] not in e.product_ids]
+        except inventory.OutOfStock as e:
+            if e.product_id is None:
+                logger.warning("Guest cart %s not merged for user %s: %s", token, user.pk, e)
+                return None
+            operations = [op for op in operations if op["product_id"] != e.product_id]
+    return len(operations)
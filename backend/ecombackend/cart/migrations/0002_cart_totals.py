@@ -0,0 +1,43 @@
+# Generated by Django 6.0 on 2026-10-18 11:20
+
+from django.db import migrations, models
+
+BACKFILL_TOTALS = """
+UPDATE cart_cart AS cart
+SET item_count = totals.item_count, total_quantity = totals.total_quantity, subtotal = totals.subtotal
+FROM (
+    SELECT item.cart_id, COUNT(*) AS item_count, SUM(item.quantity) AS total_quantity,
+           SUM(item.quantity * product.price) AS subtotal
+    FROM cart_cartitem AS item
+    JOIN products_product AS product ON product.id = item.product_id
+    GROUP BY item.cart_id
+) AS totals
+WHERE cart.id = totals.cart_id
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cart', '0001_initial'),
+        ('products', '0006_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cart',
+            name='item_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='cart',
+            name='subtotal',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='cart',
+            name='total_quantity',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunSQL(BACKFILL_TOTALS, migrations.RunSQL.noop),
+    ]
@@ -6,6 +6,11 @@ class Cart(models.Model):
     user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     created_at = models.DateTimeField(auto_now_add = True)
 
+    # Denormalized totals, recalculated by every cart mutation (cart/services.py)
+    item_count = models.PositiveIntegerField(default=0)
+    total_quantity = models.PositiveIntegerField(default=0)
+    subtotal = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
     def __str__(self):
         return f"cart of {self.user.username}"
 
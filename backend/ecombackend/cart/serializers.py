@@ -15,5 +15,52 @@ class  CartSerializer(serializers.ModelSerializer):
     items = CartItemSerializer(many= True,read_only = True)
     class Meta:
         model = Cart 
-        fields = ["id","user","items"]
-        read_only_fields = ["user","items"]
\ No newline at end of file
+        fields = ["id","user","items","item_count","total_quantity","subtotal"]
+        read_only_fields = ["user","items","item_count","total_quantity","subtotal"]
+
+
+# Lean mutation responses (?lean=1): the changed line and the cart totals
+class CartLineSerializer(serializers.ModelSerializer):
+    product_id = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = CartItem
+        fields = ["id", "product_id", "quantity"]
+
+
+# Also the /summary/ response, read from the cart row alone
+class CartTotalsSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Cart
+        fields = ["id", "item_count", "total_quantity", "subtotal"]
+
+
+class CartOperationSerializer(serializers.Serializer):
+    op = serializers.ChoiceField(choices=["add", "set", "remove"])
+    product_id = serializers.IntegerField()
+    quantity = serializers.IntegerField(min_value=1, required=False)
+
+    def validate(self, attrs):
+        if attrs["op"] == "add":
+            attrs.setdefault("quantity", 1)
+        elif attrs["op"] == "set" and "quantity" not in attrs:
+            raise serializers.ValidationError({"quantity": "This field is required for 'set'."})
+        return attrs
+
+
+class BulkCartSerializer(serializers.Serializer):
+    operations = CartOperationSerializer(many=True, allow_empty=False, max_length=100)
+
+
+# Guest carts (cart/guest.py) are plain dicts, not model rows
+class GuestCartItemSerializer(serializers.Serializer):
+    product = ProductSerializer(read_only=True)
+    quantity = serializers.IntegerField()
+
+
+class GuestCartSerializer(serializers.Serializer):
+    token = serializers.CharField()
+    items = GuestCartItemSerializer(many=True)
+    item_count = serializers.IntegerField()
+    total_quantity = serializers.IntegerField()
+    subtotal = serializers.DecimalField(max_digits=12, decimal_places=2)
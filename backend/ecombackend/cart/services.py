@@ -0,0 +1,252 @@
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from products import inventory
+from products.models import Product
+from .models import Cart, CartItem
+
+# Single-line cart mutations are single statements (upserts / RETURNING) so concurrent
+# requests on the same cart line can't lose updates, and the caller gets the
+# changed line back without reading the cart again.
+#
+# Every mutation locks the cart row in its first statement and finishes with
+# recalculate(), so the denormalized totals on Cart always include every
+# committed line.
+
+CART_TABLE = Cart._meta.db_table
+ITEM_TABLE = CartItem._meta.db_table
+PRODUCT_TABLE = Product._meta.db_table
+
+
+def _line(row):
+    item_id, cart_id, product_id, quantity = row
+    return CartItem(id=item_id, cart_id=cart_id, product_id=product_id, quantity=quantity)
+
+
+def recalculate(cart_ids):
+    """
+    Recompute item_count, total_quantity and subtotal of the given carts
+    from their lines in one UPDATE. Returns {cart_id: Cart} with the totals.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            UPDATE {CART_TABLE} AS cart
+            SET item_count = totals.item_count,
+                total_quantity = totals.total_quantity,
+                subtotal = totals.subtotal
+            FROM (
+                SELECT c.id, COUNT(item.id) AS item_count,
+                       COALESCE(SUM(item.quantity), 0) AS total_quantity,
+                       COALESCE(SUM(item.quantity * product.price), 0) AS subtotal
+                FROM {CART_TABLE} AS c
+                LEFT JOIN {ITEM_TABLE} AS item ON item.cart_id = c.id
+                LEFT JOIN {PRODUCT_TABLE} AS product ON product.id = item.product_id
+                WHERE c.id = ANY(%s)
+                GROUP BY c.id
+            ) AS totals
+            WHERE cart.id = totals.id
+            RETURNING cart.id, cart.user_id, cart.item_count, cart.total_quantity, cart.subtotal
+            """,
+            [list(cart_ids)],
+        )
+        return {
+            row[0]: Cart(id=row[0], user_id=row[1], item_count=row[2], total_quantity=row[3], subtotal=row[4])
+            for row in cursor.fetchall()
+        }
+
+
+def refresh_carts_with(product_ids):
+    """
+    Recalculate every cart holding one of `product_ids`, e.g. after their
+    price changed. Locks carts, so don't call it while holding product
+    row locks: run it after the product change commits (transaction.on_commit).
+    """
+    with transaction.atomic():
+        cart_ids = set(
+            Cart.objects.select_for_update(of=("self",))
+            .filter(items__product_id__in=product_ids)
+            .order_by("pk")
+            .values_list("id", flat=True)
+        )
+        if cart_ids:
+            recalculate(cart_ids)
+
+
+def refresh_carts(cart_ids):
+    """Lock and recalculate the given carts, e.g. after lines were cascade-deleted with a product."""
+    with transaction.atomic():
+        locked = list(
+            Cart.objects.select_for_update()
+            .filter(pk__in=cart_ids)
+            .order_by("pk")
+            .values_list("id", flat=True)
+        )
+        if locked:
+            recalculate(locked)
+
+
+def add_item(user, product, quantity):
+    """
+    Add `quantity` of `product` to the user's cart, holding stock.
+
+    The cart is upserted and locked first, then stock is held, then the
+    line is upserted (`ON CONFLICT (cart, product) DO UPDATE quantity =
+    quantity + n`), the lock order checkout uses (products.inventory).
+    Returns the changed CartItem, its `cart` carries the new totals.
+    """
+    if quantity < 1:
+        raise ValueError(f"Cannot add {quantity} units, the quantity must be at least 1")
+
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                INSERT INTO {CART_TABLE} (user_id, created_at, item_count, total_quantity, subtotal)
+                VALUES (%s, %s, 0, 0, 0)
+                ON CONFLICT (user_id) DO UPDATE SET user_id = EXCLUDED.user_id
+                RETURNING id
+                """,
+                [user.pk, timezone.now()],
+            )
+            cart_id = cursor.fetchone()[0]
+
+        inventory.reserve(user, product, quantity)
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                INSERT INTO {ITEM_TABLE} (cart_id, product_id, quantity)
+                VALUES (%s, %s, %s)
+                ON CONFLICT (cart_id, product_id) DO UPDATE
+                SET quantity = {ITEM_TABLE}.quantity + EXCLUDED.quantity
+                RETURNING id, cart_id, product_id, quantity
+                """,
+                [cart_id, product.pk, quantity],
+            )
+            item = _line(cursor.fetchone())
+
+        item.cart = recalculate([item.cart_id])[item.cart_id]
+        return item
+
+
+def set_quantity(user, item_id, quantity):
+    """
+    Change one of the user's cart lines to `quantity`, holding or releasing
+    the difference. Raises CartItem.DoesNotExist.
+    """
+    with transaction.atomic():
+        # Cart first, then the line (see products.inventory), so concurrent
+        # updates of the line see each other's quantity
+        cart = Cart.objects.select_for_update().only("id").filter(user=user).first()
+        item = (
+            CartItem.objects.select_for_update(of=("self",))
+            .select_related("product")
+            .get(id=item_id, cart=cart)
+        )
+
+        delta = quantity - item.quantity
+        if delta > 0:
+            inventory.reserve(user, item.product, delta)
+        elif delta < 0:
+            inventory.release(user, item.product_id, -delta)
+
+        CartItem.objects.filter(pk=item.pk).update(quantity=quantity)
+        item.quantity = quantity
+        item.cart = recalculate([item.cart_id])[item.cart_id]
+        return item
+
+
+def remove_item(user, item_id):
+    """Delete one of the user's cart lines and its hold. Raises CartItem.DoesNotExist."""
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                WITH cart AS (SELECT id FROM {CART_TABLE} WHERE user_id = %s FOR UPDATE)
+                DELETE FROM {ITEM_TABLE} AS item USING cart
+                WHERE item.id = %s AND item.cart_id = cart.id
+                RETURNING item.id, item.cart_id, item.product_id, item.quantity
+                """,
+                [user.pk, item_id],
+            )
+            row = cursor.fetchone()
+        if row is None:
+            raise CartItem.DoesNotExist("Item not found")
+
+        item = _line(row)
+        inventory.release(user, item.product_id)
+        item.cart = recalculate([item.cart_id])[item.cart_id]
+        return item
+
+
+class UnknownProducts(Exception):
+    def __init__(self, product_ids):
+        self.product_ids = sorted(product_ids)
+        super().__init__(f"Products not found: {', '.join(map(str, self.product_ids))}")
+
+
+def apply_operations(user, operations):
+    """
+    Apply a list of {"op": "add" | "set" | "remove", "product_id", "quantity"}
+    to the user's cart in one transaction, in order. Returns the cart.
+
+    Products are validated with one query (inactive ones count as unknown
+    unless they're only removed), lines are written with bulk_create /
+    bulk_update / one DELETE and stock holds are adjusted in one go
+    (inventory.adjust). Raises UnknownProducts or OutOfStock and leaves
+    the cart untouched.
+    """
+    product_ids = {op["product_id"] for op in operations}
+    # Inactive products can still be taken out of the cart, not put in
+    adding = {op["product_id"] for op in operations if op["op"] != "remove"}
+    with transaction.atomic():
+        products = (
+            Product.objects.filter(Q(is_active=True) | ~Q(pk__in=adding))
+            .only("id", "title", "stock", "reserved")
+            .in_bulk(product_ids)
+        )
+        if len(products) != len(product_ids):
+            raise UnknownProducts(product_ids - products.keys())
+
+        # The cart row lock serializes this with single-item adds on the same cart
+        cart, created = Cart.objects.select_for_update().get_or_create(user=user)
+        lines = {item.product_id: item for item in CartItem.objects.filter(cart=cart)}
+
+        quantities = {product_id: item.quantity for product_id, item in lines.items()}
+        for op in operations:
+            product_id = op["product_id"]
+            if op["op"] == "add":
+                quantities[product_id] = quantities.get(product_id, 0) + op["quantity"]
+            elif op["op"] == "set":
+                quantities[product_id] = op["quantity"]
+            else:
+                quantities[product_id] = 0
+
+        deltas = {}
+        new_lines, changed_lines, removed_ids = [], [], []
+        for product_id, quantity in quantities.items():
+            line = lines.get(product_id)
+            current = line.quantity if line else 0
+            if quantity == current:
+                continue
+            deltas[products[product_id]] = quantity - current
+
+            if line is None:
+                new_lines.append(CartItem(cart=cart, product_id=product_id, quantity=quantity))
+            elif quantity == 0:
+                removed_ids.append(line.pk)
+            else:
+                line.quantity = quantity
+                changed_lines.append(line)
+
+        inventory.adjust(user, deltas)
+        CartItem.objects.bulk_create(new_lines)
+        CartItem.objects.bulk_update(changed_lines, ["quantity"])
+        if removed_ids:
+            CartItem.objects.filter(pk__in=removed_ids).delete()
+
+        totals = recalculate([cart.pk])[cart.pk]
+        cart.item_count, cart.total_quantity, cart.subtotal = totals.item_count, totals.total_quantity, totals.subtotal
+    return cart
@@ -0,0 +1,45 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from products.models import Product
+from . import services
+from .models import CartItem
+
+
+# Cart subtotals depend on product prices. The carts are refreshed once the
+# product change commits: locking them while the product row is locked
+# would invert checkout's cart -> product lock order (products.inventory).
+
+def saves_price(instance, update_fields):
+    return instance.pk is not None and (update_fields is None or "price" in update_fields)
+
+
+@receiver(pre_save, sender=Product)
+def remember_price(sender, instance, update_fields=None, raw=False, **kwargs):
+    # Stock edits, is_active toggles and image uploads save the price unchanged
+    if not raw and saves_price(instance, update_fields):
+        instance._saved_price = Product.objects.filter(pk=instance.pk).values_list("price", flat=True).first()
+
+
+@receiver(post_save, sender=Product)
+def refresh_cart_totals(sender, instance, created, update_fields=None, raw=False, **kwargs):
+    if created or raw or not saves_price(instance, update_fields):
+        return
+    previous = getattr(instance, "_saved_price", None)
+    if previous is None or previous == instance.price:
+        return
+    transaction.on_commit(lambda: services.refresh_carts_with([instance.pk]))
+
+
+@receiver(pre_delete, sender=Product)
+def remember_carts(sender, instance, **kwargs):
+    # The lines are cascade-deleted with the product, note their carts first
+    instance._cart_ids = list(CartItem.objects.filter(product=instance).values_list("cart_id", flat=True))
+
+
+@receiver(post_delete, sender=Product)
+def refresh_cart_totals_after_delete(sender, instance, **kwargs):
+    cart_ids = getattr(instance, "_cart_ids", None)
+    if cart_ids:
+        transaction.on_commit(lambda: services.refresh_carts(cart_ids))
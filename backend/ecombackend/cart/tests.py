@@ -1,3 +1,249 @@
-from django.test import TestCase
+import json
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.db import DatabaseError
+from django.test import AsyncRequestFactory, RequestFactory, TestCase
+from rest_framework.test import APIClient
+
+from ecombackend import throttling
+from ecombackend.testing import QueryCountMixin, require_redis, reset_throttles
+from products import inventory
+from products.models import Category, Product
+from products.tests import make_product
+from users.models import User
+from users.serializers import CustomTokenObtainPairSerializer
+from . import async_views, guest, services, views
+from .models import Cart, CartItem
+
+
+class CartQueryTests(QueryCountMixin, TestCase):
+
+    def setUp(self):
+        reset_throttles()
+        self.owner = User.objects.create_user(username="owner")
+        self.user = User.objects.create_user(username="alice")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        for index in range(2):
+            services.add_item(self.user, make_product(self.owner, title=f"Widget {index}"), 1)
+
+    def test_cart_queries_do_not_grow_with_its_lines(self):
+        def grow():
+            for index in range(3):
+                category = Category.objects.create(name=f"Category {index}", slug=f"category-{index}")
+                seller = User.objects.create_user(username=f"seller{index}")
+                services.add_item(self.user, make_product(seller, title=f"Gadget {index}", category=category), 2)
+
+        self.assertConstantQueries(self.client, "/api/cart/", grow)
+
+    def test_summary_reads_the_cart_row_only(self):
+        self.assertMaxQueries(1, self.client, "/api/cart/summary/")
+
+
+class AddItemTests(TestCase):
+
+    def setUp(self):
+        self.owner = User.objects.create_user(username="owner")
+        self.user = User.objects.create_user(username="alice")
+        self.product = make_product(self.owner, stock=5, price="2.50")
+
+    def test_adding_a_product_again_adds_to_its_line(self):
+        services.add_item(self.user, self.product, 2)
+        item = services.add_item(self.user, self.product, 1)
+
+        self.assertEqual(item.quantity, 3)
+        self.assertEqual(CartItem.objects.get(cart__user=self.user).quantity, 3)
+        self.assertEqual((item.cart.item_count, item.cart.total_quantity, item.cart.subtotal), (1, 3, Decimal("7.50")))
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.reserved, 3)
+
+    def test_first_add_creates_the_cart(self):
+        item = services.add_item(self.user, self.product, 1)
+
+        cart = Cart.objects.get(user=self.user)
+        self.assertEqual(item.cart_id, cart.pk)
+        self.assertEqual(cart.subtotal, Decimal("2.50"))
+
+    def test_add_beyond_stock_changes_nothing(self):
+        services.add_item(self.user, self.product, 4)
+
+        with self.assertRaises(inventory.OutOfStock):
+            services.add_item(self.user, self.product, 2)
+
+        cart = Cart.objects.get(user=self.user)
+        self.assertEqual(cart.items.get().quantity, 4)
+        self.assertEqual(cart.total_quantity, 4)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.reserved, 4)
+
+    def test_quantity_must_be_positive(self):
+        with self.assertRaises(ValueError):
+            services.add_item(self.user, self.product, 0)
+        self.assertFalse(CartItem.objects.exists())
+
+    def test_add_view_rejects_invalid_quantities(self):
+        reset_throttles()
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        for quantity in (0, -1, "two", None):
+            response = client.post("/api/cart/add/", {"product_id": self.product.pk, "quantity": quantity}, format="json")
+            self.assertEqual(response.status_code, 400, quantity)
+        self.assertFalse(CartItem.objects.exists())
+
+    def test_add_view_only_finds_active_products(self):
+        reset_throttles()
+        client = APIClient()
+        client.force_authenticate(self.user)
+        Product.objects.filter(pk=self.product.pk).update(is_active=False)
+
+        for product_id in (self.product.pk, 999999, "abc"):
+            response = client.post("/api/cart/add/", {"product_id": product_id}, format="json")
+            self.assertEqual(response.status_code, 404, product_id)
+            self.assertEqual(response.data, {"error": "Product not found"})
+        self.assertFalse(CartItem.objects.exists())
+
+
+class ApplyOperationsTests(TestCase):
+
+    def setUp(self):
+        self.owner = User.objects.create_user(username="owner")
+        self.user = User.objects.create_user(username="alice")
+        self.shirt = make_product(self.owner, stock=5, title="Shirt")
+        self.socks = make_product(self.owner, stock=5, title="Socks")
+
+    def test_inactive_products_cannot_be_added_or_set(self):
+        Product.objects.filter(pk=self.socks.pk).update(is_active=False)
+
+        for op in ("add", "set"):
+            with self.assertRaises(services.UnknownProducts) as raised:
+                services.apply_operations(self.user, [
+                    {"op": "add", "product_id": self.shirt.pk, "quantity": 1},
+                    {"op": op, "product_id": self.socks.pk, "quantity": 1},
+                ])
+            self.assertEqual(raised.exception.product_ids, [self.socks.pk])
+        self.assertFalse(CartItem.objects.exists())
+
+    def test_inactive_products_can_be_removed(self):
+        services.add_item(self.user, self.socks, 2)
+        Product.objects.filter(pk=self.socks.pk).update(is_active=False)
+
+        cart = services.apply_operations(self.user, [{"op": "remove", "product_id": self.socks.pk}])
+
+        self.assertEqual((cart.item_count, cart.total_quantity), (0, 0))
+        self.socks.refresh_from_db()
+        self.assertEqual(self.socks.reserved, 0)
+
+
+class GuestMergeTests(TestCase):
+
+    def setUp(self):
+        require_redis(self, guest.client())
+        self.owner = User.objects.create_user(username="owner")
+        self.user = User.objects.create_user(username="alice")
+        self.token = guest.new_token()
+        self.addCleanup(guest.client().delete, guest._key(self.token), guest._merging_key(self.token))
+
+    def lines(self):
+        return dict(CartItem.objects.filter(cart__user=self.user).values_list("product__title", "quantity"))
+
+    def test_merge_adds_to_the_user_cart_and_deletes_the_guest_cart(self):
+        shirt, socks = make_product(self.owner, title="Shirt"), make_product(self.owner, title="Socks")
+        services.add_item(self.user, shirt, 1)
+        guest.add(self.token, shirt.pk, 2)
+        guest.add(self.token, socks.pk, 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            merged = guest.merge_into(self.user, self.token)
+
+        self.assertEqual(merged, 2)
+        self.assertEqual(self.lines(), {"Shirt": 3, "Socks": 1})
+        self.assertEqual(guest.get_items(self.token), {})
+        self.assertFalse(guest.client().exists(guest._merging_key(self.token)))
+
+    def test_merge_drops_lines_it_cannot_take(self):
+        shirt = make_product(self.owner, title="Shirt")
+        hidden = make_product(self.owner, title="Hidden")
+        Product.objects.filter(pk=hidden.pk).update(is_active=False)
+        scarce = make_product(self.owner, title="Scarce", stock=1)
+        guest.add(self.token, shirt.pk, 1)
+        guest.add(self.token, hidden.pk, 1)
+        guest.add(self.token, scarce.pk, 3)
+        guest.add(self.token, 999999, 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            merged = guest.merge_into(self.user, self.token)
+
+        self.assertEqual(merged, 1)
+        self.assertEqual(self.lines(), {"Shirt": 1})
+
+    def test_failed_merge_keeps_the_guest_cart(self):
+        shirt = make_product(self.owner, title="Shirt")
+        guest.add(self.token, shirt.pk, 2)
+
+        with mock.patch.object(services, "apply_operations", side_effect=DatabaseError("down")):
+            with self.assertRaises(DatabaseError):
+                guest.merge_into(self.user, self.token)
+
+        self.assertEqual(guest.get_items(self.token), {shirt.pk: 2})
+        self.assertEqual(self.lines(), {})
+
+    def test_merge_that_cannot_be_done_keeps_the_guest_cart(self):
+        shirt = make_product(self.owner, title="Shirt")
+        guest.add(self.token, shirt.pk, 2)
+        retry = inventory.OutOfStock(None, "Stock changed during the update, please retry")
+
+        with mock.patch.object(services, "apply_operations", side_effect=retry):
+            with self.assertLogs("cart.guest", "WARNING"), self.captureOnCommitCallbacks(execute=True):
+                merged = guest.merge_into(self.user, self.token)
+
+        self.assertEqual(merged, 0)
+        self.assertEqual(guest.get_items(self.token), {shirt.pk: 2})
+
+
+class AsyncViewTests(TestCase):
+    """The async views (ecombackend/async_api.py) turn requests away like the DRF ones."""
+
+    def setUp(self):
+        reset_throttles()
+        self.user = User.objects.create_user(username="alice")
+        self.product = make_product(self.user)
+        self.token = str(CustomTokenObtainPairSerializer.get_token(self.user).access_token)
+
+    def request(self, factory, headers):
+        return factory.post(
+            "/api/cart/add/", {"product_id": self.product.pk}, content_type="application/json", headers=headers,
+        )
+
+    def answer(self, response):
+        return response.status_code, json.loads(response.content), response.get("WWW-Authenticate"), response.get("Retry-After")
+
+    async def both(self, headers):
+        response = await sync_to_async(views.AddToCartView.as_view())(self.request(RequestFactory(), headers))
+        sync = self.answer(response.render())
+        response = await async_views.AddToCartView.as_view()(self.request(AsyncRequestFactory(), headers))
+        return sync, self.answer(response)
+
+    async def test_unauthenticated_requests_are_rejected(self):
+        for headers in ({}, {"Authorization": "Bearer not-a-token"}):
+            sync, answer = await self.both(headers)
+            self.assertEqual(sync[0], 401)
+            self.assertEqual(answer, sync)
+
+    async def test_throttled_requests_are_rejected(self):
+        with mock.patch.object(throttling, "take", return_value=(False, 30)):
+            sync, answer = await self.both({"Authorization": f"Bearer {self.token}"})
+
+        self.assertEqual(sync[0], 429)
+        self.assertEqual(sync[3], "30")
+        self.assertEqual(answer, sync)
+        self.assertFalse(await CartItem.objects.aexists())
+
+    async def test_authenticated_requests_go_through(self):
+        sync, answer = await self.both({"Authorization": f"Bearer {self.token}"})
+
+        self.assertEqual((sync[0], answer[0]), (201, 201))
+        item = await CartItem.objects.aget()
+        self.assertEqual(item.quantity, 2)
@@ -1,9 +1,21 @@
+from django.conf import settings
 from django.urls import path
-from .views import CartView, AddToCartView, UpdateCartItemView, RemoveCartItemView
+from .views import GuestCartView, GuestAddToCartView, GuestUpdateCartItemView, GuestRemoveCartItemView
+
+if settings.ASYNC_API_VIEWS:
+    from . import async_views as views
+else:
+    from . import views
 
 urlpatterns = [
-    path("", CartView.as_view()),
-    path("add/", AddToCartView.as_view()),
-    path("update/<int:item_id>/", UpdateCartItemView.as_view()),
-    path("remove/<int:item_id>/", RemoveCartItemView.as_view()),
+    path("", views.CartView.as_view()),
+    path("summary/", views.CartSummaryView.as_view()),
+    path("add/", views.AddToCartView.as_view()),
+    path("update/<int:item_id>/", views.UpdateCartItemView.as_view()),
+    path("remove/<int:item_id>/", views.RemoveCartItemView.as_view()),
+    path("bulk/", views.BulkCartView.as_view()),
+    path("guest/", GuestCartView.as_view()),
+    path("guest/add/", GuestAddToCartView.as_view()),
+    path("guest/update/<int:product_id>/", GuestUpdateCartItemView.as_view()),
+    path("guest/remove/<int:product_id>/", GuestRemoveCartItemView.as_view()),
 ]
@@ -1,83 +1,258 @@
+from decimal import Decimal
+
+from redis.exceptions import RedisError
 from rest_framework import status
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.views import APIView
 from rest_framework.response import Response
+from django.db.models import Prefetch, prefetch_related_objects
 
 from .models import Cart,CartItem
 from products.models import Product
-from .serializers import CartSerializer,CartItemSerializer
+from products import inventory
+from .serializers import CartSerializer,CartItemSerializer,CartLineSerializer,CartTotalsSerializer,BulkCartSerializer,GuestCartSerializer
+from . import guest, services
+
+
+# Everything CartSerializer touches per item, loaded in a fixed number of queries
+CART_ITEMS_PREFETCH = Prefetch(
+    "items",
+    queryset=CartItem.objects.select_related("product__category", "product__created_by"),
+)
+
+
+def parse_quantity(value):
+    """A quantity from the request body: a whole number of at least 1, else None."""
+    try:
+        quantity = int(value)
+    except (TypeError, ValueError):
+        return None
+    return quantity if quantity >= 1 else None
+
+
+def wants_lean(request):
+    return request.GET.get("lean") in ("1", "true")
+
+
+def mutation_response(request, item, status=200):
+    """The whole cart, or with ?lean=1 only the changed line and the cart totals."""
+    if wants_lean(request):
+        return Response({
+            "item": CartLineSerializer(item).data,
+            "cart": CartTotalsSerializer(item.cart).data,
+        }, status=status)
+
+    cart = Cart.objects.prefetch_related(CART_ITEMS_PREFETCH).get(pk=item.cart_id)
+    return Response(CartSerializer(cart).data, status=status)
 
 
 class CartView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self,request):
-        cart,created = Cart.objects.get_or_create(user=request.user)
+        cart,created = Cart.objects.prefetch_related(CART_ITEMS_PREFETCH).get_or_create(user=request.user)
         serializer = CartSerializer(cart)
         return Response(serializer.data)
 
+# Header badge: totals straight from the cart row, no joins
+class CartSummaryView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        cart = Cart.objects.only("id", "item_count", "total_quantity", "subtotal").filter(user=request.user).first()
+        return Response(CartTotalsSerializer(cart or Cart()).data)
+
+
 class AddToCartView(APIView):
     permission_classes = [IsAuthenticated]
+    throttle_scope = "cart"
 
     def post(self, request):
         product_id = request.data.get("product_id")
-        quantity = int(request.data.get("quantity", 1))
+        quantity = parse_quantity(request.data.get("quantity", 1))
 
         if not product_id:
             return Response({"error": "product_id is required"}, status=400)
+        if quantity is None:
+            return Response({"error": "Invalid quantity"}, status=400)
 
         try:
-            product = Product.objects.get(id=product_id)
-        except:
+            product = Product.objects.get(id=product_id, is_active=True)
+        except (Product.DoesNotExist, ValueError):
             return Response({"error": "Product not found"}, status=404)
 
-        cart, created = Cart.objects.get_or_create(user=request.user)
-
-        item, created = CartItem.objects.get_or_create(
-            cart=cart, 
-            product=product,
-            defaults={'quantity': quantity}
-        )
-        
-        if not created:
-            item.quantity += quantity
-            item.save()
+        try:
+            item = services.add_item(request.user, product, quantity)
+        except inventory.OutOfStock as e:
+            return Response({"error": str(e)}, status=409)
 
-        return Response(CartSerializer(cart).data, status=201)
+        return mutation_response(request, item, status=201)
 
 
 # Update quantity
 class UpdateCartItemView(APIView):
     permission_classes = [IsAuthenticated]
+    throttle_scope = "cart"
 
     def patch(self, request, item_id):
-        try:
-            item = CartItem.objects.get(id=item_id, cart__user=request.user)
-        except:
-            return Response({"error": "Item not found"}, status=404)
-
-        quantity = request.data.get("quantity")
+        quantity = parse_quantity(request.data.get("quantity"))
 
-        if quantity is None or int(quantity) < 1:
+        if quantity is None:
             return Response({"error": "Invalid quantity"}, status=400)
 
-        item.quantity = int(quantity)
-        item.save()
+        try:
+            item = services.set_quantity(request.user, item_id, quantity)
+        except CartItem.DoesNotExist:
+            return Response({"error": "Item not found"}, status=404)
+        except inventory.OutOfStock as e:
+            return Response({"error": str(e)}, status=409)
 
-        return Response(CartSerializer(item.cart).data)
+        return mutation_response(request, item)
 
 
 # Remove item
 class RemoveCartItemView(APIView):
     permission_classes = [IsAuthenticated]
+    throttle_scope = "cart"
 
     def delete(self, request, item_id):
         try:
-            item = CartItem.objects.get(id=item_id, cart__user=request.user)
-        except:
+            item = services.remove_item(request.user, item_id)
+        except CartItem.DoesNotExist:
             return Response({"error": "Item not found"}, status=404)
 
-        cart = item.cart
-        item.delete()
+        item.quantity = 0  # the line is gone
+        return mutation_response(request, item)
+
+
+# Several add / set / remove operations in one request, e.g. restoring a saved basket
+class BulkCartView(APIView):
+    permission_classes = [IsAuthenticated]
+    throttle_scope = "cart"
+
+    def post(self, request):
+        serializer = BulkCartSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        try:
+            cart = services.apply_operations(request.user, serializer.validated_data["operations"])
+        except services.UnknownProducts as e:
+            return Response({"error": str(e)}, status=404)
+        except inventory.OutOfStock as e:
+            return Response({"error": str(e)}, status=409)
+
+        prefetch_related_objects([cart], CART_ITEMS_PREFETCH)
+        return Response(CartSerializer(cart).data)
+
+
+# Guest carts: no login, kept in Redis under the X-Cart-Token header (cart/guest.py)
+# and merged into the user's cart on login
+
+def guest_cart_response(token, items, status=200):
+    products = Product.objects.select_related("category", "created_by").in_bulk(items)
+    lines = [
+        {"product": products[product_id], "quantity": quantity}
+        for product_id, quantity in items.items()
+        if product_id in products
+    ]
+    data = GuestCartSerializer({
+        "token": token,
+        "items": lines,
+        "item_count": len(lines),
+        "total_quantity": sum(line["quantity"] for line in lines),
+        "subtotal": sum((line["product"].price * line["quantity"] for line in lines), Decimal("0")),
+    }).data
+    response = Response(data, status=status)
+    response[guest.TOKEN_HEADER] = token
+    return response
+
+
+def guest_product(product_id):
+    """The active product a guest line may point to, or None."""
+    try:
+        return Product.objects.only("id", "title", "stock", "reserved").get(id=product_id, is_active=True)
+    except (Product.DoesNotExist, ValueError):
+        return None
+
+
+def in_stock(product, quantity):
+    # Guests don't hold stock, they only can't have more than is available
+    return product.stock is None or quantity <= product.available
+
+
+class GuestCartAPIView(APIView):
+    authentication_classes = []
+    permission_classes = [AllowAny]
+
+    def handle_exception(self, exc):
+        if isinstance(exc, RedisError):
+            return Response({"error": "Guest cart is unavailable"}, status=503)
+        return super().handle_exception(exc)
+
+
+class GuestCartView(GuestCartAPIView):
+
+    def get(self, request):
+        token = guest.token_from(request)
+        if token is None:
+            return guest_cart_response(guest.new_token(), {})
+        return guest_cart_response(token, guest.get_items(token))
+
+
+class GuestAddToCartView(GuestCartAPIView):
+    throttle_scope = "cart"
+
+    def post(self, request):
+        product_id = request.data.get("product_id")
+        quantity = parse_quantity(request.data.get("quantity", 1))
+
+        if not product_id:
+            return Response({"error": "product_id is required"}, status=400)
+        if quantity is None:
+            return Response({"error": "Invalid quantity"}, status=400)
+
+        product = guest_product(product_id)
+        if product is None:
+            return Response({"error": "Product not found"}, status=404)
+
+        token = guest.token_from(request) or guest.new_token()
+        in_cart = guest.get_items(token).get(product.pk, 0) if product.stock is not None else 0
+        if not in_stock(product, in_cart + quantity):
+            return Response({"error": f"Only {product.available} left of '{product.title}'"}, status=409)
+
+        guest.add(token, product.pk, quantity)
+        return guest_cart_response(token, guest.get_items(token), status=201)
+
+
+class GuestUpdateCartItemView(GuestCartAPIView):
+    throttle_scope = "cart"
+
+    def patch(self, request, product_id):
+        token = guest.token_from(request)
+        if token is None or not guest.has_item(token, product_id):
+            return Response({"error": "Item not found"}, status=404)
+
+        quantity = parse_quantity(request.data.get("quantity"))
+        if quantity is None:
+            return Response({"error": "Invalid quantity"}, status=400)
+
+        product = guest_product(product_id)
+        if product is None:
+            return Response({"error": "Product not found"}, status=404)
+        if not in_stock(product, quantity):
+            return Response({"error": f"Only {product.available} left of '{product.title}'"}, status=409)
+
+        guest.set_quantity(token, product_id, quantity)
+        return guest_cart_response(token, guest.get_items(token))
+
+
+class GuestRemoveCartItemView(GuestCartAPIView):
+    throttle_scope = "cart"
+
+    def delete(self, request, product_id):
+        token = guest.token_from(request)
+        if token is None or not guest.has_item(token, product_id):
+            return Response({"error": "Item not found"}, status=404)
 
-        return Response(CartSerializer(cart).data)
\ No newline at end of file
+        guest.remove(token, product_id)
+        return guest_cart_response(token, guest.get_items(token))
@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ecombackend.settings')
+# Use the async cart/order views when served by an ASGI server
+os.environ.setdefault('ASYNC_API_VIEWS', '1')
 
 application = get_asgi_application()
@@ -0,0 +1,98 @@
+import json
+
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework.exceptions import APIException, AuthenticationFailed, Throttled
+from rest_framework.settings import api_settings
+
+from users.authentication import ClaimsJWTAuthentication
+
+
+class AsyncAPIView(View):
+    """
+    Async counterpart of DRF's APIView for the hot cart/order endpoints.
+
+    DRF views are sync-only: under ASGI every request would still be handed
+    to a worker thread for its whole lifetime. These views authenticate with
+    the same ClaimsJWTAuthentication, apply the same throttles (set
+    `throttle_scope`), expose the parsed body as `request.data` (and the query
+    string as `request.query_params`) and return JSON, while the ORM work is
+    awaited.
+
+    Handlers are `async def get/post/...` returning a JsonResponse.
+    """
+
+    authentication = ClaimsJWTAuthentication()
+    throttle_classes = api_settings.DEFAULT_THROTTLE_CLASSES
+    throttle_scope = None
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        # JWT auth, no session cookies, same as DRF's APIView
+        return csrf_exempt(super().as_view(**initkwargs))
+
+    async def dispatch(self, request, *args, **kwargs):
+        handler = getattr(self, request.method.lower(), None)
+        if request.method.lower() not in self.http_method_names or handler is None:
+            return await self.http_method_not_allowed(request, *args, **kwargs)
+
+        try:
+            auth = await sync_to_async(self.authentication.authenticate)(request)
+        except AuthenticationFailed as e:
+            return self.unauthorized(e.detail)
+        if auth is None:
+            return self.unauthorized("Authentication credentials were not provided.")
+        request.user, request.auth = auth
+
+        waits = await sync_to_async(self.throttle_waits)(request)
+        if waits:
+            return self.throttled(waits)
+
+        # Same names as DRF's Request, so paginators and helpers work on both
+        request.query_params = request.GET
+        try:
+            request.data = self.parse_body(request)
+        except ValueError:
+            return JsonResponse({"detail": "JSON parse error"}, status=400)
+
+        try:
+            return await handler(request, *args, **kwargs)
+        except APIException as e:
+            # Validation errors, bad cursors etc. rendered like DRF does
+            body = e.detail if isinstance(e.detail, (dict, list)) else {"detail": e.detail}
+            return JsonResponse(body, status=e.status_code, safe=False)
+
+    def unauthorized(self, detail):
+        # simplejwt reports token errors as a dict, like DRF renders them
+        body = detail if isinstance(detail, dict) else {"detail": detail}
+        response = JsonResponse(body, status=401)
+        response["WWW-Authenticate"] = self.authentication.authenticate_header(None)
+        return response
+
+    def throttle_waits(self, request):
+        # As APIView.check_throttles: the wait of each throttle refusing the request
+        waits = []
+        for throttle_class in self.throttle_classes:
+            throttle = throttle_class()
+            if not throttle.allow_request(request, self):
+                waits.append(throttle.wait())
+        return waits
+
+    def throttled(self, waits):
+        e = Throttled(max((wait for wait in waits if wait is not None), default=None))
+        response = JsonResponse({"detail": e.detail}, status=e.status_code)
+        if e.wait is not None:
+            response["Retry-After"] = str(e.wait)
+        return response
+
+    def parse_body(self, request):
+        if request.method in ("GET", "HEAD", "DELETE") or not request.body:
+            return {}
+        if request.content_type == "application/json":
+            data = json.loads(request.body)
+            if not isinstance(data, dict):
+                raise ValueError("Expected a JSON object")
+            return data
+        return request.POST
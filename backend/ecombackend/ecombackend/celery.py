@@ -1,9 +1,17 @@
 from __future__ import absolute_import, unicode_literals
 import os
 from celery import Celery
+from celery.signals import task_failure, task_postrun, task_prerun
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ecombackend.settings')
 
 app = Celery('ecombackend')
 app.config_from_object('django.conf:settings', namespace='CELERY')
 app.autodiscover_tasks()
+
+# Task durations and failures for /metrics (ecombackend/metrics.py)
+from . import metrics  # noqa: E402
+
+task_prerun.connect(metrics.task_started)
+task_postrun.connect(metrics.task_finished)
+task_failure.connect(metrics.task_failed)
@@ -0,0 +1,129 @@
+import asyncio
+import time
+from urllib.parse import urlsplit
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework_simplejwt.tokens import RefreshToken
+
+User = get_user_model()
+
+
+async def read_response(reader):
+    """Read one HTTP/1.1 response, returns (status, keep_alive)."""
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError('Connection closed by server')
+    status = int(status_line.split()[1])
+
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+
+    if headers.get('transfer-encoding', '').lower() == 'chunked':
+        while True:
+            size = int((await reader.readline()).split(b';')[0], 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    elif 'content-length' in headers:
+        await reader.readexactly(int(headers['content-length']))
+    else:
+        await reader.read()
+        return status, False
+    return status, headers.get('connection', '').lower() != 'close'
+
+
+class Command(BaseCommand):
+    help = 'Load test cart/order endpoints on running WSGI and ASGI servers and compare req/s and p99 latency'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--target', action='append', required=True,
+            help='name=base_url of a running server, e.g. wsgi=http://127.0.0.1:8000 (repeatable)',
+        )
+        parser.add_argument('--path', action='append', help='Endpoint to request (repeatable, default: /api/cart/ and /api/orders/my/)')
+        parser.add_argument('--username', type=str, required=True, help='User the requests are authenticated as')
+        parser.add_argument('--concurrency', type=int, default=64, help='Concurrent keep-alive connections')
+        parser.add_argument('--requests', type=int, default=5000, help='Requests per target and path')
+        parser.add_argument('--warmup', type=int, default=200, help='Untimed requests sent first')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(f"User '{options['username']}' does not exist")
+        token = str(RefreshToken.for_user(user).access_token)
+
+        targets = []
+        for target in options['target']:
+            name, sep, url = target.partition('=')
+            if not sep:
+                name = url = target
+            targets.append((name, url.rstrip('/')))
+        paths = options['path'] or ['/api/cart/', '/api/orders/my/']
+
+        self.stdout.write(f"{'target':<10} {'path':<24} {'req/s':>9} {'p50 ms':>9} {'p99 ms':>9} {'errors':>7}")
+        for path in paths:
+            for name, url in targets:
+                rate, p50, p99, errors = asyncio.run(self.run(url + path, token, options))
+                style = self.style.WARNING if errors else self.style.SUCCESS
+                self.stdout.write(style(f'{name:<10} {path:<24} {rate:>9.0f} {p50:>9.1f} {p99:>9.1f} {errors:>7}'))
+
+    async def run(self, url, token, options):
+        parts = urlsplit(url)
+        host, port = parts.hostname, parts.port or 80
+        target = parts.path + (f'?{parts.query}' if parts.query else '')
+        request = (
+            f'GET {target} HTTP/1.1\r\n'
+            f'Host: {parts.netloc}\r\n'
+            f'Authorization: Bearer {token}\r\n'
+            'Accept: application/json\r\n'
+            'Connection: keep-alive\r\n\r\n'
+        ).encode()
+
+        latencies = []
+        errors = 0
+
+        async def worker(count, record):
+            nonlocal errors
+            reader = writer = None
+            for _ in range(count):
+                started = time.perf_counter()
+                try:
+                    if writer is None:
+                        reader, writer = await asyncio.open_connection(host, port)
+                    writer.write(request)
+                    await writer.drain()
+                    status, keep_alive = await read_response(reader)
+                except (OSError, ConnectionError, asyncio.IncompleteReadError, ValueError, IndexError):
+                    status, keep_alive = None, False
+                if record:
+                    latencies.append(time.perf_counter() - started)
+                    if status != 200:
+                        errors += 1
+                if not keep_alive and writer is not None:
+                    writer.close()
+                    reader = writer = None
+            if writer is not None:
+                writer.close()
+
+        def split(total):
+            concurrency = min(options['concurrency'], total) or 1
+            return [total // concurrency + (i < total % concurrency) for i in range(concurrency)]
+
+        await asyncio.gather(*(worker(n, False) for n in split(options['warmup'])))
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(n, True) for n in split(options['requests'])))
+        elapsed = time.perf_counter() - started
+
+        latencies.sort()
+        if not latencies:
+            return 0, 0, 0, errors
+        p50 = latencies[len(latencies) // 2] * 1000
+        p99 = latencies[max(int(len(latencies) * 0.99) - 1, 0)] * 1000
+        return len(latencies) / elapsed, p50, p99, errors
@@ -0,0 +1,85 @@
+import resource
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand, CommandError
+from django.http import QueryDict
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from orders.views import OrderExportView
+from products.views import ProductExportView
+from users.models import User
+
+EXPORTS = {
+    "orders": OrderExportView,
+    "products": ProductExportView,
+}
+FORMATS = ["csv", "ndjson"]
+
+
+class Command(BaseCommand):
+    help = (
+        "Stream the admin exports of the current database and report their size, time and peak memory. "
+        "Run it on seeded data (seed_data) to check that memory doesn't grow with the rows exported"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("exports", nargs="*", help=f"{' and/or '.join(EXPORTS)} (default: both)")
+        parser.add_argument("--username", help="Admin user to export as (default: the first admin)")
+        parser.add_argument("--format", choices=FORMATS, action="append", help="Repeat for several (default: all)")
+        parser.add_argument("--query", default="", help='Filters as in the URL, e.g. "status=PAID&date_from=2026-01-01"')
+        parser.add_argument("--max-peak-mb", type=float, help="Fail if an export allocates more than this at its peak")
+
+    def handle(self, *args, **options):
+        admins = User.objects.filter(is_admin=True).order_by("pk")
+        if options["username"]:
+            admins = admins.filter(username=options["username"])
+        admin = admins.first()
+        if admin is None:
+            raise CommandError("No such admin user")
+
+        unknown = set(options["exports"]) - EXPORTS.keys()
+        if unknown:
+            raise CommandError(f"Unknown exports: {', '.join(sorted(unknown))}")
+
+        query = QueryDict(options["query"])
+        failed = []
+        for name in options["exports"] or EXPORTS:
+            for fmt in options["format"] or FORMATS:
+                peak = self.measure(admin, name, fmt, query)
+                if options["max_peak_mb"] is not None and peak > options["max_peak_mb"]:
+                    failed.append(f"{name}.{fmt}")
+
+        if failed:
+            raise CommandError(f"Peak memory over {options['max_peak_mb']} MB: {', '.join(failed)}")
+
+    def measure(self, admin, name, fmt, query):
+        request = APIRequestFactory().get(f"/api/{name}/export/{fmt}/", query)
+        force_authenticate(request, admin)
+
+        # Python allocations only; max RSS also counts the database driver's buffers
+        tracemalloc.start()
+        started = time.perf_counter()
+        try:
+            response = EXPORTS[name].as_view()(request, fmt=fmt)
+            if response.status_code != 200:
+                response.render()
+                raise CommandError(f"{name}.{fmt}: {response.status_code} {response.content.decode()}")
+
+            chunks = lines = size = 0
+            for chunk in response.streaming_content:
+                chunks += 1
+                lines += chunk.count(b"\n")
+                size += len(chunk)
+            seconds = time.perf_counter() - started
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        peak_mb = peak / 2**20
+        max_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        self.stdout.write(
+            f"{name}.{fmt}: {lines} lines, {size / 2**20:.1f} MB in {chunks} chunks, {seconds:.1f} s "
+            f"({lines / seconds if seconds else 0:.0f} lines/s), peak {peak_mb:.1f} MB, max RSS {max_rss_mb:.0f} MB"
+        )
+        return peak_mb
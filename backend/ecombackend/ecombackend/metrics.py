@@ -0,0 +1,187 @@
+import ipaddress
+import logging
+import os
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import HttpResponse, HttpResponseForbidden
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest, multiprocess
+from prometheus_client.core import GaugeMetricFamily
+
+from .performance import RequestTimings, record_queries, request_timings
+
+logger = logging.getLogger(__name__)
+
+# Prometheus metrics, scraped from GET /metrics (METRICS_ALLOWED_NETWORKS only).
+#
+# Under gunicorn/uvicorn with several workers set PROMETHEUS_MULTIPROC_DIR to
+# an empty directory shared by the web workers and the Celery worker. Each
+# process then writes its samples to its own mmap'ed files, without locking
+# across processes, and /metrics adds them up at scrape time. Without it the
+# numbers are those of the worker that answered the scrape.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 250, 500)
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "API response time by URL route",
+    ["method", "route", "status"], buckets=LATENCY_BUCKETS,
+)
+REQUEST_QUERIES = Histogram(
+    "http_request_db_queries", "SQL queries per request by URL route",
+    ["route"], buckets=QUERY_BUCKETS,
+)
+REQUEST_DB_TIME = Histogram(
+    "http_request_db_duration_seconds", "Time in SQL per request by URL route",
+    ["route"], buckets=LATENCY_BUCKETS,
+)
+TASK_DURATION = Histogram(
+    "celery_task_duration_seconds", "Celery task run time",
+    ["task"], buckets=LATENCY_BUCKETS,
+)
+TASK_FAILURES = Counter("celery_task_failures", "Celery tasks that raised", ["task"])
+CACHE_REQUESTS = Counter("catalog_cache_requests", "Catalog cache lookups (products/cache.py)", ["kind", "outcome"])
+ORDERS_CREATED = Counter("orders_created", "Orders placed at checkout", ["payment_method"])
+
+# Requests that match no URL pattern share one label
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+def route_of(request):
+    match = getattr(request, "resolver_match", None)
+    return match.route if match else UNMATCHED_ROUTE
+
+
+class MetricsMiddleware:
+    """Latency and SQL histograms per URL route. Goes right after PerformanceMiddleware."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, "METRICS_ENABLED", True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+        record_queries()
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        # Shares PerformanceMiddleware's timings when that one is on
+        timings = request_timings.get()
+        token = None
+        if timings is None:
+            timings = RequestTimings()
+            token = request_timings.set(timings)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            if token is not None:
+                request_timings.reset(token)
+        self.observe(request, response, timings, time.perf_counter() - started)
+        return response
+
+    async def __acall__(self, request):
+        timings = request_timings.get()
+        token = None
+        if timings is None:
+            timings = RequestTimings()
+            token = request_timings.set(timings)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            if token is not None:
+                request_timings.reset(token)
+        self.observe(request, response, timings, time.perf_counter() - started)
+        return response
+
+    def observe(self, request, response, timings, seconds):
+        route = route_of(request)
+        if route == "metrics/":
+            return
+        REQUEST_LATENCY.labels(request.method, route, str(response.status_code)).observe(seconds)
+        REQUEST_QUERIES.labels(route).observe(timings.queries)
+        REQUEST_DB_TIME.labels(route).observe(timings.db)
+
+
+# Celery, connected in ecombackend/celery.py
+
+_task_started = {}
+
+
+def task_started(task_id=None, **kwargs):
+    _task_started[task_id] = time.perf_counter()
+
+
+def task_finished(task_id=None, task=None, **kwargs):
+    started = _task_started.pop(task_id, None)
+    if started is not None and task is not None:
+        TASK_DURATION.labels(task.name).observe(time.perf_counter() - started)
+
+
+def task_failed(sender=None, **kwargs):
+    if sender is not None:
+        TASK_FAILURES.labels(sender.name).inc()
+
+
+class QueueCollector:
+    """Queue depths, read when scraped: unsent outbox mail and waiting Celery messages."""
+
+    def collect(self):
+        from orders.models import OutboundEmail
+
+        outbox = GaugeMetricFamily("email_outbox_pending", "Emails waiting in the outbox (orders.mailer)")
+        try:
+            outbox.add_metric([], OutboundEmail.objects.filter(status="PENDING").count())
+            yield outbox
+        except Exception as e:
+            logger.warning("Could not count the email outbox: %s", e)
+
+        if not getattr(settings, "CELERY_BROKER_URL", None):
+            return
+        from .celery import app
+
+        queue = app.conf.task_default_queue
+        depth = GaugeMetricFamily("celery_queue_length", "Messages waiting in the Celery queue", labels=["queue"])
+        try:
+            with app.connection_for_read(connect_timeout=1) as connection:
+                connection.ensure_connection(max_retries=1)
+                declared = connection.default_channel.queue_declare(queue=queue, passive=True)
+            depth.add_metric([queue], declared.message_count)
+            yield depth
+        except Exception as e:
+            # Scraped every few seconds, a traceback each time would flood the log
+            logger.warning("Could not read the length of Celery queue %s: %s", queue, e)
+
+
+def allowed(request):
+    try:
+        address = ipaddress.ip_address(request.META.get("REMOTE_ADDR", ""))
+    except ValueError:
+        return False
+    return any(address in ipaddress.ip_network(network, strict=False) for network in settings.METRICS_ALLOWED_NETWORKS)
+
+
+def registry():
+    """The samples of every worker with PROMETHEUS_MULTIPROC_DIR, else of this process."""
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        combined = CollectorRegistry()
+        multiprocess.MultiProcessCollector(combined)
+        return combined
+    return REGISTRY
+
+
+def metrics_view(request):
+    if not allowed(request):
+        return HttpResponseForbidden()
+
+    queues = CollectorRegistry()
+    queues.register(QueueCollector())
+    return HttpResponse(generate_latest(registry()) + generate_latest(queues), content_type=CONTENT_TYPE_LATEST)
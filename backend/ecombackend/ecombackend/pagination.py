@@ -0,0 +1,160 @@
+import base64
+import json
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.filters import OrderingFilter
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset (seek) pagination on (ordering field, id).
+
+    - The cursor stores the ordering value and id of the last row seen, so
+      every page is a `WHERE (field, id) > (value, id) LIMIT n` and deep
+      pages cost the same as the first one (no OFFSET scan).
+    - The ordering field comes from the view's OrderingFilter (`?ordering=`),
+      then from an ordering already put on the queryset by a filter (e.g.
+      `-rank` from search), falling back to `ordering`. The id is always
+      used as tie-breaker. Annotations can be used as ordering field.
+    - Page size defaults to API_PAGE_SIZE and clients may ask for more
+      with `?page_size=`, capped at API_MAX_PAGE_SIZE.
+    """
+
+    cursor_query_param = "cursor"
+    page_size_query_param = "page_size"
+    ordering = "-created_at"
+    invalid_cursor_message = "Invalid cursor"
+
+    def get_page_size(self, request):
+        page_size = getattr(settings, "API_PAGE_SIZE", 20)
+        max_page_size = getattr(settings, "API_MAX_PAGE_SIZE", 100)
+        try:
+            requested = int(request.query_params[self.page_size_query_param])
+            if requested > 0:
+                page_size = requested
+        except (KeyError, ValueError):
+            pass
+        return min(page_size, max_page_size)
+
+    def get_ordering(self, request, queryset, view):
+        for backend in getattr(view, "filter_backends", []):
+            if issubclass(backend, OrderingFilter):
+                ordering = backend().get_ordering(request, queryset, view)
+                if ordering:
+                    return ordering[0]
+        if queryset.query.order_by and isinstance(queryset.query.order_by[0], str):
+            return queryset.query.order_by[0]
+        return self.ordering
+
+    def get_field(self, queryset, name):
+        if name in queryset.query.annotations:
+            return queryset.query.annotations[name].output_field
+        return queryset.model._meta.get_field(name)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.finish_page(list(self.page_queryset(queryset, request, view)))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """paginate_queryset() for async views."""
+        return self.finish_page([obj async for obj in self.page_queryset(queryset, request, view)])
+
+    def page_queryset(self, queryset, request, view=None):
+        """The queryset for the requested page, one row over the page size."""
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+
+        ordering = self.get_ordering(request, queryset, view)
+        self.field_name = ordering.lstrip("-")
+        self.field = self.get_field(queryset, self.field_name)
+        self.is_annotation = self.field_name in queryset.query.annotations
+        self.cursor = self.decode_cursor(request)
+        self.reverse = bool(self.cursor and self.cursor[2])
+
+        # Walking backwards flips the direction, the page is re-reversed below.
+        descending = ordering.startswith("-") != self.reverse
+        if descending:
+            queryset = queryset.order_by(f"-{self.field_name}", "-pk")
+            lookup = "lt"
+        else:
+            queryset = queryset.order_by(self.field_name, "pk")
+            lookup = "gt"
+
+        if self.cursor:
+            value, pk = self.cursor[0], self.cursor[1]
+            queryset = queryset.filter(
+                Q(**{f"{self.field_name}__{lookup}": value})
+                | Q(**{self.field_name: value, f"pk__{lookup}": pk})
+            )
+        return queryset[: self.page_size + 1]
+
+    def finish_page(self, results):
+        has_more = len(results) > self.page_size
+        results = results[: self.page_size]
+
+        if self.reverse:
+            results.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, self.cursor is not None
+
+        self.page = results
+        return results
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            raw, pk, reverse = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+            return self.field.to_python(raw), int(pk), bool(reverse)
+        except (TypeError, ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, instance, reverse):
+        if self.is_annotation:
+            value = getattr(instance, self.field_name)
+        else:
+            value = self.field.value_to_string(instance)
+        payload = [value, instance.pk, int(reverse)]
+        encoded = base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_data(self, data):
+        return {
+            "next": self.get_next_link(),
+            "previous": self.get_previous_link(),
+            "results": data,
+        }
+
+    def get_paginated_response(self, data):
+        return Response(self.get_paginated_data(data))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "previous": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
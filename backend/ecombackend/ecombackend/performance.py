@@ -0,0 +1,214 @@
+import json
+import logging
+import random
+import re
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+logger = logging.getLogger(__name__)
+
+# Per-request timings, switched on with PERF_INSTRUMENTATION=1.
+#
+# Every response gets a Server-Timing header (shown in the browser's network
+# panel):
+#
+#     Server-Timing: total;dur=84.2, view;dur=80.9, db;dur=61.0;desc="23 queries", serialize;dur=30.4, render;dur=2.7
+#
+# - db: time in SQL, counted by a wrapper on every database connection
+# - view: the view, SQL and serialization included
+# - serialize: reading `serializer.data` (DRF serializers turning objects
+#   into dicts), including the SQL it runs, e.g. lazy relations (N+1)
+# - render: turning a DRF Response into JSON (async views encode inside the view)
+# - total: everything from this middleware inwards
+#
+# Requests slower than SLOW_REQUEST_MS are logged (a SLOW_REQUEST_SAMPLE_RATE
+# share of them) as one JSON object, with the SQL statements run most often
+# to show N+1 queries.
+#
+# When switched off the middleware drops out of the stack and no wrapper is
+# installed, so it costs nothing.
+
+TOP_STATEMENTS = 5
+MAX_SQL_LENGTH = 500
+# "IN (%s, %s, %s)" and "IN (%s, %s)" are the same statement
+PLACEHOLDER_RUN = re.compile(r"%s(?:, %s)+")
+
+# Also read by ecombackend.metrics
+request_timings = ContextVar("request_timings", default=None)
+
+
+class RequestTimings:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db = 0.0
+        self.view = None
+        self.serialize = 0.0
+        # Inside a serializer's `data`, nested ones are not counted twice
+        self.serializing = False
+        self.render = None
+        # sql -> [count, seconds]
+        self.statements = {}
+
+    def add_query(self, sql, seconds):
+        self.queries += 1
+        self.db += seconds
+        entry = self.statements.get(sql)
+        if entry is None:
+            self.statements[sql] = [1, seconds]
+        else:
+            entry[0] += 1
+            entry[1] += seconds
+
+    def top_statements(self):
+        merged = {}
+        for sql, (count, seconds) in self.statements.items():
+            entry = merged.setdefault(PLACEHOLDER_RUN.sub("%s, ...", sql), [0, 0.0])
+            entry[0] += count
+            entry[1] += seconds
+        top = sorted(merged.items(), key=lambda item: (-item[1][0], -item[1][1]))[:TOP_STATEMENTS]
+        return [
+            {"sql": sql[:MAX_SQL_LENGTH], "count": count, "ms": round(seconds * 1000, 2)}
+            for sql, (count, seconds) in top
+        ]
+
+
+def record_query(execute, sql, params, many, context):
+    timings = request_timings.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.add_query(sql, time.perf_counter() - started)
+
+
+def install_query_recorder(sender=None, connection=None, **kwargs):
+    # Stays on the connection: the ORM of async views runs in another
+    # thread, with its own connection, but the same context
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def record_queries():
+    """Count the SQL of requests with RequestTimings set, on every connection from now on."""
+    connection_created.connect(install_query_recorder, dispatch_uid="performance_query_recorder")
+    for connection in connections.all(initialized_only=True):
+        install_query_recorder(connection=connection)
+
+
+def timed_data(data):
+    """A serializer `data` property that adds its time to the request's serialize timing."""
+    def get_data(serializer):
+        timings = request_timings.get()
+        if timings is None or timings.serializing:
+            return data.fget(serializer)
+        timings.serializing = True
+        started = time.perf_counter()
+        try:
+            return data.fget(serializer)
+        finally:
+            timings.serialize += time.perf_counter() - started
+            timings.serializing = False
+
+    get_data.timed = True
+    return property(get_data)
+
+
+def record_serialization():
+    """Time `serializer.data` of requests with RequestTimings set, for every DRF serializer."""
+    from rest_framework import serializers
+
+    for cls in (serializers.Serializer, serializers.ListSerializer):
+        if not getattr(cls.data.fget, "timed", False):
+            cls.data = timed_data(cls.data)
+
+
+def ms(seconds):
+    return round(seconds * 1000, 2)
+
+
+class PerformanceMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, "PERF_INSTRUMENTATION", False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+        self.slow_request_seconds = getattr(settings, "SLOW_REQUEST_MS", 500) / 1000
+        self.sample_rate = getattr(settings, "SLOW_REQUEST_SAMPLE_RATE", 1.0)
+        record_queries()
+        record_serialization()
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        timings = RequestTimings()
+        token = request_timings.set(timings)
+        try:
+            response = self.get_response(request)
+        finally:
+            request_timings.reset(token)
+        return self.finish(request, response, timings)
+
+    async def __acall__(self, request):
+        timings = RequestTimings()
+        token = request_timings.set(timings)
+        try:
+            response = await self.get_response(request)
+        finally:
+            request_timings.reset(token)
+        return self.finish(request, response, timings)
+
+    def process_template_response(self, request, response):
+        # Called once the view has returned a DRF Response, before Django renders it
+        timings = request_timings.get()
+        if timings is not None:
+            view_done = time.perf_counter()
+            timings.view = view_done - timings.started
+            response.render()
+            timings.render = time.perf_counter() - view_done
+        return response
+
+    def finish(self, request, response, timings):
+        total = time.perf_counter() - timings.started
+        metrics = [f"total;dur={ms(total)}"]
+        if timings.view is not None:
+            metrics.append(f"view;dur={ms(timings.view)}")
+        metrics.append(f'db;dur={ms(timings.db)};desc="{timings.queries} queries"')
+        metrics.append(f"serialize;dur={ms(timings.serialize)}")
+        if timings.render is not None:
+            metrics.append(f"render;dur={ms(timings.render)}")
+        response["Server-Timing"] = ", ".join(metrics)
+
+        if total >= self.slow_request_seconds and random.random() < self.sample_rate:
+            self.log_slow_request(request, response, timings, total)
+        return response
+
+    def log_slow_request(self, request, response, timings, total):
+        match = request.resolver_match
+        logger.warning("Slow request %s", json.dumps({
+            "method": request.method,
+            "path": request.path,
+            "route": match.route if match else None,
+            "status": response.status_code,
+            "total_ms": ms(total),
+            "view_ms": ms(timings.view) if timings.view is not None else None,
+            "serialize_ms": ms(timings.serialize),
+            "render_ms": ms(timings.render) if timings.render is not None else None,
+            "db_ms": ms(timings.db),
+            "queries": timings.queries,
+            "top_statements": timings.top_statements(),
+        }))
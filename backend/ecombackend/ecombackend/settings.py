@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/6.0/ref/settings/
 
 from pathlib import Path
 import os
+from corsheaders.defaults import default_headers
 from dotenv import load_dotenv
 
 
@@ -42,6 +43,9 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
+    # Project-wide management commands (ecombackend/management)
+    'ecombackend',
     'users',
     'products',
     'cart',
@@ -51,6 +55,9 @@ INSTALLED_APPS = [
 AUTH_USER_MODEL = 'users.User'
 
 MIDDLEWARE = [
+    # First, so its total covers the whole stack (ecombackend/performance.py)
+    'ecombackend.performance.PerformanceMiddleware',
+    'ecombackend.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -62,6 +69,9 @@ MIDDLEWARE = [
 ]
 
 CORS_ALLOW_ALL_ORIGINS = True
+# Guest cart token (cart/guest.py)
+CORS_ALLOW_HEADERS = (*default_headers, 'x-cart-token')
+CORS_EXPOSE_HEADERS = ['X-Cart-Token']
 
 ROOT_URLCONF = 'ecombackend.urls'
 
@@ -98,6 +108,30 @@ DATABASES = {
 }
 
 
+# Cache (Redis, the same server Celery uses)
+# https://docs.djangoproject.com/en/6.0/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.getenv('REDIS_CACHE_URL', 'redis://localhost:6379/2'),
+    }
+}
+
+# Guest carts (cart/guest.py): one Redis hash per cart token, dropped after
+# GUEST_CART_TTL seconds without changes
+GUEST_CART_REDIS_URL = os.getenv('GUEST_CART_REDIS_URL', 'redis://localhost:6379/3')
+GUEST_CART_TTL = int(os.getenv('GUEST_CART_TTL', 7 * 24 * 60 * 60))
+
+# Seconds each kind of catalog response stays fresh (products/cache.py)
+CATALOG_CACHE_TTLS = {
+    'category_list': 60 * 60,
+    'category_detail': 60 * 60,
+    'product_list': 60,
+    'product_detail': 5 * 60,
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
 
@@ -118,10 +152,55 @@ AUTH_PASSWORD_VALIDATORS = [
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'users.authentication.ClaimsJWTAuthentication',
+    ),
+    # Token buckets for views with a throttle_scope (ecombackend/throttling.py)
+    'DEFAULT_THROTTLE_CLASSES': (
+        'ecombackend.throttling.TokenBucketThrottle',
     ),
+    'DEFAULT_THROTTLE_RATES': {
+        # per client IP
+        'login': os.getenv('THROTTLE_LOGIN_RATE', '10/min'),
+        'register': os.getenv('THROTTLE_REGISTER_RATE', '5/hour'),
+        # per user (per IP for guest carts)
+        'cart': os.getenv('THROTTLE_CART_RATE', '120/min'),
+        'checkout': os.getenv('THROTTLE_CHECKOUT_RATE', '10/min'),
+    },
+    # Proxies in front of the app. 0 ignores X-Forwarded-For, so clients
+    # can't pick the IP they are throttled as
+    'NUM_PROXIES': int(os.getenv('API_NUM_PROXIES', 0)),
 }
 
+THROTTLE_REDIS_URL = os.getenv('THROTTLE_REDIS_URL', 'redis://localhost:6379/4')
+
+# Server-Timing header and slow-request log (ecombackend/performance.py).
+# Off by default; when off the middleware is dropped at startup
+PERF_INSTRUMENTATION = os.getenv('PERF_INSTRUMENTATION', '0') == '1'
+SLOW_REQUEST_MS = int(os.getenv('SLOW_REQUEST_MS', 500))
+# Share of the slow requests that get logged
+SLOW_REQUEST_SAMPLE_RATE = float(os.getenv('SLOW_REQUEST_SAMPLE_RATE', 1.0))
+
+# Prometheus metrics at /metrics (ecombackend/metrics.py), for scrapers in
+# these networks only. With several worker processes also set
+# PROMETHEUS_MULTIPROC_DIR
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', '1') == '1'
+METRICS_ALLOWED_NETWORKS = os.getenv('METRICS_ALLOWED_NETWORKS', '127.0.0.0/8,::1/128').split(',')
+
+# request.user is built from the JWT claims (users/authentication.py). Full
+# user rows, when needed, are cached this many seconds in Redis / in-process
+AUTH_USER_CACHE_TTL = int(os.getenv('AUTH_USER_CACHE_TTL', 30))
+AUTH_USER_LOCAL_CACHE_TTL = int(os.getenv('AUTH_USER_LOCAL_CACHE_TTL', 5))
+# Users kept in-process, least recently used ones are dropped first
+AUTH_USER_LOCAL_CACHE_SIZE = int(os.getenv('AUTH_USER_LOCAL_CACHE_SIZE', 1000))
+
+# Keyset pagination (ecombackend/pagination.py)
+API_PAGE_SIZE = int(os.getenv('API_PAGE_SIZE', 20))
+API_MAX_PAGE_SIZE = int(os.getenv('API_MAX_PAGE_SIZE', 100))
+
+# Serve the cart/order endpoints with async views (cart/async_views.py,
+# orders/async_views.py). Switched on by ecombackend.asgi.
+ASYNC_API_VIEWS = os.getenv('ASYNC_API_VIEWS', '0') == '1'
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/6.0/topics/i18n/
@@ -143,6 +222,12 @@ STATIC_URL = 'static/'
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
 
+# Resized WebP copies of product images (products/images.py), by width in px
+IMAGE_VARIANT_WIDTHS = [int(width) for width in os.getenv('IMAGE_VARIANT_WIDTHS', '160,320,640,1024').split(',')]
+IMAGE_VARIANT_QUALITY = int(os.getenv('IMAGE_VARIANT_QUALITY', 80))
+# Variant served as `thumbnail` in product responses
+IMAGE_THUMBNAIL_WIDTH = int(os.getenv('IMAGE_THUMBNAIL_WIDTH', 320))
+
 CELERY_BROKER_URL = os.getenv('CELERY_BROKER_URL')
 CELERY_RESULT_BACKEND = os.getenv('CELERY_RESULT_BACKEND')
 
@@ -150,9 +235,32 @@ CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 
-EMAIL_BACKEND = "django.core.mail.backends.smtp.EmailBackend"
+CELERY_BEAT_SCHEDULE = {
+    'release-expired-stock-reservations': {
+        'task': 'products.tasks.release_expired_reservations',
+        'schedule': 60.0,
+    },
+    'drain-email-outbox': {
+        'task': 'orders.tasks.drain_email_outbox',
+        'schedule': float(os.getenv('EMAIL_DRAIN_INTERVAL', 10)),
+    },
+}
+
+# How long add-to-cart holds stock before the sweep gives it back (seconds)
+STOCK_RESERVATION_TTL = int(os.getenv('STOCK_RESERVATION_TTL', 15 * 60))
+
+# Use django.core.mail.backends.filebased.EmailBackend (with EMAIL_FILE_PATH)
+# or locmem to work without an SMTP server
+EMAIL_BACKEND = os.getenv('EMAIL_BACKEND', "django.core.mail.backends.smtp.EmailBackend")
+EMAIL_FILE_PATH = BASE_DIR / "sent_emails"
 EMAIL_HOST = "smtp.gmail.com"
 EMAIL_PORT = 587
 EMAIL_USE_TLS = True
 EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER')
 EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD')
+
+# Batched order emails (orders/mailer.py)
+EMAIL_BATCH_SIZE = int(os.getenv('EMAIL_BATCH_SIZE', 100))
+EMAIL_RATE_LIMIT = float(os.getenv('EMAIL_RATE_LIMIT', 10))  # messages per second, all workers together
+EMAIL_MAX_ATTEMPTS = int(os.getenv('EMAIL_MAX_ATTEMPTS', 5))
+EMAIL_RETRY_BACKOFF = int(os.getenv('EMAIL_RETRY_BACKOFF', 60))  # seconds, doubled per attempt
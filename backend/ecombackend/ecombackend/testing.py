@@ -0,0 +1,75 @@
+from contextlib import contextmanager
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from redis.exceptions import RedisError
+
+from . import throttling
+from .celery import app
+
+
+@contextmanager
+def eager_tasks():
+    """Run Celery tasks in the caller on `.delay()`, e.g. the ones queued by on-commit hooks."""
+    previous = app.conf.task_always_eager
+    app.conf.task_always_eager = True
+    try:
+        yield
+    finally:
+        app.conf.task_always_eager = previous
+
+
+def require_redis(test, client):
+    """Skip `test` when the Redis server behind `client` can't be reached."""
+    try:
+        client.ping()
+    except RedisError as e:
+        test.skipTest(f"Redis is not available: {e}")
+
+
+def reset_throttles():
+    """
+    Empty the throttle buckets in Redis. Test databases hand out the same
+    user ids on every run, so API tests would otherwise spend the tokens
+    left over from the previous run.
+    """
+    try:
+        client = throttling.client()
+        keys = list(client.scan_iter(f"{throttling.KEY_PREFIX}:*"))
+        if keys:
+            client.delete(*keys)
+    except RedisError:
+        # Requests are let through without Redis anyway
+        pass
+
+
+class QueryCountMixin:
+    """
+    TestCase mixin to catch N+1 regressions on API endpoints.
+
+    - assertMaxQueries: the endpoint stays within a fixed query budget.
+    - assertConstantQueries: the endpoint issues the same number of queries
+      after `grow()` has added more rows to the data it serializes.
+    """
+
+    def count_queries(self, client, method, url, **kwargs):
+        with CaptureQueriesContext(connection) as ctx:
+            response = getattr(client, method)(url, **kwargs)
+        self.assertLess(response.status_code, 400, getattr(response, "data", response))
+        return len(ctx.captured_queries), ctx.captured_queries
+
+    def assertMaxQueries(self, max_queries, client, url, method="get", **kwargs):
+        count, queries = self.count_queries(client, method, url, **kwargs)
+        if count > max_queries:
+            sql = "\n".join(q["sql"] for q in queries)
+            self.fail(f"{method.upper()} {url} issued {count} queries, budget is {max_queries}:\n{sql}")
+        return count
+
+    def assertConstantQueries(self, client, url, grow, method="get", **kwargs):
+        before, _ = self.count_queries(client, method, url, **kwargs)
+        grow()
+        after, queries = self.count_queries(client, method, url, **kwargs)
+        if after != before:
+            sql = "\n".join(q["sql"] for q in queries)
+            self.fail(f"{method.upper()} {url} went from {before} to {after} queries as data grew:\n{sql}")
+        return after
@@ -0,0 +1,118 @@
+import logging
+from functools import lru_cache
+
+import redis
+from django.conf import settings
+from redis.exceptions import RedisError
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle, SimpleRateThrottle
+
+logger = logging.getLogger(__name__)
+
+# Token buckets in Redis, one per (scope, user or client IP).
+#
+# A view opts in with `throttle_scope = "login"`; the scope's rate comes from
+# REST_FRAMEWORK["DEFAULT_THROTTLE_RATES"], e.g. "10/min": the bucket holds 10
+# tokens and gets one back every 6 seconds. Authenticated requests draw from
+# the user's bucket, anonymous ones from the client IP's.
+#
+# Refill and take happen in one Lua script, so concurrent requests can't both
+# spend the last token, and on Redis' clock, so app servers needn't agree on
+# the time. The check runs in APIView.initial(), before the handler: a
+# rejected login never reaches the password hasher.
+
+KEY_PREFIX = "throttle"
+
+# KEYS[1]: bucket hash {tokens, ts}
+# ARGV[1]: capacity, ARGV[2]: tokens added per second
+# Returns {1 if allowed else 0, seconds until a token is available}
+TOKEN_BUCKET = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1]) or capacity
+local ts = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+
+local allowed = 0
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+else
+    wait = (1 - tokens) / rate
+end
+
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+-- Gone once it would be full again anyway
+redis.call('PEXPIRE', KEYS[1], math.ceil((capacity - tokens) / rate * 1000) + 1000)
+-- Lua numbers are truncated to integers on the way out
+return {allowed, tostring(wait)}
+"""
+
+
+@lru_cache(maxsize=None)
+def client():
+    # Short timeouts: a slow Redis must not hold up every request
+    return redis.Redis.from_url(
+        settings.THROTTLE_REDIS_URL,
+        socket_timeout=getattr(settings, "THROTTLE_REDIS_TIMEOUT", 0.25),
+        socket_connect_timeout=getattr(settings, "THROTTLE_REDIS_TIMEOUT", 0.25),
+    )
+
+
+@lru_cache(maxsize=None)
+def token_bucket():
+    # EVALSHA, loading the script on the first NOSCRIPT
+    return client().register_script(TOKEN_BUCKET)
+
+
+@lru_cache(maxsize=None)
+def parse_rate(rate):
+    """'10/min' -> (capacity 10, 10/60 tokens per second)"""
+    num_requests, duration = SimpleRateThrottle.parse_rate(None, rate)
+    return num_requests, num_requests / duration
+
+
+def take(key, capacity, per_second):
+    """Take a token from the bucket. Returns (allowed, seconds to wait)."""
+    allowed, wait = token_bucket()(keys=[key], args=[capacity, per_second])
+    return bool(allowed), float(wait)
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    DRF throttle for views with a `throttle_scope`. Views without one, or
+    whose scope has no rate, are not throttled. Lets requests through if
+    Redis is unavailable.
+    """
+
+    def __init__(self):
+        self.wait_seconds = None
+
+    def get_cache_key(self, request, view, scope):
+        if request.user and request.user.is_authenticated:
+            ident = f"user:{request.user.pk}"
+        else:
+            ident = f"ip:{self.get_ident(request)}"
+        return f"{KEY_PREFIX}:{scope}:{ident}"
+
+    def allow_request(self, request, view):
+        scope = getattr(view, "throttle_scope", None)
+        rate = api_settings.DEFAULT_THROTTLE_RATES.get(scope) if scope else None
+        if not rate:
+            return True
+
+        capacity, per_second = parse_rate(rate)
+        try:
+            allowed, self.wait_seconds = take(self.get_cache_key(request, view, scope), capacity, per_second)
+        except RedisError:
+            logger.exception("Could not check the %s throttle, letting the request through", scope)
+            return True
+        return allowed
+
+    def wait(self):
+        return self.wait_seconds
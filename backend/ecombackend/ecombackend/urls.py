@@ -18,6 +18,7 @@ from django.contrib import admin
 from django.urls import path,include
 from django.conf import settings
 from django.conf.urls.static import static
+from .metrics import metrics_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -25,4 +26,5 @@ urlpatterns = [
     path("api/products/", include("products.urls")),
     path("api/orders/",include("orders.urls")),
     path("api/cart/",include("cart.urls")),
+    path("metrics/", metrics_view),
 ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
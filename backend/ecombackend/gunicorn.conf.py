@@ -0,0 +1,19 @@
+# gunicorn ecombackend.wsgi -c gunicorn.conf.py
+# Keeps the multiprocess metrics directory (ecombackend/metrics.py) clean.
+import glob
+import os
+
+from prometheus_client import multiprocess
+
+
+def on_starting(server):
+    # Samples left by a previous run would be added to this one's
+    directory = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if directory:
+        for path in glob.glob(os.path.join(directory, '*.db')):
+            os.remove(path)
+
+
+def child_exit(server, worker):
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,123 @@
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+
+from ecombackend.async_api import AsyncAPIView
+from users.authentication import load_user
+from .models import Order
+from .pagination import OrderPagination
+from .serializers import OrderSerializer, OrderListSerializer, BulkOrderStatusSerializer
+from .services import checkout, CheckoutError, transition_orders
+from .views import order_queryset, order_list_queryset, filter_orders, bulk_status_data
+
+
+# Async versions of orders.views, used when served by ecombackend.asgi
+
+async def paginated_orders(request, queryset):
+    paginator = OrderPagination()
+    page = await paginator.apaginate_queryset(queryset, request)
+    return JsonResponse(paginator.get_paginated_data(OrderListSerializer(page, many=True).data))
+
+
+# Checkout: Convert cart → order
+class CheckoutView(AsyncAPIView):
+    throttle_scope = "checkout"
+
+    async def post(self, request):
+        try:
+            # The confirmation email needs the full user, not the token's claims
+            user = await sync_to_async(load_user)(request.user.pk)
+            order = await sync_to_async(checkout)(
+                user,
+                request.data.get("payment_method"),
+                shipping_address=request.data.get("shipping_address", ""),
+            )
+        except CheckoutError as e:
+            return JsonResponse({"error": str(e)}, status=400)
+
+        order = await order_queryset().aget(pk=order.pk)
+        return JsonResponse({
+            "message": "Order created successfully",
+            "order": OrderSerializer(order).data,
+        }, status=201)
+
+
+# User sees only their orders
+class UserOrdersView(AsyncAPIView):
+
+    async def get(self, request):
+        orders = filter_orders(order_list_queryset().filter(user=request.user), request.query_params)
+        return await paginated_orders(request, orders)
+
+
+# Admin can see all orders
+class AdminOrdersView(AsyncAPIView):
+
+    async def get(self, request):
+        if not request.user.is_admin:
+            return JsonResponse({"error": "Admin only"}, status=403)
+
+        orders = filter_orders(order_list_queryset(), request.query_params)
+        return await paginated_orders(request, orders)
+
+
+# One order with its items, for its owner or an admin
+class OrderDetailView(AsyncAPIView):
+
+    async def get(self, request, order_id):
+        orders = order_queryset()
+        if not request.user.is_admin:
+            orders = orders.filter(user=request.user)
+
+        try:
+            order = await orders.aget(id=order_id)
+        except Order.DoesNotExist:
+            return JsonResponse({"error": "Order not found"}, status=404)
+
+        return JsonResponse(OrderSerializer(order).data)
+
+
+# Admin can update order status, along Order.TRANSITIONS
+class UpdateOrderStatusView(AsyncAPIView):
+
+    async def patch(self, request, order_id):
+        if not request.user.is_admin:
+            return JsonResponse({"error": "Admin only"}, status=403)
+
+        status_val = request.data.get("status")
+        if not status_val:
+            return JsonResponse({"error": "Status is required"}, status=400)
+
+        valid_statuses = [choice[0] for choice in Order.STATUS_CHOICES]
+        if status_val not in valid_statuses:
+            return JsonResponse({
+                "error": f"Invalid status. Valid statuses are: {', '.join(valid_statuses)}"
+            }, status=400)
+
+        updated, skipped = await sync_to_async(transition_orders)([order_id], status_val, changed_by=request.user)
+        if order_id in skipped:
+            if skipped[order_id] is None:
+                return JsonResponse({"error": "Order not found"}, status=404)
+            return JsonResponse({
+                "error": f"Cannot change status from {skipped[order_id]} to {status_val}"
+            }, status=409)
+
+        order = await order_queryset().aget(id=order_id)
+        return JsonResponse(OrderSerializer(order).data)
+
+
+# Admin moves many orders to one status at once (e.g. the evening SHIPPED run)
+class BulkOrderStatusView(AsyncAPIView):
+
+    async def post(self, request):
+        if not request.user.is_admin:
+            return JsonResponse({"error": "Admin only"}, status=403)
+
+        serializer = BulkOrderStatusSerializer(data=request.data)
+        if not serializer.is_valid():
+            return JsonResponse(serializer.errors, status=400)
+
+        status_val = serializer.validated_data["status"]
+        updated, skipped = await sync_to_async(transition_orders)(
+            serializer.validated_data["order_ids"], status_val, changed_by=request.user
+        )
+        return JsonResponse(bulk_status_data(status_val, updated, skipped))
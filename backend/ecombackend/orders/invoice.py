@@ -1,58 +1,136 @@
+import hashlib
+import io
+import posixpath
+from functools import lru_cache
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db.models import prefetch_related_objects
+from reportlab.lib import colors
 from reportlab.lib.pagesizes import A4
-from reportlab.pdfgen import canvas
+from reportlab.lib.styles import ParagraphStyle
 from reportlab.lib.units import mm
-import os
-from django.conf import settings
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+# Bump when the layout changes so cached PDFs are rendered again
+TEMPLATE_VERSION = 2
+INVOICE_DIR = "invoices"
+
 
+@lru_cache(maxsize=None)
+def fonts():
+    """
+    (regular, bold) font names, registered once per process.
 
-def generate_invoice_pdf(order):
-    invoice_dir = os.path.join(settings.MEDIA_ROOT, "invoices")
-    os.makedirs(invoice_dir, exist_ok=True)
+    INVOICE_FONT_PATH / INVOICE_BOLD_FONT_PATH can point to TTF files with
+    a ₹ glyph, the built-in Helvetica has none.
+    """
+    regular_path = getattr(settings, "INVOICE_FONT_PATH", None)
+    if not regular_path:
+        return "Helvetica", "Helvetica-Bold"
 
-    file_path = os.path.join(invoice_dir, f"invoice_{order.id}.pdf")
-    print("INVOICE PATH:", file_path)   # 👈 ADD THIS
+    pdfmetrics.registerFont(TTFont("InvoiceFont", regular_path))
+    bold_path = getattr(settings, "INVOICE_BOLD_FONT_PATH", None)
+    if not bold_path:
+        return "InvoiceFont", "InvoiceFont"
+    pdfmetrics.registerFont(TTFont("InvoiceFont-Bold", bold_path))
+    return "InvoiceFont", "InvoiceFont-Bold"
 
 
-    c = canvas.Canvas(file_path, pagesize=A4)
-    width, height = A4
+@lru_cache(maxsize=None)
+def styles():
+    regular, bold = fonts()
+    return {
+        "title": ParagraphStyle("title", fontName=bold, fontSize=18, leading=22),
+        "text": ParagraphStyle("text", fontName=regular, fontSize=10, leading=14),
+        "total": ParagraphStyle("total", fontName=bold, fontSize=12, leading=16),
+        "table": TableStyle([
+            ("FONTNAME", (0, 0), (-1, 0), bold),
+            ("FONTNAME", (0, 1), (-1, -1), regular),
+            ("FONTSIZE", (0, 0), (-1, -1), 10),
+            ("LINEBELOW", (0, 0), (-1, 0), 0.5, colors.black),
+            ("ALIGN", (1, 0), (-1, -1), "RIGHT"),
+            ("VALIGN", (0, 0), (-1, -1), "TOP"),
+        ]),
+    }
 
-    # Header
-    c.setFont("Helvetica-Bold", 18)
-    c.drawString(30 * mm, height - 30 * mm, "INVOICE")
 
-    # Order info
-    c.setFont("Helvetica", 10)
-    c.drawString(30 * mm, height - 45 * mm, f"Order ID: {order.id}")
-    c.drawString(30 * mm, height - 52 * mm, f"Date: {order.created_at.strftime('%d %b %Y')}")
-    c.drawString(30 * mm, height - 59 * mm, f"Payment Method: {order.payment_method}")
-    c.drawString(30 * mm, height - 66 * mm, f"Payment Status: {order.payment_status}")
+def revision_key(order):
+    """Content address of an invoice: changes whenever the order is saved."""
+    raw = f"{order.id}:{order.updated_at.isoformat()}:{TEMPLATE_VERSION}"
+    return hashlib.sha256(raw.encode()).hexdigest()[:32]
 
-    # Customer
-    c.drawString(30 * mm, height - 80 * mm, "Bill To:")
-    c.drawString(30 * mm, height - 87 * mm, order.user.username)
-    c.drawString(30 * mm, height - 94 * mm, order.shipping_address)
 
-    # Table header
-    y = height - 115 * mm
-    c.setFont("Helvetica-Bold", 10)
-    c.drawString(30 * mm, y, "Product")
-    c.drawString(110 * mm, y, "Qty")
-    c.drawString(130 * mm, y, "Price")
+def invoice_name(order):
+    return posixpath.join(INVOICE_DIR, str(order.id), f"{revision_key(order)}.pdf")
 
-    c.setFont("Helvetica", 10)
-    y -= 10
 
+def render_invoice_pdf(order):
+    """Render the invoice to bytes. `order.items` should have products prefetched."""
+    style = styles()
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(
+        buffer,
+        pagesize=A4,
+        leftMargin=30 * mm,
+        rightMargin=30 * mm,
+        topMargin=25 * mm,
+        bottomMargin=25 * mm,
+        title=f"Invoice #{order.id}",
+    )
+
+    story = [
+        Paragraph("INVOICE", style["title"]),
+        Spacer(1, 6 * mm),
+        Paragraph(f"Order ID: {order.id}", style["text"]),
+        Paragraph(f"Date: {order.created_at.strftime('%d %b %Y')}", style["text"]),
+        Paragraph(f"Payment Method: {order.payment_method}", style["text"]),
+        Paragraph(f"Payment Status: {order.payment_status}", style["text"]),
+        Spacer(1, 6 * mm),
+        Paragraph("Bill To:", style["text"]),
+        Paragraph(escape(order.user.username), style["text"]),
+        Paragraph(escape(order.shipping_address or ""), style["text"]),
+        Spacer(1, 8 * mm),
+    ]
+
+    rows = [["Product", "Qty", "Price"]]
     for item in order.items.all():
-        c.drawString(30 * mm, y, item.product.title)
-        c.drawString(110 * mm, y, str(item.quantity))
-        c.drawString(130 * mm, y, f"₹{item.price * item.quantity}")
-        y -= 10
+        rows.append([
+            Paragraph(escape(item.product.title), style["text"]),
+            str(item.quantity),
+            f"₹{item.subtotal}",
+        ])
+    # repeatRows keeps the header on every page when long orders split
+    table = Table(rows, colWidths=[100 * mm, 20 * mm, 30 * mm], repeatRows=1)
+    table.setStyle(style["table"])
+    story += [table, Spacer(1, 6 * mm), Paragraph(f"Total Amount: ₹{order.total_price}", style["total"])]
+
+    doc.build(story)
+    return buffer.getvalue()
+
 
-    # Total
-    c.setFont("Helvetica-Bold", 12)
-    c.drawString(30 * mm, y - 10, f"Total Amount: ₹{order.total_price}")
+def get_invoice(order):
+    """
+    Storage name of the order's invoice, rendering it only if this revision
+    (order id + updated_at) hasn't been rendered yet. Older revisions of
+    the same order are removed.
+    """
+    name = invoice_name(order)
+    if default_storage.exists(name):
+        return name
 
-    c.showPage()
-    c.save()
+    prefetch_related_objects([order], "items__product")
+    saved = default_storage.save(name, ContentFile(render_invoice_pdf(order)))
+    if saved != name:
+        # Rendered concurrently by another worker, keep theirs
+        default_storage.delete(saved)
 
-    return file_path
+    directory = posixpath.dirname(name)
+    for filename in default_storage.listdir(directory)[1]:
+        if filename != posixpath.basename(name):
+            default_storage.delete(posixpath.join(directory, filename))
+    return name
@@ -0,0 +1,176 @@
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from redis.exceptions import RedisError
+
+from ecombackend import throttling
+from .invoice import get_invoice
+from .models import OutboundEmail
+
+logger = logging.getLogger(__name__)
+
+# How long a claimed batch is hidden from other drainers before it is retried
+CLAIM_LEASE = timedelta(minutes=5)
+# Share of the lease a drain may spend sending, the rest is margin
+LEASE_SAFETY = 0.8
+
+
+def enqueue_order_confirmation(email, order_id, total):
+    return OutboundEmail.objects.create(
+        to=email,
+        order_id=order_id,
+        subject=f"Invoice for Order #{order_id}",
+        body=(
+            f"Thank you for your order!\n\n"
+            f"Order ID: {order_id}\n"
+            f"Total: ₹{total}\n\n"
+            "Please find your invoice attached."
+        ),
+    )
+
+
+def claim_batch(batch_size):
+    """Lease up to `batch_size` due emails so concurrent drainers don't send them twice."""
+    now = timezone.now()
+    with transaction.atomic():
+        ids = list(
+            OutboundEmail.objects.select_for_update(skip_locked=True)
+            .filter(status="PENDING", next_attempt_at__lte=now)
+            .order_by("next_attempt_at")
+            .values_list("id", flat=True)[:batch_size]
+        )
+        OutboundEmail.objects.filter(id__in=ids).update(
+            attempts=F("attempts") + 1, next_attempt_at=now + CLAIM_LEASE
+        )
+    return list(OutboundEmail.objects.filter(id__in=ids).select_related("order__user").order_by("id"))
+
+
+def build_message(outbound, connection):
+    message = EmailMessage(
+        outbound.subject,
+        outbound.body,
+        settings.DEFAULT_FROM_EMAIL,
+        [outbound.to],
+        connection=connection,
+    )
+    if outbound.order is not None:
+        invoice_name = get_invoice(outbound.order)
+        with default_storage.open(invoice_name, "rb") as pdf:
+            message.attach(f"invoice_{outbound.order_id}.pdf", pdf.read(), "application/pdf")
+    return message
+
+
+class SendRate:
+    """
+    EMAIL_RATE_LIMIT across every drainer: one token bucket in Redis
+    (ecombackend.throttling) shared by all workers and overlapping beat runs.
+    Falls back to pacing this process alone if Redis is unavailable.
+    """
+
+    key = f"{throttling.KEY_PREFIX}:email:send"
+
+    def __init__(self, rate_limit):
+        self.rate_limit = rate_limit
+        # Up to a second's worth of messages may go out back to back
+        self.capacity = max(1, int(rate_limit))
+        self.local = False
+        self.next_slot = time.monotonic()
+
+    def take(self):
+        """(allowed, seconds to wait)"""
+        if not self.local:
+            try:
+                return throttling.take(self.key, self.capacity, self.rate_limit)
+            except RedisError as e:
+                logger.warning("Email rate limiter unavailable, pacing this worker only: %s", e)
+                self.local = True
+
+        now = time.monotonic()
+        if self.next_slot > now:
+            return False, self.next_slot - now
+        self.next_slot = max(self.next_slot, now) + 1.0 / self.rate_limit
+        return True, 0.0
+
+    def wait(self, deadline):
+        """Block until a message may be sent. False if that would be after `deadline` (monotonic)."""
+        while True:
+            allowed, delay = self.take()
+            if allowed:
+                return True
+            if time.monotonic() + delay > deadline:
+                return False
+            time.sleep(delay)
+
+
+def release_claims(outbound_ids):
+    """Hand claimed but unsent emails back to the queue, as if never attempted."""
+    OutboundEmail.objects.filter(id__in=outbound_ids).update(
+        attempts=F("attempts") - 1, next_attempt_at=timezone.now()
+    )
+
+
+def drain_outbox(batch_size=None, rate_limit=None):
+    """
+    Send one batch of queued emails over a single SMTP connection.
+
+    - At most EMAIL_BATCH_SIZE messages per call, and no more than fit in
+      half of CLAIM_LEASE at EMAIL_RATE_LIMIT.
+    - All drainers together send at most EMAIL_RATE_LIMIT messages per
+      second (SendRate). If sharing the rate slows a drain down, whatever
+      is still unsent when the lease is about to run out is handed back
+      to the queue instead of being sent after another drainer reclaimed it.
+    - A failed message is retried after EMAIL_RETRY_BACKOFF * 2^(attempts - 1)
+      seconds and marked FAILED after EMAIL_MAX_ATTEMPTS.
+
+    Returns (sent, failed) counts for this batch.
+    """
+    batch_size = batch_size or getattr(settings, "EMAIL_BATCH_SIZE", 100)
+    rate_limit = rate_limit or getattr(settings, "EMAIL_RATE_LIMIT", 10)
+    max_attempts = getattr(settings, "EMAIL_MAX_ATTEMPTS", 5)
+    backoff = getattr(settings, "EMAIL_RETRY_BACKOFF", 60)
+
+    lease = CLAIM_LEASE.total_seconds()
+    batch = claim_batch(max(1, min(batch_size, int(rate_limit * lease / 2))))
+    if not batch:
+        return 0, 0
+
+    # Margin for the last send and the status update
+    deadline = time.monotonic() + lease * LEASE_SAFETY
+    send_rate = SendRate(rate_limit)
+    sent = failed = 0
+    connection = get_connection(fail_silently=False)
+    try:
+        for position, outbound in enumerate(batch):
+            if not send_rate.wait(deadline):
+                unsent = [outbound.id for outbound in batch[position:]]
+                logger.warning("Email lease running out, returning %s unsent emails to the queue", len(unsent))
+                release_claims(unsent)
+                break
+
+            try:
+                # No-op while the connection is up, reconnects after a failure
+                connection.open()
+                connection.send_messages([build_message(outbound, connection)])
+            except Exception as e:
+                connection.close()
+                logger.warning("Sending email %s failed (attempt %s): %s", outbound.id, outbound.attempts, e)
+                failed += 1
+                if outbound.attempts >= max_attempts:
+                    OutboundEmail.objects.filter(pk=outbound.pk).update(status="FAILED", last_error=str(e))
+                else:
+                    retry_at = timezone.now() + timedelta(seconds=backoff * 2 ** (outbound.attempts - 1))
+                    OutboundEmail.objects.filter(pk=outbound.pk).update(next_attempt_at=retry_at, last_error=str(e))
+                continue
+
+            OutboundEmail.objects.filter(pk=outbound.pk).update(status="SENT", sent_at=timezone.now(), last_error="")
+            sent += 1
+    finally:
+        connection.close()
+    return sent, failed
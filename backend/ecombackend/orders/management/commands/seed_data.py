@@ -0,0 +1,350 @@
+import csv
+import io
+import random
+import time
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from itertools import accumulate
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, models, transaction
+from django.utils import timezone
+from django.utils.text import slugify
+
+from cart.models import Cart, CartItem
+from orders.models import Order, OrderItem
+from products import cache
+from products.models import Category, Product
+
+User = get_user_model()
+
+DEPARTMENTS = [
+    'Electronics', 'Computers', 'Phones', 'Audio', 'Cameras', 'Home', 'Kitchen', 'Furniture',
+    'Garden', 'Tools', 'Toys', 'Books', 'Music', 'Movies', 'Sports', 'Outdoors', 'Fitness',
+    'Clothing', 'Shoes', 'Jewelry', 'Beauty', 'Health', 'Grocery', 'Pets', 'Baby', 'Automotive',
+    'Office', 'Crafts', 'Travel', 'Gaming',
+]
+ADJECTIVES = [
+    'Classic', 'Compact', 'Deluxe', 'Eco', 'Ergonomic', 'Essential', 'Heavy-Duty', 'Lightweight',
+    'Modern', 'Portable', 'Premium', 'Pro', 'Rugged', 'Slim', 'Smart', 'Vintage', 'Wireless',
+]
+MATERIALS = [
+    'Aluminium', 'Bamboo', 'Canvas', 'Ceramic', 'Cotton', 'Glass', 'Leather', 'Linen', 'Oak',
+    'Plastic', 'Rubber', 'Silicone', 'Steel', 'Wool',
+]
+NOUNS = [
+    'Backpack', 'Blender', 'Bottle', 'Chair', 'Charger', 'Desk', 'Headphones', 'Jacket', 'Kettle',
+    'Keyboard', 'Lamp', 'Mat', 'Mug', 'Organizer', 'Pan', 'Shelf', 'Sneakers', 'Speaker', 'Tent',
+    'Watch',
+]
+CITIES = ['Mumbai', 'Delhi', 'Bengaluru', 'Hyderabad', 'Chennai', 'Kolkata', 'Pune', 'Jaipur', 'Lucknow', 'Kochi']
+
+# Lines per order (1-8) and units per line (1-4), as relative weights
+ITEMS_PER_ORDER = (45, 25, 13, 7, 4, 3, 2, 1)
+QUANTITIES = (80, 12, 5, 3)
+PAYMENT_METHODS = ('COD', 'MOCK')
+PAYMENT_WEIGHTS = (40, 60)
+# Cumulative, so random.choices doesn't add them up on every call
+LINE_COUNTS = range(1, len(ITEMS_PER_ORDER) + 1)
+LINE_COUNT_CUM = list(accumulate(ITEMS_PER_ORDER))
+UNITS = range(1, len(QUANTITIES) + 1)
+UNITS_CUM = list(accumulate(QUANTITIES))
+PAYMENT_CUM = list(accumulate(PAYMENT_WEIGHTS))
+CANCELLED_SHARE = 0.05
+# Users' order counts are skewed too, but less than product popularity
+USER_ZIPF = 0.7
+CATEGORY_ZIPF = 0.8
+PASSWORD = 'seed-password'
+
+ORDER_COLUMNS = ['id', 'user_id', 'total_price', 'payment_method', 'payment_status', 'status',
+                 'shipping_address', 'created_at', 'updated_at']
+ORDER_ITEM_COLUMNS = ['order_id', 'product_id', 'quantity', 'price']
+
+
+def zipf_cum_weights(n, exponent, rng):
+    """Cumulative weights for n items, the k-th most popular weighing 1/k**exponent, ranks shuffled."""
+    weights = [1 / rank ** exponent for rank in range(1, n + 1)]
+    rng.shuffle(weights)
+    return list(accumulate(weights))
+
+
+def batches(total, size):
+    for start in range(0, total, size):
+        yield start, min(start + size, total)
+
+
+@contextmanager
+def historical_timestamps(*model_classes):
+    """Let bulk_create keep the created_at / updated_at values we set."""
+    changed = []
+    for model in model_classes:
+        for field in model._meta.concrete_fields:
+            if isinstance(field, models.DateTimeField) and (field.auto_now or field.auto_now_add):
+                changed.append((field, field.auto_now, field.auto_now_add))
+                field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in changed:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class Command(BaseCommand):
+    help = 'Fill the database with a large, realistic and reproducible data set for performance work'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10000, help='Users (the first one is an admin)')
+        parser.add_argument('--categories', type=int, default=30, help='Categories')
+        parser.add_argument('--products', type=int, default=20000, help='Products')
+        parser.add_argument('--orders', type=int, default=100000, help='Orders (1-8 lines each, ~2 on average)')
+        parser.add_argument('--carts', type=int, default=2000, help='Users with items in their cart')
+        parser.add_argument('--days', type=int, default=365, help='Orders and products are spread over this many days')
+        parser.add_argument('--end-date', type=date.fromisoformat, default=None, help='Last day of the data, YYYY-MM-DD (default: today)')
+        parser.add_argument('--zipf', type=float, default=1.1, help='Exponent of product popularity, higher is more skewed')
+        parser.add_argument('--seed', type=int, default=42, help='Same seed, same options and end date give the same data')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows per INSERT / COPY')
+        parser.add_argument('--copy', action='store_true', help='Load orders and order lines with PostgreSQL COPY (fastest)')
+        parser.add_argument('--prefix', type=str, default='seed', help='Prefix of the generated usernames, SKUs and categories')
+
+    def handle(self, *args, **options):
+        if options['copy'] and connection.vendor != 'postgresql':
+            raise CommandError('--copy needs PostgreSQL')
+        if options['users'] < 1 or options['products'] < 1 or options['categories'] < 1:
+            raise CommandError('--users, --products and --categories must be at least 1')
+        if options['carts'] > options['users']:
+            raise CommandError('--carts cannot exceed --users')
+        self.prefix = options['prefix']
+        if User.objects.filter(username=f'{self.prefix}_user_0').exists():
+            raise CommandError(f"Data with prefix '{self.prefix}' already exists, use another --prefix or a fresh database")
+
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.days = options['days']
+        end_date = options['end_date'] or timezone.localdate()
+        self.end = timezone.make_aware(datetime.combine(end_date + timedelta(days=1), datetime.min.time()))
+
+        started = time.perf_counter()
+        with transaction.atomic():
+            user_ids = self.step('users', self.create_users, options['users'])
+            category_ids = self.step('categories', self.create_categories, options['categories'])
+            products = self.step('products', self.create_products, options['products'], category_ids, user_ids[0])
+            create_orders = self.copy_orders if options['copy'] else self.insert_orders
+            self.step('orders', create_orders, options['orders'], user_ids, products, options['zipf'])
+            self.step('carts', self.create_carts, options['carts'], user_ids, products, options['zipf'])
+
+        # Fresh planner statistics, so EXPLAIN reflects the new sizes
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                for model in (User, Category, Product, Order, OrderItem, Cart, CartItem):
+                    cursor.execute(f'ANALYZE {connection.ops.quote_name(model._meta.db_table)}')
+        cache.invalidate()
+
+        self.stdout.write(self.style.SUCCESS(f'Done in {time.perf_counter() - started:.1f}s'))
+        self.stdout.write(f"Log in as {self.prefix}_user_0 (admin) or any {self.prefix}_user_<n> with password '{PASSWORD}'")
+
+    def step(self, name, create, *args):
+        started = time.perf_counter()
+        result, rows = create(*args)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(f'{name}: {rows} rows in {elapsed:.1f}s ({rows / elapsed if elapsed else 0:.0f} rows/s)')
+        return result
+
+    def random_moment(self, skew=1.0):
+        """A moment within the last `days` days, skew > 1 favouring recent ones (growing shop)."""
+        return self.end - timedelta(seconds=self.days * 86400 * self.rng.random() ** skew)
+
+    def create_users(self, count):
+        # Hashing is slow on purpose: every user gets the same hash
+        password = make_password(PASSWORD, salt=f'{self.prefix}{self.rng.getrandbits(32)}')
+        ids = []
+        for start, stop in batches(count, self.batch_size):
+            users = User.objects.bulk_create([
+                User(
+                    username=f'{self.prefix}_user_{i}',
+                    email=f'{self.prefix}_user_{i}@example.com',
+                    password=password,
+                    is_admin=i == 0,
+                    date_joined=self.random_moment(),
+                )
+                for i in range(start, stop)
+            ])
+            ids.extend(user.pk for user in users)
+        return ids, count
+
+    def create_categories(self, count):
+        names = [
+            DEPARTMENTS[i] if i < len(DEPARTMENTS) else f'{DEPARTMENTS[i % len(DEPARTMENTS)]} {i // len(DEPARTMENTS) + 1}'
+            for i in range(count)
+        ]
+        categories = Category.objects.bulk_create([
+            Category(name=f'{self.prefix.title()} {name}', slug=slugify(f'{self.prefix} {name}')) for name in names
+        ])
+        return [category.pk for category in categories], count
+
+    def create_products(self, count, category_ids, owner_id):
+        """Returns [(id, price, is_active)]."""
+        rng = self.rng
+        category_weights = zipf_cum_weights(len(category_ids), CATEGORY_ZIPF, rng)
+        products = []
+        with historical_timestamps(Product):
+            for start, stop in batches(count, self.batch_size):
+                batch = []
+                for i in range(start, stop):
+                    noun = rng.choice(NOUNS)
+                    created_at = self.random_moment()
+                    roll = rng.random()
+                    # ~3% not stock-tracked, ~5% sold out
+                    stock = None if roll < 0.03 else 0 if roll < 0.08 else int(rng.paretovariate(1.2) * 10)
+                    batch.append(Product(
+                        sku=f'{self.prefix.upper()}-{i:08d}',
+                        title=f'{rng.choice(ADJECTIVES)} {rng.choice(MATERIALS)} {noun}',
+                        description=f'A {noun.lower()} for everyday use. Model {i}.',
+                        # Log-normal: most items cheap, a long tail of expensive ones
+                        price=Decimal(max(round(rng.lognormvariate(3.5, 1.0)), 1)) - Decimal('0.01'),
+                        category_id=rng.choices(category_ids, cum_weights=category_weights)[0],
+                        created_by_id=owner_id,
+                        created_at=created_at,
+                        updated_at=created_at,
+                        is_active=rng.random() > 0.03,
+                        stock=min(stock, 5000) if stock is not None else None,
+                    ))
+                Product.objects.bulk_create(batch)
+                products.extend((product.pk, product.price, product.is_active) for product in batch)
+        return products, count
+
+    def generate_orders(self, count, user_ids, products, zipf):
+        """Yields (order fields, [(product_id, quantity, price)]) in batches of batch_size orders."""
+        rng = self.rng
+        product_weights = zipf_cum_weights(len(products), zipf, rng)
+        user_weights = zipf_cum_weights(len(user_ids), USER_ZIPF, rng)
+
+        for start, stop in batches(count, self.batch_size):
+            size = stop - start
+            buyers = rng.choices(user_ids, cum_weights=user_weights, k=size)
+            batch = []
+            for user_id in buyers:
+                picked = rng.choices(products, cum_weights=product_weights, k=rng.choices(LINE_COUNTS, cum_weights=LINE_COUNT_CUM)[0])
+                lines = {}
+                for product_id, price, _ in picked:
+                    lines.setdefault(product_id, (product_id, rng.choices(UNITS, cum_weights=UNITS_CUM)[0], price))
+                lines = list(lines.values())
+
+                created_at = self.random_moment(skew=1.6)
+                payment_method = rng.choices(PAYMENT_METHODS, cum_weights=PAYMENT_CUM)[0]
+                status, payment_status = self.status_of(created_at, payment_method)
+                batch.append(({
+                    'user_id': user_id,
+                    'total_price': sum(price * quantity for _, quantity, price in lines),
+                    'payment_method': payment_method,
+                    'payment_status': payment_status,
+                    'status': status,
+                    'shipping_address': f'{rng.randint(1, 999)} Main Road, {rng.choice(CITIES)}',
+                    'created_at': created_at,
+                    'updated_at': created_at + timedelta(hours=rng.randint(0, 72)),
+                }, lines))
+            yield batch
+
+    def status_of(self, created_at, payment_method):
+        """Older orders are further along Order.TRANSITIONS."""
+        age = self.end - created_at
+        paid = 'SUCCESS' if payment_method == 'MOCK' else 'UNPAID'
+        if self.rng.random() < CANCELLED_SHARE:
+            return 'CANCELLED', paid
+        if age > timedelta(days=7):
+            return 'DELIVERED', 'SUCCESS'
+        if age > timedelta(days=3):
+            return 'SHIPPED', paid
+        if payment_method == 'MOCK':
+            return 'PAID', paid
+        return ('APPROVED' if age > timedelta(days=1) else 'PENDING'), paid
+
+    def insert_orders(self, count, user_ids, products, zipf):
+        rows = 0
+        with historical_timestamps(Order):
+            for batch in self.generate_orders(count, user_ids, products, zipf):
+                orders = Order.objects.bulk_create([Order(**fields) for fields, _ in batch])
+                items = [
+                    OrderItem(order_id=order.pk, product_id=product_id, quantity=quantity, price=price)
+                    for order, (_, lines) in zip(orders, batch)
+                    for product_id, quantity, price in lines
+                ]
+                OrderItem.objects.bulk_create(items)
+                rows += len(orders) + len(items)
+        return None, rows
+
+    def copy_orders(self, count, user_ids, products, zipf):
+        rows = 0
+        order_table = Order._meta.db_table
+        with connection.cursor() as cursor:
+            for batch in self.generate_orders(count, user_ids, products, zipf):
+                # Take the ids from the sequence so the lines can point at their order
+                cursor.execute(
+                    "SELECT nextval(pg_get_serial_sequence(%s, 'id')) FROM generate_series(1, %s)",
+                    [order_table, len(batch)],
+                )
+                order_ids = [row[0] for row in cursor.fetchall()]
+                order_rows = [
+                    [order_id] + [fields[column] for column in ORDER_COLUMNS[1:]]
+                    for order_id, (fields, _) in zip(order_ids, batch)
+                ]
+                item_rows = [
+                    [order_id, product_id, quantity, price]
+                    for order_id, (_, lines) in zip(order_ids, batch)
+                    for product_id, quantity, price in lines
+                ]
+                self.copy_into(cursor, order_table, ORDER_COLUMNS, order_rows)
+                self.copy_into(cursor, OrderItem._meta.db_table, ORDER_ITEM_COLUMNS, item_rows)
+                rows += len(order_rows) + len(item_rows)
+        return None, rows
+
+    def copy_into(self, cursor, table, columns, rows):
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)
+        buffer.seek(0)
+        quote = connection.ops.quote_name
+        sql = f"COPY {quote(table)} ({', '.join(quote(column) for column in columns)}) FROM STDIN WITH (FORMAT csv)"
+        raw = cursor.cursor
+        if hasattr(raw, 'copy_expert'):
+            # psycopg2
+            raw.copy_expert(sql, buffer)
+        else:
+            # psycopg 3
+            with raw.copy(sql) as copy:
+                copy.write(buffer.getvalue())
+
+    def create_carts(self, count, user_ids, products, zipf):
+        rng = self.rng
+        active = [product for product in products if product[2]]
+        if not active or not count:
+            return None, 0
+        product_weights = zipf_cum_weights(len(active), zipf, rng)
+        owners = rng.sample(user_ids, count)
+        rows = 0
+
+        with historical_timestamps(Cart):
+            for start, stop in batches(count, self.batch_size):
+                carts, cart_lines = [], []
+                for user_id in owners[start:stop]:
+                    picked = rng.choices(active, cum_weights=product_weights, k=rng.randint(1, 5))
+                    lines = {product_id: (rng.choices(UNITS, cum_weights=UNITS_CUM)[0], price)
+                             for product_id, price, _ in picked}
+                    carts.append(Cart(
+                        user_id=user_id,
+                        created_at=self.random_moment(skew=3),
+                        item_count=len(lines),
+                        total_quantity=sum(quantity for quantity, _ in lines.values()),
+                        subtotal=sum(quantity * price for quantity, price in lines.values()),
+                    ))
+                    cart_lines.append(lines)
+                Cart.objects.bulk_create(carts)
+                items = [
+                    CartItem(cart_id=cart.pk, product_id=product_id, quantity=quantity)
+                    for cart, lines in zip(carts, cart_lines)
+                    for product_id, (quantity, _) in lines.items()
+                ]
+                CartItem.objects.bulk_create(items)
+                rows += len(carts) + len(items)
+        return None, rows
@@ -1,5 +1,6 @@
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
 from products.models import Product
 
 class Order(models.Model):
@@ -12,7 +13,17 @@ class Order(models.Model):
         ("CANCELLED","Cancelled")
     )
 
-        
+    # status -> statuses an order may move to from there. COD orders go
+    # PENDING -> APPROVED -> SHIPPED, paid ones PAID -> SHIPPED.
+    TRANSITIONS = {
+        "PENDING": ("APPROVED", "PAID", "CANCELLED"),
+        "APPROVED": ("PAID", "SHIPPED", "CANCELLED"),
+        "PAID": ("SHIPPED", "CANCELLED"),
+        "SHIPPED": ("DELIVERED",),
+        "DELIVERED": (),
+        "CANCELLED": (),
+    }
+
     PAYMENT_METHOD_CHOICES = (
         ("COD", "Cash on Delivery"),
         ("MOCK", "Mock Online Payment"),
@@ -36,9 +47,42 @@ class Order(models.Model):
     shipping_address = models.TextField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # UserOrdersView
+            models.Index(fields=["user", "-created_at", "-id"], name="order_user_recent_idx"),
+            # AdminOrdersView, optionally filtered by status
+            models.Index(fields=["-created_at", "-id"], name="order_recent_idx"),
+            models.Index(fields=["status", "-created_at", "-id"], name="order_status_recent_idx"),
+        ]
     
     def __str__(self):
         return f"Order {self.id} by {self.user.username}"
+
+    @classmethod
+    def allowed_from(cls, status):
+        """Statuses an order can move to `status` from."""
+        return [source for source, targets in cls.TRANSITIONS.items() if status in targets]
+
+
+class OrderStatusChange(models.Model):
+    """One status transition of an order, written by orders.services.transition_orders."""
+
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name="status_history")
+    from_status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES)
+    to_status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES)
+    changed_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True)
+    changed_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ["changed_at", "id"]
+        indexes = [
+            models.Index(fields=["order", "changed_at"], name="order_status_change_idx"),
+        ]
+
+    def __str__(self):
+        return f"Order {self.order_id}: {self.from_status} -> {self.to_status}"
     
 class OrderItem(models.Model):
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name="items")
@@ -51,4 +95,39 @@ class OrderItem(models.Model):
         return self.price * self.quantity
 
     def __str__(self):
-        return f"{self.product.title} x {self.quantity}"
\ No newline at end of file
+        return f"{self.product.title} x {self.quantity}"
+
+
+class OutboundEmail(models.Model):
+    """Mail waiting to be sent in batches by orders.mailer.drain_outbox."""
+
+    STATUS_CHOICES = (
+        ("PENDING", "Pending"),
+        ("SENT", "Sent"),
+        ("FAILED", "Failed"),
+    )
+
+    to = models.EmailField()
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    # Attach this order's invoice when sending
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, null=True, blank=True, related_name="emails")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="PENDING")
+    attempts = models.PositiveIntegerField(default=0)
+    # Earliest time the next attempt may run, also the lease while a batch is sending
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["next_attempt_at"],
+                name="outbound_email_due_idx",
+                condition=models.Q(status="PENDING"),
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} -> {self.to}"
@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import Order, OrderItem
+from .models import Order, OrderItem, OrderStatusChange
 from products.serializers import ProductSerializer
 
 
@@ -11,18 +11,55 @@ class OrderItemSerializer(serializers.ModelSerializer):
         fields = ["id", "product", "quantity", "price", "subtotal"]
 
 
+class OrderStatusChangeSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = OrderStatusChange
+        fields = ["from_status", "to_status", "changed_by", "changed_at"]
+
+
 class OrderSerializer(serializers.ModelSerializer):
     items = OrderItemSerializer(many=True, read_only=True)
+    status_history = OrderStatusChangeSerializer(many=True, read_only=True)
     user = serializers.SerializerMethodField()
     total_amount = serializers.DecimalField(source="total_price", max_digits=10, decimal_places=2, read_only=True)
 
     class Meta:
         model = Order
-        fields = ["id", "status", "total_price", "total_amount", "items", "user", "shipping_address", "payment_method", "created_at"]
-    
+        fields = ["id", "status", "total_price", "total_amount", "items", "user", "shipping_address", "payment_method", "status_history", "created_at"]
+
     def get_user(self, obj):
         return {
             "id": obj.user.id,
             "username": obj.user.username,
             "email": obj.user.email,
         }
+
+
+# Compact order for the paginated lists, full detail is on /api/orders/<id>/
+class OrderListSerializer(serializers.ModelSerializer):
+    item_count = serializers.IntegerField(read_only=True)
+    user = serializers.SerializerMethodField()
+    total_amount = serializers.DecimalField(source="total_price", max_digits=10, decimal_places=2, read_only=True)
+
+    class Meta:
+        model = Order
+        fields = ["id", "status", "payment_status", "payment_method", "total_price", "total_amount", "item_count", "user", "created_at"]
+
+    def get_user(self, obj):
+        return {"id": obj.user_id, "username": obj.user.username}
+
+
+class OrderFilterSerializer(serializers.Serializer):
+    status = serializers.ChoiceField(choices=Order.STATUS_CHOICES, required=False)
+    payment_status = serializers.ChoiceField(choices=Order.PAYMENT_STATUS_CHOICES, required=False)
+    payment_method = serializers.ChoiceField(choices=Order.PAYMENT_METHOD_CHOICES, required=False)
+    # Inclusive, in the server's time zone
+    date_from = serializers.DateField(required=False)
+    date_to = serializers.DateField(required=False)
+
+
+class BulkOrderStatusSerializer(serializers.Serializer):
+    order_ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), min_length=1, max_length=10000
+    )
+    status = serializers.ChoiceField(choices=Order.STATUS_CHOICES)
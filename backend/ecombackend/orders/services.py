@@ -0,0 +1,141 @@
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from cart.models import Cart, CartItem
+from ecombackend.metrics import ORDERS_CREATED
+from products import inventory
+from .mailer import enqueue_order_confirmation
+from .models import Order, OrderItem, OrderStatusChange
+
+
+# payment_method -> (payment_status, order status)
+PAYMENT_FLOW = {
+    "COD": ("UNPAID", "PENDING"),
+    "MOCK": ("SUCCESS", "PAID"),
+}
+
+
+class CheckoutError(Exception):
+    """Checkout rejected because of the request or the cart contents."""
+
+
+def checkout(user, payment_method, shipping_address=""):
+    """
+    Convert the user's cart into an order in a single transaction.
+
+    The cart row is locked first, so a concurrent double-submit waits here
+    and then finds an empty cart instead of creating a second order. The
+    round trips are fixed regardless of cart size: lock cart, lock items,
+    take stock, insert order, bulk insert items, empty the cart.
+    """
+    if payment_method not in PAYMENT_FLOW:
+        raise CheckoutError("Invalid payment method")
+    payment_status, order_status = PAYMENT_FLOW[payment_method]
+
+    with transaction.atomic():
+        cart = Cart.objects.select_for_update().filter(user=user).first()
+        if cart is None:
+            raise CheckoutError("Cart is empty")
+
+        cart_items = list(
+            CartItem.objects.select_for_update(of=("self",))
+            .filter(cart=cart)
+            .select_related("product")
+            .order_by("pk")
+        )
+        if not cart_items:
+            raise CheckoutError("Cart has no items")
+
+        total = Decimal("0")
+        for item in cart_items:
+            if not item.product.is_active:
+                raise CheckoutError(f"Product '{item.product.title}' is not available")
+            total += item.product.price * item.quantity
+
+        if total <= 0:
+            raise CheckoutError("Order total must be greater than zero")
+
+        try:
+            inventory.commit(user, cart_items)
+        except inventory.OutOfStock as e:
+            raise CheckoutError(str(e))
+
+        order = Order.objects.create(
+            user=user,
+            total_price=total,
+            shipping_address=shipping_address,
+            payment_method=payment_method,
+            payment_status=payment_status,
+            status=order_status,
+        )
+        OrderItem.objects.bulk_create([
+            OrderItem(
+                order=order,
+                product=item.product,
+                quantity=item.quantity,
+                price=item.product.price,
+            )
+            for item in cart_items
+        ])
+        CartItem.objects.filter(cart=cart).delete()
+        Cart.objects.filter(pk=cart.pk).update(item_count=0, total_quantity=0, subtotal=0)
+        transaction.on_commit(ORDERS_CREATED.labels(payment_method).inc)
+
+        # Written with the order, so it can't be lost between commit and a
+        # broker; drain_email_outbox sends it with the next batch
+        if user.email:
+            enqueue_order_confirmation(user.email, order.id, order.total_price)
+
+    return order
+
+
+def transition_orders(order_ids, status, changed_by=None):
+    """
+    Move the given orders to `status` where Order.TRANSITIONS allows it.
+
+    One conditional UPDATE (`WHERE status IN allowed_from`) changes every
+    eligible order and returns its previous status, the history rows are
+    written with one bulk_create. Orders that are missing or can't make the
+    transition are left alone. Returns (updated_ids, skipped) where skipped
+    maps each remaining id to its current status (None if there's no such order).
+    """
+    order_ids = list(dict.fromkeys(order_ids))
+    table = Order._meta.db_table
+    now = timezone.now()
+
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                UPDATE {table} AS o
+                SET status = %s, updated_at = %s
+                FROM (
+                    SELECT id, status FROM {table}
+                    WHERE id = ANY(%s) AND status = ANY(%s)
+                    FOR UPDATE
+                ) AS previous
+                WHERE o.id = previous.id
+                RETURNING o.id, previous.status
+                """,
+                [status, now, order_ids, Order.allowed_from(status)],
+            )
+            changed = cursor.fetchall()
+
+        OrderStatusChange.objects.bulk_create([
+            OrderStatusChange(
+                order_id=order_id,
+                from_status=from_status,
+                to_status=status,
+                changed_by=changed_by,
+                changed_at=now,
+            )
+            for order_id, from_status in changed
+        ])
+
+    updated_ids = {order_id for order_id, _ in changed}
+    skipped = {order_id: None for order_id in order_ids if order_id not in updated_ids}
+    if skipped:
+        skipped.update(Order.objects.filter(pk__in=skipped).values_list("pk", "status"))
+    return [order_id for order_id in order_ids if order_id in updated_ids], skipped
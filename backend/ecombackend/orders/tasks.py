@@ -1,31 +1,16 @@
 from celery import shared_task
-from django.core.mail import EmailMessage
-from django.conf import settings
-from .invoice import generate_invoice_pdf
-from .models import Order
+from .mailer import drain_outbox, enqueue_order_confirmation
 
 
 @shared_task
 def send_order_confirmation_email(email, order_id, total):
-    order = Order.objects.get(id=order_id)
-    pdf_path = generate_invoice_pdf(order)
+    # Checkout now writes the outbox row itself (orders.services), this only
+    # takes the messages still on the broker from before that
+    enqueue_order_confirmation(email, order_id, total)
+    return "Invoice email queued"
 
-    subject = f"Invoice for Order #{order.id}"
-    body = (
-        f"Thank you for your order!\n\n"
-        f"Order ID: {order.id}\n"
-        f"Total: ₹{total}\n\n"
-        "Please find your invoice attached."
-    )
 
-    mail = EmailMessage(
-        subject,
-        body,
-        settings.DEFAULT_FROM_EMAIL,
-        [email],
-    )
-
-    mail.attach_file(pdf_path)
-    mail.send()
-
-    return "Invoice email sent"
+@shared_task
+def drain_email_outbox():
+    sent, failed = drain_outbox()
+    return f"Sent {sent} emails, {failed} failed"
@@ -1,3 +1,294 @@
+import csv
+import io
+import json
+from datetime import datetime
+from decimal import Decimal
+
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from cart import services as cart_services
+from cart.models import Cart, CartItem
+from ecombackend.testing import QueryCountMixin, reset_throttles
+from products.models import Category, Product
+from products.tests import make_product
+from users.models import User
+from users.serializers import CustomTokenObtainPairSerializer
+from .models import Order, OrderItem, OrderStatusChange, OutboundEmail
+from .services import CheckoutError, checkout, transition_orders
+from .views import ORDER_EXPORT_FIELDS
+
+
+def place_order(user, products, quantity=1):
+    for product in products:
+        cart_services.add_item(user, product, quantity)
+    return checkout(user, "COD")
+
+
+class OrderQueryTests(QueryCountMixin, TestCase):
+
+    def setUp(self):
+        reset_throttles()
+        self.owner = User.objects.create_user(username="owner")
+        self.admin = User.objects.create_user(username="admin", is_admin=True)
+        self.user = User.objects.create_user(username="alice", email="alice@example.com")
+        self.products = [make_product(self.owner, stock=None, title=f"Widget {index}") for index in range(3)]
+        place_order(self.user, self.products[:2])
+
+    def client_for(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client
+
+    def add_orders(self):
+        for index in range(3):
+            buyer = User.objects.create_user(username=f"buyer{index}")
+            place_order(buyer, self.products)
+            place_order(self.user, self.products)
+
+    def test_my_orders_queries_do_not_grow_with_orders(self):
+        self.assertConstantQueries(self.client_for(self.user), "/api/orders/my/", self.add_orders)
+
+    def test_admin_orders_queries_do_not_grow_with_orders(self):
+        self.assertConstantQueries(self.client_for(self.admin), "/api/orders/", self.add_orders)
+
+    def test_order_detail_queries_do_not_grow_with_its_lines(self):
+        order = Order.objects.get(user=self.user)
+        client = self.client_for(self.user)
+
+        def grow():
+            for index in range(3):
+                category = Category.objects.create(name=f"Category {index}", slug=f"category-{index}")
+                product = make_product(self.owner, title=f"Gadget {index}", category=category)
+                OrderItem.objects.create(order=order, product=product, quantity=1, price=product.price)
+
+        self.assertConstantQueries(client, f"/api/orders/{order.pk}/", grow)
+
+    def test_checkout_queries_do_not_grow_with_the_cart(self):
+        client = self.client_for(self.user)
+        cart_services.add_item(self.user, self.products[0], 1)
+        # Locks, stock, order, lines, emptying the cart, the response and
+        # savepoints; the user row may come from the cache
+        small = self.assertMaxQueries(13, client, "/api/orders/checkout/", method="post", data={"payment_method": "COD"})
+
+        for product in self.products:
+            cart_services.add_item(self.user, product, 2)
+        self.assertMaxQueries(small, client, "/api/orders/checkout/", method="post", data={"payment_method": "COD"})
+
+
+class ConfirmationOutboxTests(TestCase):
+
+    def setUp(self):
+        self.owner = User.objects.create_user(username="owner")
+        self.product = make_product(self.owner, stock=None)
+
+    def test_checkout_writes_the_confirmation_with_the_order(self):
+        user = User.objects.create_user(username="alice", email="alice@example.com")
+        # No on-commit hooks run here, the row has to be part of the order's transaction
+        order = place_order(user, [self.product])
+
+        outbound = OutboundEmail.objects.get(order=order)
+        self.assertEqual((outbound.to, outbound.status), ("alice@example.com", "PENDING"))
+        self.assertIn(f"Order ID: {order.id}", outbound.body)
+
+    def test_users_without_an_email_get_no_confirmation(self):
+        user = User.objects.create_user(username="bob")
+        place_order(user, [self.product])
+
+        self.assertFalse(OutboundEmail.objects.exists())
+
+
+class CheckoutTests(TestCase):
+
+    def setUp(self):
+        self.owner = User.objects.create_user(username="owner")
+        self.user = User.objects.create_user(username="alice", email="alice@example.com")
+        self.shirt = make_product(self.owner, stock=10, price="20.00", title="Shirt")
+        self.socks = make_product(self.owner, stock=None, price="3.50", title="Socks")
+
+    def test_checkout_turns_the_cart_into_an_order(self):
+        cart_services.add_item(self.user, self.shirt, 2)
+        cart_services.add_item(self.user, self.socks, 3)
+
+        order = checkout(self.user, "MOCK", shipping_address="1 Main St")
+
+        self.assertEqual((order.status, order.payment_status), ("PAID", "SUCCESS"))
+        self.assertEqual(order.total_price, Decimal("50.50"))
+        self.assertEqual(order.shipping_address, "1 Main St")
+        self.assertEqual(
+            sorted(order.items.values_list("product__title", "quantity", "price")),
+            [("Shirt", 2, Decimal("20.00")), ("Socks", 3, Decimal("3.50"))],
+        )
+
+        cart = Cart.objects.get(user=self.user)
+        self.assertFalse(cart.items.exists())
+        self.assertEqual((cart.item_count, cart.total_quantity, cart.subtotal), (0, 0, 0))
+        self.shirt.refresh_from_db()
+        self.assertEqual((self.shirt.stock, self.shirt.reserved), (8, 0))
+        # The confirmation is queued for the outbox drain
+        self.assertEqual(OutboundEmail.objects.get(order=order).to, "alice@example.com")
+
+    def test_checkout_rejects_an_empty_cart(self):
+        with self.assertRaises(CheckoutError):
+            checkout(self.user, "COD")
+
+        Cart.objects.create(user=self.user)
+        with self.assertRaises(CheckoutError):
+            checkout(self.user, "COD")
+        self.assertFalse(Order.objects.exists())
+
+    def test_checkout_rejects_unknown_payment_methods(self):
+        cart_services.add_item(self.user, self.shirt, 1)
+
+        with self.assertRaises(CheckoutError):
+            checkout(self.user, "CRYPTO")
+        self.assertFalse(Order.objects.exists())
+
+    def test_inactive_product_keeps_the_cart(self):
+        cart_services.add_item(self.user, self.shirt, 1)
+        cart_services.add_item(self.user, self.socks, 1)
+        Product.objects.filter(pk=self.socks.pk).update(is_active=False)
+
+        with self.assertRaises(CheckoutError):
+            checkout(self.user, "COD")
+
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(CartItem.objects.filter(cart__user=self.user).count(), 2)
+        self.shirt.refresh_from_db()
+        self.assertEqual((self.shirt.stock, self.shirt.reserved), (10, 1))
+
+    def test_checkout_view_reports_errors(self):
+        reset_throttles()
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        response = client.post("/api/orders/checkout/", {"payment_method": "COD"}, format="json")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data, {"error": "Cart is empty"})
+
+
+class TransitionOrdersTests(TestCase):
+
+    def setUp(self):
+        self.owner = User.objects.create_user(username="owner")
+        self.admin = User.objects.create_user(username="admin", is_admin=True)
+        self.user = User.objects.create_user(username="alice")
+        product = make_product(self.owner, stock=None)
+        self.pending, self.delivered = [place_order(self.user, [product]) for _ in range(2)]
+        Order.objects.filter(pk=self.delivered.pk).update(status="DELIVERED")
+
+    def test_allowed_transitions_are_made_and_recorded(self):
+        updated, skipped = transition_orders([self.pending.pk], "APPROVED", changed_by=self.admin)
+
+        self.assertEqual((updated, skipped), ([self.pending.pk], {}))
+        self.pending.refresh_from_db()
+        self.assertEqual(self.pending.status, "APPROVED")
+        change = OrderStatusChange.objects.get(order=self.pending)
+        self.assertEqual((change.from_status, change.to_status, change.changed_by), ("PENDING", "APPROVED", self.admin))
+
+    def test_other_orders_are_skipped_with_their_status(self):
+        updated, skipped = transition_orders(
+            [self.pending.pk, self.delivered.pk, 999999, self.pending.pk], "CANCELLED",
+        )
+
+        self.assertEqual(updated, [self.pending.pk])
+        self.assertEqual(skipped, {self.delivered.pk: "DELIVERED", 999999: None})
+        self.delivered.refresh_from_db()
+        self.assertEqual(self.delivered.status, "DELIVERED")
+        self.assertEqual(OrderStatusChange.objects.count(), 1)
+
+    def test_transition_is_checked_against_the_current_status(self):
+        transition_orders([self.pending.pk], "CANCELLED")
+
+        updated, skipped = transition_orders([self.pending.pk], "PAID")
+
+        self.assertEqual((updated, skipped), ([], {self.pending.pk: "CANCELLED"}))
+
+
+class OrderExportTests(TestCase):
+
+    def setUp(self):
+        reset_throttles()
+        owner = User.objects.create_user(username="owner")
+        self.admin = User.objects.create_user(username="admin", is_admin=True)
+        self.user = User.objects.create_user(username="alice", email="alice@example.com")
+        self.shirt = make_product(owner, stock=None, price="20.00", title="Shirt")
+        self.socks = make_product(owner, stock=None, price="3.50", title="Socks")
+
+        cart_services.add_item(self.user, self.shirt, 2)
+        cart_services.add_item(self.user, self.socks, 1)
+        self.first = checkout(self.user, "MOCK", shipping_address="=HYPERLINK(\"http://evil\")")
+        self.empty = Order.objects.create(user=self.user, total_price=0, payment_method="COD")
+        Order.objects.filter(pk=self.first.pk).update(created_at=timezone.make_aware(datetime(2026, 3, 1, 12)))
+        Order.objects.filter(pk=self.empty.pk).update(created_at=timezone.make_aware(datetime(2026, 3, 2, 23, 59)))
+
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def export(self, fmt, **params):
+        response = self.client.get(f"/api/orders/export/{fmt}/", params)
+        self.assertEqual(response.status_code, 200, getattr(response, "data", None))
+        return b"".join(response.streaming_content).decode()
+
+    def test_csv_has_one_row_per_order_line(self):
+        response = self.client.get("/api/orders/export/csv/")
+        self.assertEqual(response["Content-Type"], "text/csv; charset=utf-8")
+        self.assertIn('filename="orders.csv"', response["Content-Disposition"])
+
+        header, *rows = csv.reader(io.StringIO(b"".join(response.streaming_content).decode()))
+
+        self.assertEqual(header, [column for column, _ in ORDER_EXPORT_FIELDS])
+        self.assertEqual(
+            [(row[0], row[12], row[13], row[14]) for row in rows],
+            [(str(self.first.pk), "Shirt", "2", "20.00"), (str(self.first.pk), "Socks", "1", "3.50"),
+             (str(self.empty.pk), "", "", "")],
+        )
+        self.assertEqual(rows[0][7:9], ["alice", "alice@example.com"])
+
+    def test_ndjson_folds_the_lines_of_each_order(self):
+        orders = [json.loads(line) for line in self.export("ndjson").splitlines()]
+
+        self.assertEqual([order["order_id"] for order in orders], [self.first.pk, self.empty.pk])
+        self.assertEqual(
+            [(item["product_title"], item["quantity"], item["unit_price"]) for item in orders[0]["items"]],
+            [("Shirt", 2, "20.00"), ("Socks", 1, "3.50")],
+        )
+        self.assertEqual(orders[0]["total_price"], "43.50")
+        # Not a spreadsheet, text is left alone
+        self.assertEqual(orders[0]["shipping_address"], "=HYPERLINK(\"http://evil\")")
+        self.assertEqual(orders[1]["items"], [])
+
+    def test_csv_quotes_cells_a_spreadsheet_would_run(self):
+        _, row, *_ = csv.reader(io.StringIO(self.export("csv")))
+
+        self.assertEqual(row[9], "'=HYPERLINK(\"http://evil\")")
+
+    def test_filters_and_inclusive_dates(self):
+        def exported(**params):
+            return [json.loads(line)["order_id"] for line in self.export("ndjson", **params).splitlines()]
+
+        self.assertEqual(exported(payment_method="COD"), [self.empty.pk])
+        self.assertEqual(exported(status="PAID"), [self.first.pk])
+        self.assertEqual(exported(date_from="2026-03-02"), [self.empty.pk])
+        self.assertEqual(exported(date_to="2026-03-01"), [self.first.pk])
+        self.assertEqual(exported(date_from="2026-03-01", date_to="2026-03-02"), [self.first.pk, self.empty.pk])
+        self.assertEqual(exported(date_from="2026-03-03"), [])
+
+    def test_bad_requests_are_refused(self):
+        self.assertEqual(self.client.get("/api/orders/export/xlsx/").status_code, 400)
+        self.assertEqual(self.client.get("/api/orders/export/csv/", {"date_from": "March"}).status_code, 400)
+
+        self.client.force_authenticate(self.user)
+        self.assertEqual(self.client.get("/api/orders/export/csv/").status_code, 403)
+
+    async def test_asgi_requests_get_an_async_stream(self):
+        # Django's ASGI handler would read a sync iterator to the end before sending it
+        token = CustomTokenObtainPairSerializer.get_token(self.admin).access_token
+        response = await self.async_client.get("/api/orders/export/csv/", headers={"Authorization": f"Bearer {token}"})
 
-# Create your tests here.
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.is_async)
+        content = b"".join([chunk async for chunk in response.streaming_content]).decode()
+        self.assertEqual(len(content.splitlines()), 4)
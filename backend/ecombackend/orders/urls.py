@@ -1,9 +1,19 @@
+from django.conf import settings
 from django.urls import path
-from .views import CheckoutView, UserOrdersView, AdminOrdersView, UpdateOrderStatusView
+from .views import InvoiceDownloadView, OrderExportView
+
+if settings.ASYNC_API_VIEWS:
+    from . import async_views as views
+else:
+    from . import views
 
 urlpatterns = [
-    path("checkout/", CheckoutView.as_view()),
-    path("my/", UserOrdersView.as_view()),
-    path("", AdminOrdersView.as_view()),  # Admin endpoint for all orders
-    path("update/<int:order_id>/", UpdateOrderStatusView.as_view()),
+    path("checkout/", views.CheckoutView.as_view()),
+    path("my/", views.UserOrdersView.as_view()),
+    path("", views.AdminOrdersView.as_view()),  # Admin endpoint for all orders
+    path("<int:order_id>/", views.OrderDetailView.as_view()),
+    path("update/<int:order_id>/", views.UpdateOrderStatusView.as_view()),
+    path("bulk-status/", views.BulkOrderStatusView.as_view()),
+    path("<int:order_id>/invoice/", InvoiceDownloadView.as_view()),
+    path("export/<str:fmt>/", OrderExportView.as_view()),
 ]
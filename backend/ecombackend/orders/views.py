@@ -1,119 +1,81 @@
+import re
+from itertools import groupby
+from operator import itemgetter
+
 from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
+from django.core.files.storage import default_storage
+from django.db.models import Count, OuterRef, Prefetch, Subquery
+from django.db.models.functions import Coalesce
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.http import content_disposition_header
 
-from cart.models import Cart, CartItem
+from ecombackend.exports import CONTENT_TYPES, EXPORT_CHUNK_SIZE, created_between, csv_lines, export_response, ndjson_lines
 from .models import Order, OrderItem
-from .serializers import OrderSerializer
-from .tasks import send_order_confirmation_email
+from .pagination import OrderPagination
+from .serializers import OrderSerializer, OrderListSerializer, OrderFilterSerializer, BulkOrderStatusSerializer
+from .services import checkout, CheckoutError, transition_orders
+from .invoice import get_invoice
+from users.authentication import load_user
+
+
+def order_queryset():
+    """Orders with everything OrderSerializer touches, in a fixed number of queries."""
+    return Order.objects.select_related("user").prefetch_related(
+        Prefetch(
+            "items",
+            queryset=OrderItem.objects.select_related("product__category", "product__created_by"),
+        ),
+        "status_history",
+    )
+
+
+def order_list_queryset():
+    """Orders for OrderListSerializer: the user joined in, the lines only counted."""
+    item_count = (
+        OrderItem.objects.filter(order=OuterRef("pk"))
+        .order_by()
+        .values("order")
+        .annotate(count=Count("pk"))
+        .values("count")
+    )
+    return Order.objects.select_related("user").annotate(item_count=Coalesce(Subquery(item_count), 0))
+
+
+def filter_orders(queryset, query_params):
+    """
+    Apply ?status=, ?payment_status=, ?payment_method=, ?date_from= and
+    ?date_to= (YYYY-MM-DD, both inclusive). Raises ValidationError (400).
+    """
+    filters = OrderFilterSerializer(data=query_params)
+    filters.is_valid(raise_exception=True)
+    params = filters.validated_data
+
+    for field in ("status", "payment_status", "payment_method"):
+        if field in params:
+            queryset = queryset.filter(**{field: params[field]})
+    return created_between(queryset, params.get("date_from"), params.get("date_to"))
 
 
 # Checkout: Convert cart → order
 class CheckoutView(APIView):
     permission_classes = [IsAuthenticated]
+    throttle_scope = "checkout"
 
     def post(self, request):
-        user = request.user
-        payment_method = request.data.get("payment_method")
-        print(payment_method)
-        if payment_method not in ["COD", "MOCK"]:
-            return Response(
-                {"error": "Invalid payment method"},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        
         try:
-            cart = Cart.objects.get(user=user)
-        except Cart.DoesNotExist:
-            return Response({"error": "Cart is empty"}, status=400)
-
-        if cart.items.count() == 0:
-            return Response({"error": "Cart has no items"}, status=400)
-        
-        # Payment logic
-        if payment_method == "COD":
-            payment_status = "UNPAID"
-            order_status = "PENDING"
-        else:  # MOCK
-            payment_status = "SUCCESS"
-            order_status = "PAID"
-
-        # Get shipping address and payment method from request
-        shipping_address = request.data.get("shipping_address", "")
-
-        # Calculate total first
-        total = 0
-        cart_items = list(cart.items.all())  # Convert to list to avoid query issues
-        
-        if not cart_items:
-            return Response({"error": "Cart has no items"}, status=400)
-
-        # Validate all products exist and are active
-        for item in cart_items:
-            if not item.product:
-                return Response({"error": f"Product not found for cart item {item.id}"}, status=400)
-            if not item.product.is_active:
-                return Response({"error": f"Product '{item.product.title}' is not available"}, status=400)
-            try:
-                price = float(item.product.price)
-                total += price * item.quantity
-            except (ValueError, TypeError) as e:
-                return Response({"error": f"Invalid price for product '{item.product.title}'"}, status=400)
-
-        if total <= 0:
-            return Response({"error": "Order total must be greater than zero"}, status=400)
-
-        # Create order with initial total_price
-        try:
-            order = Order.objects.create(
-                user=user,
-                total_price=total,
-                shipping_address=shipping_address,
-                payment_method=payment_method,
-                payment_status=payment_status,
-                status=order_status
+            # The confirmation email needs the full user, not the token's claims
+            order = checkout(
+                load_user(request.user.pk),
+                request.data.get("payment_method"),
+                shipping_address=request.data.get("shipping_address", ""),
             )
-        except Exception as e:
-            error_detail = str(e)
-            # Check if it's a migration issue (field doesn't exist in database)
-            if "shipping_address" in error_detail or "payment_method" in error_detail or "no such column" in error_detail.lower():
-                return Response({
-                    "error": "Database migration required. Please run: python manage.py migrate orders"
-                }, status=500)
-            return Response({"error": f"Failed to create order: {error_detail}"}, status=500)
-
-        # Create order items
-        try:
-            for item in cart_items:
-                price = float(item.product.price)
-                OrderItem.objects.create(
-                    order=order,
-                    product=item.product,
-                    quantity=item.quantity,
-                    price=price,
-                )
-               
-        except Exception as e:
-            # If order items fail, delete the order
-            order.delete()
-            return Response({"error": f"Failed to create order items: {str(e)}"}, status=500)
-
-        # Clear cart after successful order creation
-        try:
-            cart.items.all().delete()
-        except Exception as e:
-            # Log error but don't fail the order
-            import logging
-            logger = logging.getLogger(__name__)
-            logger.warning(f"Failed to clear cart: {str(e)}")
-        
-        send_order_confirmation_email.delay(
-            user.email,
-            order.id,
-            order.total_price
-        )
+        except CheckoutError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
+        order = order_queryset().get(pk=order.pk)
         return Response({
             "message": "Order created successfully",
             "order":OrderSerializer(order).data,
@@ -125,9 +87,10 @@ class UserOrdersView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        orders = Order.objects.filter(user=request.user)
-        serializer = OrderSerializer(orders, many=True)
-        return Response(serializer.data)
+        orders = filter_orders(order_list_queryset().filter(user=request.user), request.query_params)
+        paginator = OrderPagination()
+        page = paginator.paginate_queryset(orders, request, view=self)
+        return paginator.get_paginated_response(OrderListSerializer(page, many=True).data)
 
 
 # Admin can see all orders
@@ -137,25 +100,38 @@ class AdminOrdersView(APIView):
     def get(self, request):
         if not request.user.is_admin:
             return Response({"error": "Admin only"}, status=403)
-        
-        orders = Order.objects.all().order_by("-created_at")
-        serializer = OrderSerializer(orders, many=True)
-        return Response(serializer.data)
 
+        orders = filter_orders(order_list_queryset(), request.query_params)
+        paginator = OrderPagination()
+        page = paginator.paginate_queryset(orders, request, view=self)
+        return paginator.get_paginated_response(OrderListSerializer(page, many=True).data)
 
-# Admin can update order status
-class UpdateOrderStatusView(APIView):
+
+# One order with its items, for its owner or an admin
+class OrderDetailView(APIView):
     permission_classes = [IsAuthenticated]
 
-    def patch(self, request, order_id):
+    def get(self, request, order_id):
+        orders = order_queryset()
         if not request.user.is_admin:
-            return Response({"error": "Admin only"}, status=403)
+            orders = orders.filter(user=request.user)
 
         try:
-            order = Order.objects.get(id=order_id)
-        except:
+            order = orders.get(id=order_id)
+        except Order.DoesNotExist:
             return Response({"error": "Order not found"}, status=404)
 
+        return Response(OrderSerializer(order).data)
+
+
+# Admin can update order status, along Order.TRANSITIONS
+class UpdateOrderStatusView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def patch(self, request, order_id):
+        if not request.user.is_admin:
+            return Response({"error": "Admin only"}, status=403)
+
         status_val = request.data.get("status")
         if not status_val:
             return Response({"error": "Status is required"}, status=400)
@@ -167,7 +143,173 @@ class UpdateOrderStatusView(APIView):
                 "error": f"Invalid status. Valid statuses are: {', '.join(valid_statuses)}"
             }, status=400)
 
-        order.status = status_val
-        order.save()
+        updated, skipped = transition_orders([order_id], status_val, changed_by=request.user)
+        if order_id in skipped:
+            if skipped[order_id] is None:
+                return Response({"error": "Order not found"}, status=404)
+            return Response({
+                "error": f"Cannot change status from {skipped[order_id]} to {status_val}"
+            }, status=409)
 
+        order = order_queryset().get(id=order_id)
         return Response(OrderSerializer(order).data)
+
+
+# Admin moves many orders to one status at once (e.g. the evening SHIPPED run)
+class BulkOrderStatusView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        if not request.user.is_admin:
+            return Response({"error": "Admin only"}, status=403)
+
+        serializer = BulkOrderStatusSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=400)
+
+        status_val = serializer.validated_data["status"]
+        updated, skipped = transition_orders(
+            serializer.validated_data["order_ids"], status_val, changed_by=request.user
+        )
+        return Response(bulk_status_data(status_val, updated, skipped))
+
+
+def bulk_status_data(status_val, updated, skipped):
+    return {
+        "status": status_val,
+        "updated": updated,
+        "skipped": [{"id": order_id, "status": current} for order_id, current in skipped.items()],
+    }
+
+
+# (column, lookup) of the order export. The first ORDER_COLUMNS describe
+# the order, the rest one of its lines.
+ORDER_EXPORT_FIELDS = [
+    ("order_id", "id"),
+    ("created_at", "created_at"),
+    ("status", "status"),
+    ("payment_status", "payment_status"),
+    ("payment_method", "payment_method"),
+    ("total_price", "total_price"),
+    ("user_id", "user_id"),
+    ("username", "user__username"),
+    ("email", "user__email"),
+    ("shipping_address", "shipping_address"),
+    ("item_id", "items__id"),
+    ("product_id", "items__product_id"),
+    ("product_title", "items__product__title"),
+    ("quantity", "items__quantity"),
+    ("unit_price", "items__price"),
+]
+ORDER_COLUMNS = 10
+
+
+def order_export_rows(queryset):
+    """
+    One tuple per order line, oldest order first, read through a server-side
+    cursor. An order without lines gives one row with empty line columns.
+    """
+    return (
+        queryset.order_by("created_at", "id", "items__id")
+        .values_list(*[lookup for _, lookup in ORDER_EXPORT_FIELDS])
+        .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+
+
+def order_export_objects(rows):
+    """Fold the consecutive rows of each order into one dict with its `items`."""
+    columns = [column for column, _ in ORDER_EXPORT_FIELDS]
+    order_columns, item_columns = columns[:ORDER_COLUMNS], columns[ORDER_COLUMNS:]
+    for _, lines in groupby(rows, key=itemgetter(0)):
+        lines = list(lines)
+        order = dict(zip(order_columns, lines[0]))
+        order["items"] = [
+            dict(zip(item_columns, line[ORDER_COLUMNS:]))
+            for line in lines
+            if line[ORDER_COLUMNS] is not None
+        ]
+        yield order
+
+
+# Admin: orders and their lines as a streamed CSV / NDJSON file, same filters as the lists
+class OrderExportView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, fmt):
+        if not request.user.is_admin:
+            return Response({"error": "Admin only"}, status=403)
+        if fmt not in CONTENT_TYPES:
+            return Response({"error": f"Invalid format. Valid formats are: {', '.join(CONTENT_TYPES)}"}, status=400)
+
+        rows = order_export_rows(filter_orders(Order.objects.all(), request.query_params))
+        if fmt == "csv":
+            lines = csv_lines([column for column, _ in ORDER_EXPORT_FIELDS], rows)
+        else:
+            lines = ndjson_lines(order_export_objects(rows))
+        return export_response(request, fmt, "orders", lines)
+
+
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def _read_range(fileobj, start, length, chunk_size=64 * 1024):
+    with fileobj:
+        fileobj.seek(start)
+        while length > 0:
+            chunk = fileobj.read(min(chunk_size, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def ranged_file_response(request, fileobj, size, filename, content_type="application/pdf"):
+    """Stream a file as an attachment, honouring a single `Range: bytes=` request."""
+    match = RANGE_RE.match(request.headers.get("Range", ""))
+    if not match or not any(match.groups()):
+        response = FileResponse(fileobj, as_attachment=True, filename=filename, content_type=content_type)
+        response["Accept-Ranges"] = "bytes"
+        return response
+
+    first, last = match.groups()
+    if first:
+        start, end = int(first), min(int(last), size - 1) if last else size - 1
+    else:
+        # Suffix range: the last N bytes
+        start, end = max(size - int(last), 0), size - 1
+    if start > end:
+        fileobj.close()
+        response = HttpResponse(status=416)
+        response["Content-Range"] = f"bytes */{size}"
+        return response
+
+    response = StreamingHttpResponse(
+        _read_range(fileobj, start, end - start + 1), status=206, content_type=content_type
+    )
+    response["Content-Range"] = f"bytes {start}-{end}/{size}"
+    response["Content-Length"] = str(end - start + 1)
+    response["Content-Disposition"] = content_disposition_header(True, filename)
+    response["Accept-Ranges"] = "bytes"
+    return response
+
+
+# Invoice PDF of an order, for its owner or an admin
+class InvoiceDownloadView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, order_id):
+        try:
+            order = Order.objects.select_related("user").get(id=order_id)
+        except Order.DoesNotExist:
+            return Response({"error": "Order not found"}, status=404)
+
+        if order.user_id != request.user.id and not request.user.is_admin:
+            return Response({"error": "Order not found"}, status=404)
+
+        name = get_invoice(order)
+        return ranged_file_response(
+            request,
+            default_storage.open(name, "rb"),
+            default_storage.size(name),
+            f"invoice_{order.id}.pdf",
+        )
@@ -0,0 +1,127 @@
+import hashlib
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from redis.exceptions import RedisError
+
+from ecombackend.metrics import CACHE_REQUESTS, registry
+
+logger = logging.getLogger(__name__)
+
+# Bumped on every Product/Category change, old keys are simply never read again
+VERSION_KEY = "catalog:version"
+LOCK_TIMEOUT = 10
+WAIT_STEP = 0.05
+# How long a request waits for another one to fill a cold key before it
+# computes the value itself, uncached
+MAX_WAIT = 1.0
+# Entries outlive their TTL by this much so one request can refresh
+# while the others keep serving the stale copy
+STALE_GRACE = 30
+
+
+def ttl_for(kind):
+    return getattr(settings, "CATALOG_CACHE_TTLS", {}).get(kind, 60)
+
+
+def current_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, 1, timeout=None)
+        version = cache.get(VERSION_KEY, 1)
+    return version
+
+
+def invalidate():
+    """Drop every cached catalog response by moving to a new key version."""
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.add(VERSION_KEY, 1, timeout=None)
+    except RedisError:
+        logger.exception("Could not invalidate the catalog cache")
+
+
+def make_key(kind, *parts):
+    digest = hashlib.md5(repr(parts).encode()).hexdigest()
+    return f"catalog:v{current_version()}:{kind}:{digest}"
+
+
+def _count(kind, outcome):
+    # Prometheus only, counting adds no Redis round trip to a hit
+    CACHE_REQUESTS.labels(kind, outcome).inc()
+
+
+def get_or_compute(kind, parts, compute):
+    """
+    Read-through cache for catalog responses.
+
+    - Entries are fresh for the per-kind TTL (CATALOG_CACHE_TTLS).
+    - Stampede protection: only the request holding `<key>:lock` runs
+      `compute` and stores the result. While an entry is being refreshed
+      the others serve the stale copy; on a cold key they wait up to
+      MAX_WAIT for the lock holder, then compute the value uncached.
+    - If Redis is unreachable the value is computed without caching.
+    """
+    try:
+        key = make_key(kind, *parts)
+        entry = cache.get(key)
+        lock_key = f"{key}:lock"
+
+        if entry is not None:
+            value, fresh_until = entry
+            if fresh_until > time.time() or not cache.add(lock_key, 1, LOCK_TIMEOUT):
+                _count(kind, "hits")
+                return value
+        elif not cache.add(lock_key, 1, LOCK_TIMEOUT):
+            for _ in range(int(MAX_WAIT / WAIT_STEP)):
+                time.sleep(WAIT_STEP)
+                entry = cache.get(key)
+                if entry is not None:
+                    _count(kind, "hits")
+                    return entry[0]
+                if cache.get(lock_key) is None:
+                    break
+            # Don't hold a worker for the whole of a slow compute; the
+            # lock holder stores the entry
+            _count(kind, "misses")
+            return compute()
+    except RedisError:
+        logger.exception("Catalog cache unavailable, serving %s uncached", kind)
+        return compute()
+
+    try:
+        value = compute()
+        try:
+            ttl = ttl_for(kind)
+            cache.set(key, (value, time.time() + ttl), timeout=ttl + STALE_GRACE)
+        except RedisError:
+            logger.exception("Could not store %s in the catalog cache", kind)
+    finally:
+        try:
+            cache.delete(lock_key)
+        except RedisError:
+            pass
+    _count(kind, "misses")
+    return value
+
+
+def stats():
+    """Hit/miss counters since start, of every worker if PROMETHEUS_MULTIPROC_DIR is set."""
+    samples = registry()
+    result = {}
+    for kind in getattr(settings, "CATALOG_CACHE_TTLS", {}):
+        hits, misses = (
+            int(samples.get_sample_value("catalog_cache_requests_total", {"kind": kind, "outcome": outcome}) or 0)
+            for outcome in ("hits", "misses")
+        )
+        total = hits + misses
+        result[kind] = {
+            "hits": hits,
+            "misses": misses,
+            "hit_ratio": round(hits / total, 4) if total else None,
+            "ttl": ttl_for(kind),
+        }
+    return {"version": current_version(), "kinds": result}
@@ -0,0 +1,44 @@
+import re
+
+from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramWordSimilarity
+from django.db.models import F, FloatField, Q
+from django.db.models.functions import Cast
+from rest_framework.filters import BaseFilterBackend
+
+WORD_RE = re.compile(r"\w+")
+
+
+class ProductSearchFilter(BaseFilterBackend):
+    """
+    Full-text product search on PostgreSQL (`?search=`).
+
+    - Matches the GIN-indexed `search_vector` (title + description) with
+      every word used as a prefix, so "wirel head" finds "wireless headphones".
+    - Also matches titles by trigram word similarity (GIN `gin_trgm_ops`
+      index) to tolerate typos.
+    - Results are ordered by `rank`: ts_rank plus trigram similarity.
+    """
+
+    search_param = "search"
+    max_words = 10
+
+    def get_search_words(self, request):
+        return WORD_RE.findall(request.query_params.get(self.search_param, ""))[: self.max_words]
+
+    def filter_queryset(self, request, queryset, view):
+        words = self.get_search_words(request)
+        if not words:
+            return queryset
+
+        query = SearchQuery(" & ".join(f"{word}:*" for word in words), search_type="raw", config="english")
+        text = " ".join(words)
+        return (
+            queryset.filter(Q(search_vector=query) | Q(title__trigram_word_similar=text))
+            # ts_rank() is a float4; as double precision it round-trips exactly
+            # through the keyset pagination cursor
+            .annotate(rank=Cast(
+                SearchRank(F("search_vector"), query) + TrigramWordSimilarity(text, "title"),
+                FloatField(),
+            ))
+            .order_by("-rank", "-pk")
+        )
@@ -0,0 +1,114 @@
+import io
+import os
+import posixpath
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db.models import Q
+from PIL import Image, ImageOps
+
+from . import cache
+from .models import Product
+
+# Product images are uploaded at full size. Each one gets resized WebP copies,
+# one per IMAGE_VARIANT_WIDTHS width (capped at the original's width), and
+# Product.image_variants records them:
+#
+#     {"source": "products/shoe.jpg", "widths": {"160": "products/variants/7/shoe-160w.webp", ...}}
+#
+# "source" tells whether the variants still belong to the current image.
+
+VARIANT_DIR = "products/variants"
+
+
+def variant_widths():
+    return sorted(set(getattr(settings, "IMAGE_VARIANT_WIDTHS", [160, 320, 640, 1024])))
+
+
+def is_current(product):
+    """Whether the product's variants were made from its current image (or both are empty)."""
+    return (product.image_variants or {}).get("source") == (product.image.name or None)
+
+
+def render_variants(fileobj, widths, quality=80):
+    """Resize an image file to each width, never upscaling. Returns {width: WebP bytes}."""
+    with Image.open(fileobj) as image:
+        # JPEGs can be decoded straight at a fraction of their size
+        largest = max(widths)
+        image.draft("RGB", (largest, largest))
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA" if image.has_transparency_data else "RGB")
+
+        variants = {}
+        for width in sorted({min(width, image.width) for width in widths}):
+            height = max(round(image.height * width / image.width), 1)
+            resized = image if width == image.width else image.resize(
+                (width, height), Image.Resampling.LANCZOS, reducing_gap=3.0
+            )
+            buffer = io.BytesIO()
+            resized.save(buffer, "WEBP", quality=quality, method=4)
+            variants[width] = buffer.getvalue()
+        return variants
+
+
+def generate_variants(product_id):
+    """
+    (Re)build the variants of one product and record them on it.
+    Returns the number of files written.
+
+    The result is only saved if the product still has the same image,
+    otherwise the new files are dropped (the newer upload has its own task).
+    """
+    product = Product.objects.only("id", "image", "image_variants").get(pk=product_id)
+    source = product.image.name or None
+    previous = set(((product.image_variants or {}).get("widths") or {}).values())
+
+    widths = {}
+    if source:
+        with default_storage.open(source, "rb") as fileobj:
+            rendered = render_variants(fileobj, variant_widths(), getattr(settings, "IMAGE_VARIANT_QUALITY", 80))
+        stem = posixpath.splitext(posixpath.basename(source))[0]
+        for width, data in rendered.items():
+            name = f"{VARIANT_DIR}/{product.pk}/{stem}-{width}w.webp"
+            widths[str(width)] = default_storage.save(name, ContentFile(data))
+
+    same_image = Q(image=source) if source else Q(image="") | Q(image__isnull=True)
+    variants = {"source": source, "widths": widths} if source else {}
+    if Product.objects.filter(same_image, pk=product.pk).update(image_variants=variants):
+        stale = previous - set(widths.values())
+        cache.invalidate()
+    else:
+        stale, widths = set(widths.values()), {}
+
+    for name in stale:
+        default_storage.delete(name)
+    return len(widths)
+
+
+def delete_variants(product_id):
+    """Delete the product's variant directory. Returns the number of files deleted."""
+    directory = f"{VARIANT_DIR}/{product_id}"
+    try:
+        _, files = default_storage.listdir(directory)
+    except FileNotFoundError:
+        return 0
+    for name in files:
+        default_storage.delete(f"{directory}/{name}")
+    try:
+        os.rmdir(default_storage.path(directory))
+    except (NotImplementedError, OSError):
+        # Object stores have no directories to remove
+        pass
+    return len(files)
+
+
+def variant_urls(product, request=None):
+    """[(width, url)] of the product's variants, narrowest first."""
+    widths = ((product.image_variants or {}).get("widths") or {})
+    urls = []
+    for width, name in sorted(widths.items(), key=lambda item: int(item[0])):
+        url = default_storage.url(name)
+        urls.append((int(width), request.build_absolute_uri(url) if request else url))
+    return urls
@@ -0,0 +1,184 @@
+import csv
+import io
+import json
+import time
+
+from django.db import DatabaseError, transaction
+from rest_framework import serializers
+
+from cart.services import refresh_carts_with
+from . import cache
+from .models import Category, Product
+
+# Bulk product import (manage.py import_products, POST /api/products/import/).
+#
+# Rows are read one at a time from the file, validated, and upserted on
+# `sku` with bulk_create(update_conflicts=True), `batch_size` rows per
+# INSERT ... ON CONFLICT. Categories are resolved by slug from one map
+# loaded up front. Invalid rows are collected, not fatal.
+
+DEFAULT_BATCH_SIZE = 1000
+FORMATS = ("csv", "json", "ndjson")
+
+# Written on insert and overwritten when the SKU already exists. created_by,
+# created_at and reserved stock stay as they are on existing products.
+UPDATE_FIELDS = ["title", "description", "price", "category", "stock", "is_active", "updated_at"]
+
+
+class ProductImportSerializer(serializers.Serializer):
+    sku = serializers.CharField(max_length=64)
+    title = serializers.CharField(max_length=200)
+    description = serializers.CharField(allow_blank=True, default="")
+    price = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=0)
+    category = serializers.SlugField(max_length=120)
+    stock = serializers.IntegerField(min_value=0, allow_null=True, default=None)
+    is_active = serializers.BooleanField(default=True)
+
+
+class ImportResult:
+    def __init__(self):
+        self.rows = 0
+        self.imported = 0
+        # [{"row": n, "sku": ..., "errors": {...}}], row numbers start at 1
+        self.rejected = []
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.elapsed if self.elapsed else 0.0
+
+    def as_dict(self, max_rejected=None):
+        return {
+            "rows": self.rows,
+            "imported": self.imported,
+            "rejected_count": len(self.rejected),
+            "rejected": self.rejected[:max_rejected],
+            "seconds": round(self.elapsed, 3),
+            "rows_per_second": round(self.rows_per_second, 1),
+        }
+
+
+def detect_format(filename, default="csv"):
+    extension = filename.rsplit(".", 1)[-1].lower() if "." in filename else ""
+    return extension if extension in FORMATS else default
+
+
+def read_rows(fileobj, fmt):
+    """
+    Yield the product dicts of a binary file object. CSV and NDJSON are read
+    line by line, a JSON array is parsed whole. Empty CSV cells count as missing.
+    """
+    text = io.TextIOWrapper(fileobj, encoding="utf-8-sig", newline="")
+    if fmt == "csv":
+        for row in csv.DictReader(text):
+            yield {key: value for key, value in row.items() if key and value not in ("", None)}
+    elif fmt == "ndjson":
+        for line in text:
+            if line.strip():
+                yield _parse_json_row(line)
+    else:
+        rows = json.load(text)
+        if not isinstance(rows, list):
+            raise ValueError("Expected a JSON array of products")
+        yield from rows
+
+
+def _parse_json_row(line):
+    try:
+        return json.loads(line)
+    except ValueError as e:
+        # Reported as a rejected row
+        return {"__error__": f"Invalid JSON: {e}"}
+
+
+def import_products(rows, created_by, batch_size=DEFAULT_BATCH_SIZE, on_batch=None):
+    """
+    Validate and upsert product dicts by SKU. Returns an ImportResult.
+
+    `on_batch(result)` is called after every written batch, e.g. to
+    report progress.
+    """
+    result = ImportResult()
+    categories = dict(Category.objects.values_list("slug", "id"))
+    validator = ProductImportSerializer()
+    # sku -> (row number, Product): a SKU repeated within a batch keeps its last row
+    batch = {}
+
+    for number, row in enumerate(rows, start=1):
+        result.rows = number
+        product, errors = _build(validator, row, categories, created_by)
+        if errors:
+            result.rejected.append({"row": number, "sku": _sku_of(row), "errors": errors})
+            continue
+
+        batch.pop(product.sku, None)
+        batch[product.sku] = (number, product)
+        if len(batch) >= batch_size:
+            _write(batch, result, on_batch)
+            batch = {}
+
+    if batch:
+        _write(batch, result, on_batch)
+
+    if result.imported:
+        cache.invalidate()
+    result.elapsed = time.perf_counter() - result.started
+    return result
+
+
+def _sku_of(row):
+    return row.get("sku") if isinstance(row, dict) else None
+
+
+def _build(validator, row, categories, created_by):
+    if not isinstance(row, dict):
+        return None, {"non_field_errors": ["Expected an object"]}
+    if "__error__" in row:
+        return None, {"non_field_errors": [row["__error__"]]}
+
+    try:
+        data = validator.run_validation(row)
+    except serializers.ValidationError as e:
+        return None, e.detail
+
+    category_id = categories.get(data["category"])
+    if category_id is None:
+        return None, {"category": [f"Unknown category '{data['category']}'"]}
+
+    return Product(
+        sku=data["sku"],
+        title=data["title"],
+        description=data["description"],
+        price=data["price"],
+        category_id=category_id,
+        stock=data["stock"],
+        is_active=data["is_active"],
+        created_by=created_by,
+    ), None
+
+
+def _write(batch, result, on_batch=None):
+    products = [product for _, product in batch.values()]
+    try:
+        with transaction.atomic():
+            Product.objects.bulk_create(
+                products,
+                update_conflicts=True,
+                unique_fields=["sku"],
+                update_fields=UPDATE_FIELDS,
+            )
+            # Prices may have changed under existing cart lines. After commit,
+            # so carts aren't locked while the batch holds product rows
+            transaction.on_commit(lambda: refresh_carts_with([product.pk for product in products]))
+    except DatabaseError as e:
+        result.rejected.extend(
+            {"row": number, "sku": product.sku, "errors": {"non_field_errors": [str(e).strip()]}}
+            for number, product in batch.values()
+        )
+    else:
+        result.imported += len(products)
+
+    result.elapsed = time.perf_counter() - result.started
+    if on_batch:
+        on_batch(result)
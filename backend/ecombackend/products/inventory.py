@@ -0,0 +1,226 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Case, F, IntegerField, Q, Value, When
+from django.utils import timezone
+
+from .models import Product, StockReservation
+
+# LOCK ORDER
+#
+# Every transaction that touches several of these rows locks them in the
+# same order: cart, cart lines, stock reservations, then products. Cart
+# mutations (cart.services) lock the cart before calling in here, checkout
+# locks cart and lines before commit(), and code that changes products
+# (price edits, imports, deletes) refreshes cart totals only after its
+# transaction commits (cart.signals). Taking them in any other order can
+# deadlock against a concurrent checkout.
+
+
+class OutOfStock(Exception):
+    def __init__(self, product_id, message=None):
+        self.product_id = product_id
+        super().__init__(message or f"Not enough stock for product {product_id}")
+
+
+def reservation_ttl():
+    return timedelta(seconds=getattr(settings, "STOCK_RESERVATION_TTL", 15 * 60))
+
+
+def reserve(user, product, quantity):
+    """
+    Hold `quantity` more units of `product` for the user's cart.
+
+    The hold is a single conditional UPDATE on the product row
+    (`reserved + n <= stock`), so concurrent carts only contend on the
+    SKU they share. Products without tracked stock are ignored.
+    """
+    if product.stock is None or quantity <= 0:
+        return
+
+    with transaction.atomic():
+        # Upsert, so it also covers a hold the expiry sweep just removed.
+        # Hold before product (see LOCK ORDER), rolled back if stock is short
+        table = StockReservation._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                INSERT INTO {table} (product_id, user_id, quantity, expires_at)
+                VALUES (%s, %s, %s, %s)
+                ON CONFLICT (product_id, user_id) DO UPDATE
+                SET quantity = {table}.quantity + EXCLUDED.quantity, expires_at = EXCLUDED.expires_at
+                """,
+                [product.pk, user.pk, quantity, timezone.now() + reservation_ttl()],
+            )
+
+        held = Product.objects.filter(
+            pk=product.pk, stock__gte=F("reserved") + quantity
+        ).update(reserved=F("reserved") + quantity)
+        if not held:
+            raise OutOfStock(product.pk, f"Only {product.available} left of '{product.title}'")
+
+
+def release(user, product_id, quantity=None):
+    """Give back `quantity` (default: all) units the user holds on a product."""
+    with transaction.atomic():
+        reservation = (
+            StockReservation.objects.select_for_update()
+            .filter(user=user, product_id=product_id)
+            .first()
+        )
+        if reservation is None:
+            return
+
+        if quantity is None or quantity >= reservation.quantity:
+            quantity = reservation.quantity
+            reservation.delete()
+        else:
+            StockReservation.objects.filter(pk=reservation.pk).update(quantity=F("quantity") - quantity)
+        Product.objects.filter(pk=product_id).update(reserved=F("reserved") - quantity)
+
+
+def adjust(user, deltas):
+    """
+    Change several holds at once: `deltas` maps products to the units to
+    hold (+n) or give back (-n). Used by bulk cart updates.
+
+    All products are updated with one conditional UPDATE, and the holds
+    with one upsert for increases and one UPDATE for decreases. Raises OutOfStock if any product can't cover its increase,
+    the caller's transaction should then roll back.
+    """
+    deltas = {
+        product: delta for product, delta in deltas.items()
+        if product.stock is not None and delta
+    }
+    if not deltas:
+        return
+
+    with transaction.atomic():
+        held = dict(
+            StockReservation.objects.select_for_update()
+            .filter(user=user, product_id__in=[product.pk for product in deltas])
+            .values_list("product_id", "quantity")
+        )
+        changes = {}
+        for product, delta in deltas.items():
+            # Never give back more than the user holds
+            delta = max(delta, -held.get(product.pk, 0))
+            if delta:
+                changes[product.pk] = delta
+        if not changes:
+            return
+
+        change = Case(
+            *[When(pk=pk, then=Value(delta)) for pk, delta in changes.items()],
+            output_field=IntegerField(),
+        )
+        updated = (
+            Product.objects.filter(pk__in=changes)
+            .alias(change=change)
+            .filter(Q(change__lt=0) | Q(stock__gte=F("reserved") + F("change")))
+            .update(reserved=F("reserved") + change)
+        )
+        if updated != len(changes):
+            for product in Product.objects.filter(pk__in=[pk for pk, delta in changes.items() if delta > 0]):
+                if product.stock - product.reserved < changes[product.pk]:
+                    raise OutOfStock(product.pk, f"Only {product.available} left of '{product.title}'")
+            raise OutOfStock(None, "Stock changed during the update, please retry")
+
+        increases = {pk: delta for pk, delta in changes.items() if delta > 0}
+        if increases:
+            table = StockReservation._meta.db_table
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"""
+                    INSERT INTO {table} (product_id, user_id, quantity, expires_at)
+                    SELECT product_id, %s, quantity, %s
+                    FROM unnest(%s::bigint[], %s::integer[]) AS new(product_id, quantity)
+                    ON CONFLICT (product_id, user_id) DO UPDATE
+                    SET quantity = {table}.quantity + EXCLUDED.quantity, expires_at = EXCLUDED.expires_at
+                    """,
+                    [user.pk, timezone.now() + reservation_ttl(), list(increases), list(increases.values())],
+                )
+
+        # Decreases only touch holds locked above
+        decreases = {pk: -delta for pk, delta in changes.items() if delta < 0}
+        if decreases:
+            StockReservation.objects.filter(user=user, product_id__in=decreases).update(
+                quantity=F("quantity") - Case(
+                    *[When(product_id=pk, then=Value(n)) for pk, n in decreases.items()],
+                    output_field=IntegerField(),
+                )
+            )
+            StockReservation.objects.filter(user=user, product_id__in=decreases, quantity=0).delete()
+
+
+def commit(user, cart_items):
+    """
+    Take stock for a checkout, converting the user's holds into sales.
+
+    Must run inside the checkout transaction. All products are decremented
+    with one conditional UPDATE; a product whose free stock plus the
+    user's own hold does not cover the order quantity raises OutOfStock
+    and the caller's transaction rolls back.
+    """
+    wanted = {}
+    for item in cart_items:
+        if item.product.stock is not None:
+            wanted[item.product_id] = wanted.get(item.product_id, 0) + item.quantity
+    if not wanted:
+        return
+
+    # Locked so the expiry sweep can't release these holds under us
+    held = dict(
+        StockReservation.objects.select_for_update()
+        .filter(user=user, product_id__in=wanted)
+        .values_list("product_id", "quantity")
+    )
+
+    need = Case(
+        *[When(pk=pk, then=Value(qty)) for pk, qty in wanted.items()],
+        output_field=IntegerField(),
+    )
+    hold = Case(
+        *[When(pk=pk, then=Value(held.get(pk, 0))) for pk in wanted],
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+    updated = (
+        Product.objects.filter(pk__in=wanted, stock__isnull=False)
+        .alias(need=need, hold=hold)
+        .filter(stock__gte=F("reserved") - F("hold") + F("need"))
+        .update(stock=F("stock") - need, reserved=F("reserved") - hold)
+    )
+
+    if updated != len(wanted):
+        for product in Product.objects.filter(pk__in=wanted):
+            free = product.stock - product.reserved + held.get(product.pk, 0)
+            if free < wanted[product.pk]:
+                raise OutOfStock(product.pk, f"Only {max(free, 0)} left of '{product.title}'")
+        raise OutOfStock(None, "Stock changed during checkout, please retry")
+
+    StockReservation.objects.filter(user=user, product_id__in=wanted).delete()
+
+
+def release_expired(batch_size=500):
+    """Drop expired holds and return their units to the pool. Returns the count released."""
+    released = 0
+    with transaction.atomic():
+        expired = list(
+            StockReservation.objects.select_for_update(skip_locked=True)
+            .filter(expires_at__lte=timezone.now())
+            .values_list("pk", "product_id", "quantity")[:batch_size]
+        )
+        if not expired:
+            return 0
+
+        per_product = {}
+        for pk, product_id, quantity in expired:
+            per_product[product_id] = per_product.get(product_id, 0) + quantity
+        StockReservation.objects.filter(pk__in=[pk for pk, _, _ in expired]).delete()
+
+        for product_id, quantity in sorted(per_product.items()):
+            Product.objects.filter(pk=product_id).update(reserved=F("reserved") - quantity)
+            released += quantity
+    return released
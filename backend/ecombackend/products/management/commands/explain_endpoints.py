@@ -0,0 +1,99 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.test import APIClient
+
+from products.models import Category, Product
+
+User = get_user_model()
+
+
+def walk(plan):
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from walk(child)
+
+
+class Command(BaseCommand):
+    help = "Run EXPLAIN ANALYZE on the SQL issued by each read endpoint and flag sequential scans"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--username", type=str, help="User for authenticated endpoints (default: first admin)")
+        parser.add_argument(
+            "--min-rows", type=int, default=1000,
+            help="Only flag sequential scans reading at least this many rows",
+        )
+
+    def endpoints(self, user):
+        category = Category.objects.first()
+        product = Product.objects.filter(is_active=True).first()
+
+        yield "Public product list", None, "/api/products/"
+        yield "Public product list by price", None, "/api/products/?ordering=price"
+        if category:
+            yield "Public product list by category", None, f"/api/products/?category_id={category.id}"
+        if product:
+            yield "Product detail", None, f"/api/products/{product.id}/"
+            yield "Product search", None, f"/api/products/?search={product.title.split()[0]}"
+        yield "Products by creator", user, f"/api/products/?created_by={user.id}"
+        yield "Admin product list", user, "/api/products/"
+        yield "Category list", None, "/api/products/categories/"
+        yield "Cart", user, "/api/cart/"
+        yield "My orders", user, "/api/orders/my/"
+        yield "Admin orders", user, "/api/orders/"
+
+    def handle(self, *args, **options):
+        if connection.vendor != "postgresql":
+            raise CommandError("EXPLAIN ANALYZE output is only understood on PostgreSQL")
+
+        username = options.get("username")
+        users = User.objects.filter(username=username) if username else User.objects.filter(is_admin=True)
+        user = users.order_by("id").first()
+        if user is None:
+            raise CommandError("No user to run authenticated endpoints with, pass --username")
+
+        flagged = 0
+        # Bypass the catalog cache so every endpoint actually hits the database
+        with override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}}):
+            for name, as_user, url in self.endpoints(user):
+                client = APIClient(SERVER_NAME="localhost")
+                if as_user:
+                    client.force_authenticate(as_user)
+
+                with CaptureQueriesContext(connection) as ctx:
+                    response = client.get(url)
+                self.stdout.write(self.style.MIGRATE_HEADING(f"{name}: GET {url} -> {response.status_code}"))
+
+                for query in ctx.captured_queries:
+                    sql = query["sql"]
+                    if not sql.lstrip().upper().startswith("SELECT"):
+                        continue
+                    flagged += self.explain(sql, options["min_rows"])
+
+        if flagged:
+            self.stdout.write(self.style.WARNING(f"{flagged} sequential scan(s) flagged"))
+        else:
+            self.stdout.write(self.style.SUCCESS("No sequential scans over the threshold"))
+
+    def explain(self, sql, min_rows):
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {sql}")
+            result = cursor.fetchone()[0]
+        if isinstance(result, str):
+            result = json.loads(result)
+        plan = result[0]["Plan"]
+
+        self.stdout.write(f"  {plan['Actual Total Time']:.2f} ms  {sql[:140]}")
+        flagged = 0
+        for node in walk(plan):
+            if node["Node Type"] != "Seq Scan":
+                continue
+            rows = node.get("Actual Rows", 0) + node.get("Rows Removed by Filter", 0)
+            style = self.style.WARNING if rows >= min_rows else self.style.NOTICE
+            self.stdout.write(style(f"    Seq Scan on {node['Relation Name']} ({rows} rows read)"))
+            if rows >= min_rows:
+                flagged += 1
+        return flagged
@@ -0,0 +1,70 @@
+import csv
+import json
+import sys
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from products.importer import DEFAULT_BATCH_SIZE, FORMATS, detect_format, import_products, read_rows
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Upsert products by SKU from a CSV, JSON or NDJSON supplier feed'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Feed file, '-' for stdin")
+        parser.add_argument('--format', choices=FORMATS, help='Feed format (default: from the file extension, else csv)')
+        parser.add_argument('--owner', type=str, required=True, help='Username set as created_by on new products')
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='Rows per INSERT ... ON CONFLICT')
+        parser.add_argument('--rejects', type=str, help='Write rejected rows to this CSV file')
+
+    def handle(self, *args, **options):
+        try:
+            owner = User.objects.get(username=options['owner'])
+        except User.DoesNotExist:
+            raise CommandError(f"User '{options['owner']}' does not exist")
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1')
+
+        path = options['path']
+        fmt = options['format'] or detect_format(path)
+        try:
+            feed = sys.stdin.buffer if path == '-' else open(path, 'rb')
+        except OSError as e:
+            raise CommandError(str(e))
+
+        def progress(result):
+            self.stdout.write(
+                f'{result.rows} rows ({result.rows_per_second:.0f} rows/s), '
+                f'{result.imported} imported, {len(result.rejected)} rejected',
+                ending='\r',
+            )
+
+        try:
+            with feed:
+                result = import_products(read_rows(feed, fmt), owner, options['batch_size'], on_batch=progress)
+        except (ValueError, UnicodeDecodeError, csv.Error) as e:
+            raise CommandError(f'Could not read {path}: {e}')
+
+        self.stdout.write('')
+        self.stdout.write(self.style.SUCCESS(
+            f'{result.rows} rows in {result.elapsed:.1f}s ({result.rows_per_second:.0f} rows/s): '
+            f'{result.imported} imported, {len(result.rejected)} rejected'
+        ))
+
+        for rejected in result.rejected[:20]:
+            self.stdout.write(self.style.WARNING(
+                f"  row {rejected['row']} (sku {rejected['sku']}): {json.dumps(rejected['errors'])}"
+            ))
+        if len(result.rejected) > 20:
+            self.stdout.write(self.style.WARNING(f'  ... and {len(result.rejected) - 20} more'))
+
+        if options['rejects'] and result.rejected:
+            with open(options['rejects'], 'w', newline='') as out:
+                writer = csv.writer(out)
+                writer.writerow(['row', 'sku', 'errors'])
+                for rejected in result.rejected:
+                    writer.writerow([rejected['row'], rejected['sku'], json.dumps(rejected['errors'])])
+            self.stdout.write(f"Rejected rows written to {options['rejects']}")
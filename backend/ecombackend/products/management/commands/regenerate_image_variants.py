@@ -0,0 +1,69 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.db.models import Q
+
+from products.images import generate_variants, is_current
+from products.models import Product
+
+
+def init_worker():
+    # Needed when workers are spawned instead of forked (macOS, Windows)
+    django.setup()
+
+
+def regenerate(product_id):
+    try:
+        return product_id, generate_variants(product_id), None
+    except Exception as e:
+        return product_id, 0, f'{type(e).__name__}: {e}'
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the resized WebP variants of product images in a pool of worker processes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Rebuild every product, not only those with missing or outdated variants')
+        parser.add_argument('--product', type=int, action='append', help='Only this product id (repeatable)')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Worker processes')
+
+    def handle(self, *args, **options):
+        products = Product.objects.filter(~Q(image="") | Q(image_variants__has_key="source"))
+        if options['product']:
+            products = products.filter(pk__in=options['product'])
+        products = products.only('id', 'image', 'image_variants').order_by('pk')
+        product_ids = [
+            product.pk for product in products.iterator(chunk_size=2000)
+            if options['all'] or not is_current(product)
+        ]
+        if not product_ids:
+            self.stdout.write(self.style.SUCCESS('All image variants are up to date'))
+            return
+
+        workers = max(min(options['workers'], len(product_ids)), 1)
+        self.stdout.write(f'Rebuilding variants of {len(product_ids)} products with {workers} workers')
+        # Forked workers must open their own database connections
+        connections.close_all()
+
+        started = time.perf_counter()
+        written, failed = 0, []
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_worker) as pool:
+            for done, (product_id, files, error) in enumerate(pool.map(regenerate, product_ids, chunksize=4), start=1):
+                written += files
+                if error:
+                    failed.append((product_id, error))
+                if done % 100 == 0 or done == len(product_ids):
+                    rate = done / (time.perf_counter() - started)
+                    self.stdout.write(f'{done}/{len(product_ids)} products ({rate:.1f}/s)', ending='\r')
+
+        self.stdout.write('')
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(product_ids)} products in {elapsed:.1f}s: {written} files written, {len(failed)} failed'
+        ))
+        for product_id, error in failed[:20]:
+            self.stdout.write(self.style.WARNING(f'  product {product_id}: {error}'))
@@ -0,0 +1,93 @@
+import statistics
+import time
+
+from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramWordSimilarity
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import F, Q
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from products.filters import ProductSearchFilter
+from products.models import Product
+
+DEFAULT_TERMS = ["wireless", "wirel head", "ergonomic chair", "hedphones", "steel"]
+
+
+class Command(BaseCommand):
+    help = "Compare ?search= against the old ILIKE search: EXPLAIN ANALYZE and median time of the first page"
+
+    def add_arguments(self, parser):
+        parser.add_argument("terms", nargs="*", help=f"Search terms (default: {', '.join(DEFAULT_TERMS)})")
+        parser.add_argument("--runs", type=int, default=7, help="Timed runs per query, the median is reported")
+        parser.add_argument("--page-size", type=int, default=20, help="Rows fetched, as on the first page")
+        parser.add_argument("--explain", action="store_true", help="Print the full EXPLAIN ANALYZE plans")
+
+    def handle(self, *args, **options):
+        if connection.vendor != "postgresql":
+            raise CommandError("Product search needs PostgreSQL")
+
+        self.runs, self.page_size, self.show_plans = options["runs"], options["page_size"], options["explain"]
+        self.report_setup()
+
+        for term in options["terms"] or DEFAULT_TERMS:
+            self.stdout.write(self.style.MIGRATE_HEADING(f"search={term!r}"))
+            for name, queryset in self.queries(term):
+                self.measure(name, queryset)
+
+    def report_setup(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT extversion FROM pg_extension WHERE extname = 'pg_trgm'")
+            row = cursor.fetchone()
+            cursor.execute(
+                "SELECT indexname FROM pg_indexes WHERE tablename = %s AND indexname IN %s",
+                [Product._meta.db_table, ("product_search_vector_gin", "product_title_trgm")],
+            )
+            indexes = {name for name, in cursor.fetchall()}
+
+        self.stdout.write(f"Products: {Product.objects.count()} ({Product.objects.filter(is_active=True).count()} active)")
+        self.stdout.write(f"pg_trgm: {row[0] if row else 'NOT INSTALLED'}")
+        for index in ("product_search_vector_gin", "product_title_trgm"):
+            self.stdout.write(f"{index}: {'present' if index in indexes else 'MISSING'}")
+        if not row or "product_title_trgm" not in indexes:
+            self.stdout.write(self.style.WARNING("Without pg_trgm and its index the typo branch scans every title"))
+
+    def queries(self, term):
+        public = Product.objects.filter(is_active=True)
+        request = Request(APIRequestFactory().get("/api/products/", {"search": term}))
+        search_filter = ProductSearchFilter()
+        words = search_filter.get_search_words(request)
+        query = SearchQuery(" & ".join(f"{word}:*" for word in words), search_type="raw", config="english")
+        text = " ".join(words)
+
+        # What SearchFilter(search_fields=["title", "description"]) ran before
+        old = public
+        for word in term.split():
+            old = old.filter(Q(title__icontains=word) | Q(description__icontains=word))
+        yield "before: ILIKE", old.order_by("-created_at", "-pk")
+        yield "after: ?search=", search_filter.filter_queryset(request, public, None)
+        # Its two branches on their own
+        yield "  full-text only", (
+            public.filter(search_vector=query)
+            .annotate(rank=SearchRank(F("search_vector"), query))
+            .order_by("-rank", "-pk")
+        )
+        yield "  trigram only", (
+            public.filter(title__trigram_word_similar=text)
+            .annotate(similarity=TrigramWordSimilarity(text, "title"))
+            .order_by("-similarity", "-pk")
+        )
+
+    def measure(self, name, queryset):
+        page = queryset[: self.page_size]
+        timings = []
+        for _ in range(self.runs):
+            started = time.perf_counter()
+            rows = len(page.all())
+            timings.append((time.perf_counter() - started) * 1000)
+
+        plan = page.explain(analyze=True, buffers=True)
+        scans = sorted({line.strip().split(" on ")[0].lstrip("-> ") for line in plan.splitlines() if " on " in line})
+        self.stdout.write(f"  {name:<18} {statistics.median(timings):9.2f} ms  {rows:>3} rows  {', '.join(scans)}")
+        if self.show_plans:
+            self.stdout.write("\n".join(f"      {line}" for line in plan.splitlines()))
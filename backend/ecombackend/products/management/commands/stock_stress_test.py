@@ -0,0 +1,88 @@
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+
+from cart.models import Cart, CartItem
+from orders.services import checkout, CheckoutError
+from products.models import Category, Product
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Hammer one SKU with concurrent checkouts and verify it is never oversold'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--stock', type=int, default=100, help='Units on hand for the test product')
+        parser.add_argument('--buyers', type=int, default=300, help='Number of users checking out concurrently')
+        parser.add_argument('--quantity', type=int, default=1, help='Units each buyer orders')
+        parser.add_argument('--workers', type=int, default=32, help='Concurrent threads (one DB connection each)')
+        parser.add_argument('--keep', action='store_true', help='Keep the generated users, product and orders')
+
+    def handle(self, *args, **options):
+        if connection.vendor == 'sqlite':
+            self.stdout.write(self.style.WARNING('SQLite has no row locking, run this against PostgreSQL for meaningful results.'))
+
+        run = uuid.uuid4().hex[:8]
+        stock, quantity = options['stock'], options['quantity']
+
+        owner = User.objects.create_user(username=f'stress_owner_{run}')
+        category = Category.objects.create(name=f'stress-{run}', slug=f'stress-{run}')
+        product = Product.objects.create(
+            title=f'Stress SKU {run}',
+            price=Decimal('9.99'),
+            category=category,
+            created_by=owner,
+            stock=stock,
+        )
+
+        buyers = User.objects.bulk_create([
+            User(username=f'stress_{run}_{i}') for i in range(options['buyers'])
+        ])
+        carts = Cart.objects.bulk_create([Cart(user=user) for user in buyers])
+        CartItem.objects.bulk_create([
+            CartItem(cart=cart, product=product, quantity=quantity) for cart in carts
+        ])
+
+        def buy(user):
+            try:
+                started = time.perf_counter()
+                try:
+                    checkout(user, 'COD')
+                    ok = True
+                except CheckoutError:
+                    ok = False
+                return ok, time.perf_counter() - started
+            finally:
+                connections.close_all()
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            results = list(pool.map(buy, buyers))
+        elapsed = time.perf_counter() - started
+
+        product.refresh_from_db()
+        sold = sum(1 for ok, _ in results if ok)
+        latencies = sorted(duration for _, duration in results)
+        p99 = latencies[int(len(latencies) * 0.99) - 1] if latencies else 0
+        expected = min(len(buyers), stock // quantity)
+
+        self.stdout.write(f'Checkouts: {len(results)} in {elapsed:.2f}s ({len(results) / elapsed:.0f}/s), p99 {p99 * 1000:.1f} ms')
+        self.stdout.write(f'Sold: {sold} orders, {sold * quantity} units, stock left: {product.stock}')
+
+        try:
+            if product.stock < 0 or sold * quantity + product.stock != stock or sold != expected:
+                self.stdout.write(self.style.ERROR(f'❌ Inconsistent stock, expected {expected} orders'))
+            else:
+                self.stdout.write(self.style.SUCCESS('✅ No oversell'))
+        finally:
+            if not options['keep']:
+                User.objects.filter(username__startswith=f'stress_{run}_').delete()
+                product.delete()
+                category.delete()
+                owner.delete()
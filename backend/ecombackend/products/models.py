@@ -1,5 +1,7 @@
 from django.db import models
 from django.conf import settings
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
 # Create your models here.
 
 class Category(models.Model):
@@ -14,21 +16,80 @@ class Category(models.Model):
     def __str__(self):
         return self.name
 
+class ProductManager(models.Manager):
+    def get_queryset(self):
+        # search_vector is only used in WHERE/ORDER BY by the search filter,
+        # don't ship it with every row
+        return super().get_queryset().defer("search_vector")
+
+
 class Product(models.Model):
+    # Supplier SKU, the key products.importer upserts on
+    sku = models.CharField(max_length=64, unique=True, null=True, blank=True)
     title = models.CharField(max_length=200)
     description = models.TextField(blank=True)
     price = models.DecimalField(max_digits = 10, decimal_places = 2)
     category = models.ForeignKey(Category, on_delete = models.CASCADE, related_name = "products")
     image = models.ImageField(upload_to="products/", blank=True, null=True)
+    # Resized WebP copies of `image`, written by products.images.generate_variants
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
 
     created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete = models.CASCADE, related_name = "products")
     created_at = models.DateTimeField(auto_now_add = True)
     updated_at = models.DateTimeField(auto_now = True)
     is_active = models.BooleanField(default = True)
+
+    # Units on hand, None means stock is not tracked for this product
+    stock = models.PositiveIntegerField(null=True, blank=True)
+    # Units held by active StockReservations, kept in step by products.inventory
+    reserved = models.PositiveIntegerField(default=0)
+
+    # Maintained by PostgreSQL from title (weight A) and description (weight B)
+    search_vector = models.GeneratedField(
+        expression=(
+            SearchVector("title", weight="A", config="english")
+            + SearchVector("description", weight="B", config="english")
+        ),
+        output_field=SearchVectorField(),
+        db_persist=True,
+    )
+
+    objects = ProductManager()
     
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            # ProductViewSet: public listing (is_active) ordered by -created_at or price,
+            # optionally by category; keyset pagination adds id as tie-breaker
+            models.Index(fields=["-created_at", "-id"], name="product_active_recent_idx", condition=models.Q(is_active=True)),
+            models.Index(fields=["price", "id"], name="product_active_price_idx", condition=models.Q(is_active=True)),
+            models.Index(fields=["category", "-created_at", "-id"], name="product_active_cat_recent_idx", condition=models.Q(is_active=True)),
+            models.Index(fields=["category", "price", "id"], name="product_active_cat_price_idx", condition=models.Q(is_active=True)),
+            # Admin listing (all products) and ?created_by=
+            models.Index(fields=["-created_at", "-id"], name="product_recent_idx"),
+            models.Index(fields=["created_by", "-created_at", "-id"], name="product_creator_recent_idx"),
+            GinIndex(fields=["search_vector"], name="product_search_vector_gin"),
+            GinIndex(fields=["title"], name="product_title_trgm", opclasses=["gin_trgm_ops"]),
+        ]
 
     def __str__(self):
         return self.title
-    
\ No newline at end of file
+
+    @property
+    def available(self):
+        if self.stock is None:
+            return None
+        return max(self.stock - self.reserved, 0)
+
+
+class StockReservation(models.Model):
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="reservations")
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="stock_reservations")
+    quantity = models.PositiveIntegerField()
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        unique_together = ("product", "user")
+
+    def __str__(self):
+        return f"{self.product_id} x {self.quantity} for {self.user_id}"
@@ -0,0 +1,5 @@
+from ecombackend.pagination import KeysetPagination
+
+
+class ProductPagination(KeysetPagination):
+    ordering = "-created_at"
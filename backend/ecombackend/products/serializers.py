@@ -1,4 +1,6 @@
+from django.conf import settings
 from rest_framework import serializers
+from .images import is_current, variant_urls
 from .models import Category, Product
 
 class CategorySerializer(serializers.ModelSerializer):
@@ -15,8 +17,33 @@ class ProductSerializer(serializers.ModelSerializer):
         )
     created_by = serializers.ReadOnlyField(source = "created_by.username")
     is_active = serializers.BooleanField(default=True)
+    available = serializers.ReadOnlyField()
+    image_variants = serializers.SerializerMethodField()
        
     class Meta: 
         model = Product 
-        fields = ['id','title','description','price','category','image','category_id','created_by','created_at','updated_at','is_active']
-        read_only_fields = ['created_at','updated_at','created_by']
\ No newline at end of file
+        fields = ['id','sku','title','description','price','category','image','image_variants','category_id','created_by','created_at','updated_at','is_active','stock','available']
+        read_only_fields = ['created_at','updated_at','created_by']
+
+    def get_image_variants(self, obj):
+        # {"thumbnail": url, "srcset": "url 160w, url 320w, ..."}, None until the
+        # variants of the current image are made
+        if not is_current(obj):
+            return None
+        urls = variant_urls(obj, self.context.get("request"))
+        if not urls:
+            return None
+        thumbnail_width = getattr(settings, "IMAGE_THUMBNAIL_WIDTH", 320)
+        thumbnail = next((url for width, url in urls if width >= thumbnail_width), urls[-1][1])
+        return {
+            "thumbnail": thumbnail,
+            "srcset": ", ".join(f"{url} {width}w" for width, url in urls),
+        }
+
+class ProductExportFilterSerializer(serializers.Serializer):
+    category = serializers.IntegerField(required=False)
+    # default=None: an absent flag means "all", not False
+    is_active = serializers.BooleanField(required=False, allow_null=True, default=None)
+    # created_at, inclusive
+    date_from = serializers.DateField(required=False)
+    date_to = serializers.DateField(required=False)
@@ -0,0 +1,29 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import cache, images
+from .models import Category, Product
+from .tasks import delete_image_variants, generate_image_variants
+
+
+@receiver([post_save, post_delete], sender=Product)
+@receiver([post_save, post_delete], sender=Category)
+def invalidate_catalog_cache(sender, **kwargs):
+    cache.invalidate()
+
+
+@receiver(post_save, sender=Product)
+def queue_image_variants(sender, instance, **kwargs):
+    # New or replaced image: resize it in the worker, not in the request
+    if not images.is_current(instance):
+        product_id = instance.pk
+        transaction.on_commit(lambda: generate_image_variants.delay(product_id))
+
+
+@receiver(post_delete, sender=Product)
+def queue_variant_cleanup(sender, instance, **kwargs):
+    # The variants are not file fields, nothing else removes them
+    if instance.image or instance.image_variants:
+        product_id = instance.pk
+        transaction.on_commit(lambda: delete_image_variants.delay(product_id))
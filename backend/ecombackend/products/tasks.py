@@ -0,0 +1,26 @@
+from celery import shared_task
+
+from .images import delete_variants, generate_variants
+from .inventory import release_expired
+from .models import Product
+
+
+@shared_task
+def release_expired_reservations():
+    released = release_expired()
+    return f"Released {released} reserved units"
+
+
+@shared_task
+def generate_image_variants(product_id):
+    try:
+        written = generate_variants(product_id)
+    except Product.DoesNotExist:
+        return f"Product {product_id} no longer exists"
+    return f"Wrote {written} image variants for product {product_id}"
+
+
+@shared_task
+def delete_image_variants(product_id):
+    deleted = delete_variants(product_id)
+    return f"Deleted {deleted} image variants of product {product_id}"
@@ -1,3 +1,463 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import shutil
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from redis.exceptions import RedisError
+from rest_framework.test import APIClient
+
+from cart import services as cart_services
+from cart.models import Cart, CartItem
+from ecombackend.exports import FORMULA_PREFIXES, csv_lines
+from ecombackend.testing import QueryCountMixin, eager_tasks, reset_throttles
+from orders.services import CheckoutError, checkout
+from users.models import User
+from . import cache, images, inventory
+from .importer import import_products
+from .models import Category, Product, StockReservation
+from .serializers import ProductSerializer
+from .views import PRODUCT_EXPORT_FIELDS
+
+
+def make_product(owner, stock=10, price="10.00", title="Widget", category=None):
+    category = category or Category.objects.get_or_create(name="Tools", slug="tools")[0]
+    return Product.objects.create(
+        title=title, price=Decimal(price), category=category, created_by=owner, stock=stock,
+    )
+
+
+def run_concurrently(*calls):
+    """Run the callables in threads started together. Returns their results or exceptions, in order."""
+    barrier = threading.Barrier(len(calls))
+    results = [None] * len(calls)
+
+    def run(index, call):
+        try:
+            barrier.wait()
+            results[index] = call()
+        except Exception as e:
+            results[index] = e
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=run, args=(index, call)) for index, call in enumerate(calls)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+class InventoryTests(TestCase):
+
+    def setUp(self):
+        self.owner = User.objects.create_user(username="owner")
+        self.alice = User.objects.create_user(username="alice")
+        self.bob = User.objects.create_user(username="bob")
+        self.product = make_product(self.owner, stock=10)
+
+    def hold(self, user):
+        reservation = StockReservation.objects.filter(user=user, product=self.product).first()
+        return reservation.quantity if reservation else 0
+
+    def test_reserve_holds_units(self):
+        inventory.reserve(self.alice, self.product, 3)
+        inventory.reserve(self.alice, self.product, 2)
+
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.reserved, 5)
+        self.assertEqual(self.product.available, 5)
+        self.assertEqual(self.hold(self.alice), 5)
+
+    def test_reserve_more_than_available_changes_nothing(self):
+        inventory.reserve(self.alice, self.product, 8)
+
+        with self.assertRaises(inventory.OutOfStock):
+            inventory.reserve(self.bob, self.product, 3)
+
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.reserved, 8)
+        self.assertEqual(self.hold(self.bob), 0)
+
+    def test_reserve_ignores_untracked_stock(self):
+        untracked = make_product(self.owner, stock=None, title="Ebook")
+
+        inventory.reserve(self.alice, untracked, 100)
+
+        untracked.refresh_from_db()
+        self.assertEqual(untracked.reserved, 0)
+        self.assertFalse(StockReservation.objects.filter(product=untracked).exists())
+
+    def test_release_part_then_all(self):
+        inventory.reserve(self.alice, self.product, 5)
+
+        inventory.release(self.alice, self.product.pk, 2)
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.reserved, self.hold(self.alice)), (3, 3))
+
+        inventory.release(self.alice, self.product.pk)
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.reserved, self.hold(self.alice)), (0, 0))
+
+    def test_release_without_hold_is_a_no_op(self):
+        inventory.release(self.alice, self.product.pk)
+
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.reserved, 0)
+
+    def test_commit_turns_holds_into_sales(self):
+        inventory.reserve(self.alice, self.product, 4)
+        item = CartItem(product=self.product, product_id=self.product.pk, quantity=4)
+
+        with transaction.atomic():
+            inventory.commit(self.alice, [item])
+
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.stock, self.product.reserved), (6, 0))
+        self.assertEqual(self.hold(self.alice), 0)
+
+    def test_commit_uses_free_stock_beyond_the_hold(self):
+        inventory.reserve(self.alice, self.product, 2)
+        item = CartItem(product=self.product, product_id=self.product.pk, quantity=5)
+
+        with transaction.atomic():
+            inventory.commit(self.alice, [item])
+
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.stock, self.product.reserved), (5, 0))
+
+    def test_commit_does_not_take_units_held_by_others(self):
+        inventory.reserve(self.bob, self.product, 8)
+        item = CartItem(product=self.product, product_id=self.product.pk, quantity=3)
+
+        with self.assertRaises(inventory.OutOfStock):
+            with transaction.atomic():
+                inventory.commit(self.alice, [item])
+
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.stock, self.product.reserved), (10, 8))
+
+    def test_release_expired_returns_only_expired_units(self):
+        inventory.reserve(self.alice, self.product, 3)
+        inventory.reserve(self.bob, self.product, 2)
+        StockReservation.objects.filter(user=self.alice).update(expires_at=timezone.now() - timedelta(seconds=1))
+
+        self.assertEqual(inventory.release_expired(), 3)
+
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.reserved, 2)
+        self.assertEqual(self.hold(self.alice), 0)
+        self.assertEqual(self.hold(self.bob), 2)
+        self.assertEqual(inventory.release_expired(), 0)
+
+
+class ProductQueryTests(QueryCountMixin, TestCase):
+
+    def setUp(self):
+        self.owner = User.objects.create_user(username="owner")
+        self.product = make_product(self.owner)
+        cache.invalidate()
+
+    def add_products(self):
+        for index in range(5):
+            category = Category.objects.create(name=f"Category {index}", slug=f"category-{index}")
+            seller = User.objects.create_user(username=f"seller{index}")
+            make_product(seller, title=f"Gadget {index}", category=category)
+
+    def test_list_queries_do_not_grow_with_the_page(self):
+        self.assertConstantQueries(APIClient(), "/api/products/", self.add_products)
+
+    def test_search_queries_do_not_grow_with_the_page(self):
+        self.assertConstantQueries(APIClient(), "/api/products/?search=gadget", self.add_products)
+
+    def test_revalidation_skips_serialization(self):
+        client = APIClient()
+        etag = client.get(f"/api/products/{self.product.pk}/").get("ETag")
+        if etag is None:
+            self.skipTest("No ETag without the catalog version in Redis")
+
+        self.assertMaxQueries(1, client, f"/api/products/{self.product.pk}/", HTTP_IF_NONE_MATCH=etag)
+
+
+class CatalogCacheTests(TestCase):
+
+    def setUp(self):
+        patcher = mock.patch.object(cache, "cache")
+        self.redis = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.redis.get.return_value = None
+        self.redis.add.return_value = True
+
+    def count(self, outcome):
+        return cache.stats()["kinds"]["product_list"][outcome]
+
+    def test_hit_is_only_read(self):
+        entry = (["cached"], time.time() + 60)
+        self.redis.get.side_effect = lambda key, default=None: 3 if key == cache.VERSION_KEY else entry
+        hits = self.count("hits")
+
+        self.assertEqual(cache.get_or_compute("product_list", (1,), lambda: ["fresh"]), ["cached"])
+
+        self.assertEqual(self.count("hits"), hits + 1)
+        self.redis.incr.assert_not_called()
+        self.redis.add.assert_not_called()
+        self.redis.set.assert_not_called()
+
+    def test_value_is_served_when_it_cannot_be_stored(self):
+        self.redis.set.side_effect = RedisError("down")
+
+        with self.assertLogs("products.cache", "ERROR"):
+            self.assertEqual(cache.get_or_compute("product_list", (1,), lambda: ["fresh"]), ["fresh"])
+        self.redis.delete.assert_called_once()
+
+    def test_lock_is_released_when_compute_fails(self):
+        def compute():
+            raise RedisError("down")
+
+        with self.assertRaises(RedisError):
+            cache.get_or_compute("product_list", (1,), compute)
+        self.redis.delete.assert_called_once()
+
+
+class ImageVariantTests(TestCase):
+
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        settings = override_settings(MEDIA_ROOT=media)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.owner = User.objects.create_user(username="owner")
+        self.product = make_product(self.owner)
+
+    def add_variant(self, source, width=160):
+        name = default_storage.save(f"{images.VARIANT_DIR}/{self.product.pk}/shoe-{width}w.webp", ContentFile(b"webp"))
+        Product.objects.filter(pk=self.product.pk).update(image=source, image_variants={"source": source, "widths": {str(width): name}})
+        self.product.refresh_from_db()
+        return name
+
+    def test_variants_of_a_replaced_image_are_not_served(self):
+        self.add_variant("products/shoe.jpg")
+        self.assertIn("160w", ProductSerializer(self.product).data["image_variants"]["srcset"])
+
+        self.product.image = "products/boot.jpg"
+        self.assertIsNone(ProductSerializer(self.product).data["image_variants"])
+
+    def test_deleting_a_product_deletes_its_variants(self):
+        name = self.add_variant("products/shoe.jpg")
+        directory = f"{images.VARIANT_DIR}/{self.product.pk}"
+
+        with eager_tasks(), self.captureOnCommitCallbacks(execute=True):
+            self.product.delete()
+
+        self.assertFalse(default_storage.exists(name))
+        self.assertFalse(default_storage.exists(directory))
+
+
+class ConcurrentInventoryTests(TransactionTestCase):
+    """Each thread has its own connection, so these exercise real row locks."""
+
+    def setUp(self):
+        self.owner = User.objects.create_user(username="owner")
+        self.buyers = [User.objects.create_user(username=f"buyer{i}") for i in range(12)]
+
+    def test_concurrent_reserves_never_oversell(self):
+        product = make_product(self.owner, stock=5)
+
+        results = run_concurrently(*[
+            lambda user=user: inventory.reserve(user, product, 1) for user in self.buyers
+        ])
+
+        failures = [result for result in results if result is not None]
+        self.assertEqual(len(failures), 7)
+        self.assertTrue(all(isinstance(result, inventory.OutOfStock) for result in failures))
+        product.refresh_from_db()
+        self.assertEqual(product.reserved, 5)
+        self.assertEqual(StockReservation.objects.filter(product=product).count(), 5)
+
+    def test_concurrent_checkouts_never_oversell(self):
+        product = make_product(self.owner, stock=5)
+        for user in self.buyers:
+            cart = Cart.objects.create(user=user)
+            CartItem.objects.create(cart=cart, product=product, quantity=1)
+
+        results = run_concurrently(*[lambda user=user: checkout(user, "COD") for user in self.buyers])
+
+        failures = [result for result in results if isinstance(result, Exception)]
+        self.assertEqual(len(failures), 7)
+        self.assertTrue(all(isinstance(result, CheckoutError) for result in failures))
+        product.refresh_from_db()
+        self.assertEqual((product.stock, product.reserved), (0, 0))
+
+    def test_checkout_add_and_price_change_do_not_deadlock(self):
+        # Checkout locks cart -> product; adding to the same cart and a price
+        # change on the product must take their locks in the same order
+        user = self.buyers[0]
+        product = make_product(self.owner, stock=1000)
+
+        def change_price(price):
+            with transaction.atomic():
+                locked = Product.objects.select_for_update().get(pk=product.pk)
+                locked.price = price
+                locked.save()
+
+        for round in range(10):
+            cart_services.add_item(user, product, 1)
+            results = run_concurrently(
+                lambda: checkout(user, "COD"),
+                lambda: cart_services.add_item(user, product, 1),
+                lambda: change_price(Decimal("10.00") + round),
+            )
+            errors = [result for result in results if isinstance(result, Exception) and not isinstance(result, CheckoutError)]
+            self.assertEqual(errors, [])
+
+        cart = Cart.objects.get(user=user)
+        product.refresh_from_db()
+        self.assertEqual(cart.subtotal, sum(item.quantity * product.price for item in cart.items.all()))
+
+
+class ImporterTests(TestCase):
+
+    def setUp(self):
+        self.owner = User.objects.create_user(username="owner")
+        self.admin = User.objects.create_user(username="admin", is_admin=True)
+        Category.objects.create(name="Tools", slug="tools")
+
+    def row(self, sku, **fields):
+        return {"sku": sku, "title": f"Product {sku}", "price": "10.00", "category": "tools", **fields}
+
+    def test_rows_are_upserted_by_sku(self):
+        import_products([self.row("A"), self.row("B", stock="4")], self.owner)
+        Product.objects.filter(sku="A").update(reserved=2)
+
+        result = import_products([self.row("A", title="Renamed", price="12.00", stock="9")], self.admin)
+
+        self.assertEqual((result.rows, result.imported, result.rejected), (1, 1, []))
+        self.assertEqual(Product.objects.count(), 2)
+        product = Product.objects.get(sku="A")
+        self.assertEqual((product.title, product.price, product.stock), ("Renamed", Decimal("12.00"), 9))
+        # Not part of the feed
+        self.assertEqual((product.created_by, product.reserved), (self.owner, 2))
+        self.assertEqual(Product.objects.get(sku="B").stock, 4)
+
+    def test_invalid_rows_are_rejected_and_the_rest_imported(self):
+        result = import_products([
+            self.row("A"),
+            self.row("B", price="free"),
+            self.row("C", category="garden"),
+            "not an object",
+            {"title": "No SKU", "price": "1.00", "category": "tools"},
+            self.row("D", is_active="false"),
+        ], self.owner)
+
+        self.assertEqual((result.rows, result.imported), (6, 2))
+        self.assertEqual([(rejected["row"], rejected["sku"]) for rejected in result.rejected], [
+            (2, "B"), (3, "C"), (4, None), (5, None),
+        ])
+        self.assertIn("category", result.rejected[1]["errors"])
+        self.assertEqual(dict(Product.objects.values_list("sku", "is_active")), {"A": True, "D": False})
+
+    def test_repeated_sku_keeps_its_last_row(self):
+        result = import_products([self.row("A", title="First"), self.row("A", title="Last")], self.owner, batch_size=10)
+
+        self.assertEqual(result.imported, 1)
+        self.assertEqual(Product.objects.get(sku="A").title, "Last")
+
+    def test_rows_are_written_in_batches(self):
+        batches = []
+
+        import_products([self.row(sku) for sku in "ABCDE"], self.owner, batch_size=2,
+                        on_batch=lambda result: batches.append(result.imported))
+
+        self.assertEqual(batches, [2, 4, 5])
+        self.assertEqual(Product.objects.count(), 5)
+
+    def test_price_changes_refresh_carts(self):
+        import_products([self.row("A")], self.owner)
+        product = Product.objects.get(sku="A")
+        cart_services.add_item(self.admin, product, 3)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            import_products([self.row("A", price="5.00")], self.owner)
+
+        self.assertEqual(Cart.objects.get(user=self.admin).subtotal, Decimal("15.00"))
+
+
+class ProductExportTests(TestCase):
+
+    def setUp(self):
+        reset_throttles()
+        self.admin = User.objects.create_user(username="admin", is_admin=True)
+        self.tools = Category.objects.create(name="Tools", slug="tools")
+        self.garden = Category.objects.create(name="Garden", slug="garden")
+        self.hammer = make_product(self.admin, title="Hammer", category=self.tools)
+        self.rake = make_product(self.admin, stock=None, title="Rake", category=self.garden)
+        self.old = make_product(self.admin, title="Old saw", category=self.tools)
+        Product.objects.filter(pk=self.old.pk).update(is_active=False, created_at=timezone.now() - timedelta(days=30))
+
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def export(self, fmt, **params):
+        response = self.client.get(f"/api/products/export/{fmt}/", params)
+        self.assertEqual(response.status_code, 200, getattr(response, "data", None))
+        return b"".join(response.streaming_content).decode()
+
+    def test_csv_has_a_header_and_a_row_per_product(self):
+        header, *rows = csv.reader(io.StringIO(self.export("csv")))
+
+        self.assertEqual(header, [column for column, _ in PRODUCT_EXPORT_FIELDS])
+        self.assertEqual(
+            [row[:7] for row in rows],
+            [[str(self.old.pk), "Old saw", "Tools", "10.00", "10", "0", "False"],
+             [str(self.hammer.pk), "Hammer", "Tools", "10.00", "10", "0", "True"],
+             [str(self.rake.pk), "Rake", "Garden", "10.00", "", "0", "True"]],
+        )
+
+    def test_ndjson_has_an_object_per_product(self):
+        products = [json.loads(line) for line in self.export("ndjson").splitlines()]
+
+        self.assertEqual([product["title"] for product in products], ["Old saw", "Hammer", "Rake"])
+        self.assertEqual(
+            {key: products[2][key] for key in ("category", "price", "stock", "is_active", "created_by")},
+            {"category": "Garden", "price": "10.00", "stock": None, "is_active": True, "created_by": "admin"},
+        )
+
+    def test_filters_and_inclusive_dates(self):
+        def exported(**params):
+            return [json.loads(line)["title"] for line in self.export("ndjson", **params).splitlines()]
+
+        today = timezone.localdate()
+        self.assertEqual(exported(category=self.tools.pk), ["Old saw", "Hammer"])
+        self.assertEqual(exported(is_active="true"), ["Hammer", "Rake"])
+        self.assertEqual(exported(is_active="false"), ["Old saw"])
+        self.assertEqual(exported(date_from=today.isoformat()), ["Hammer", "Rake"])
+        self.assertEqual(exported(date_to=(today - timedelta(days=1)).isoformat()), ["Old saw"])
+        self.assertEqual(exported(date_from=today.isoformat(), date_to=today.isoformat(), category=self.garden.pk), ["Rake"])
+        self.assertEqual(self.client.get("/api/products/export/csv/", {"date_to": "soon"}).status_code, 400)
+
+    def test_formula_prefixes_are_quoted_in_csv_only(self):
+        for index, prefix in enumerate(FORMULA_PREFIXES):
+            make_product(self.admin, title=f"{prefix}cmd|'/c calc'!A{index}", category=self.garden)
+
+        titles = [row[1] for row in csv.reader(io.StringIO(self.export("csv", category=self.garden.pk)))][2:]
+        ndjson = [json.loads(line)["title"] for line in self.export("ndjson", category=self.garden.pk).splitlines()][1:]
+
+        self.assertEqual(titles, [f"'{prefix}cmd|'/c calc'!A{index}" for index, prefix in enumerate(FORMULA_PREFIXES)])
+        self.assertEqual(ndjson, [f"{prefix}cmd|'/c calc'!A{index}" for index, prefix in enumerate(FORMULA_PREFIXES)])
+
+    def test_only_text_cells_are_quoted(self):
+        lines = list(csv_lines(["text", "number", "empty"], [("-1 left", -1, None), ("ok", Decimal("-2.50"), "")]))
+
+        self.assertEqual(lines, ["text,number,empty\r\n", "'-1 left,-1,\r\n", "ok,-2.50,\r\n"])
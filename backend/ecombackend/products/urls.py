@@ -1,11 +1,14 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import ProductViewSet, CategoryViewSet
+from .views import ProductViewSet, CategoryViewSet, CatalogCacheStatsView, ProductExportView, ProductImportView
 
 router = DefaultRouter()
 router.register("categories", CategoryViewSet, basename="category")
 router.register("", ProductViewSet, basename="product")
 
 urlpatterns = [
+    path("cache-stats/", CatalogCacheStatsView.as_view()),
+    path("export/<str:fmt>/", ProductExportView.as_view()),
+    path("import/", ProductImportView.as_view()),
     path("", include(router.urls)),
 ]
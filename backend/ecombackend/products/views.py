@@ -1,43 +1,243 @@
+import csv
+import hashlib
+
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from redis.exceptions import RedisError
 from rest_framework import viewsets,filters
-from rest_framework.permissions import IsAuthenticatedOrReadOnly
+from rest_framework.permissions import IsAuthenticatedOrReadOnly, IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from ecombackend.exports import CONTENT_TYPES, EXPORT_CHUNK_SIZE, created_between, csv_lines, export_response, ndjson_lines
 from .models import Product, Category
-from .serializers import ProductSerializer,CategorySerializer
+from .serializers import ProductSerializer,CategorySerializer,ProductExportFilterSerializer
 from .permissions import IsAdminOrReadOnly,IsAdminOrCreator
+from .pagination import ProductPagination
+from .filters import ProductSearchFilter
+from .importer import DEFAULT_BATCH_SIZE, detect_format, import_products, read_rows
+from . import cache
+
+
+class CachedReadMixin:
+    """
+    Serve list/retrieve from the catalog cache (products/cache.py), with
+    HTTP validators.
+
+    The key is the full request URI, so query params and the host used in
+    pagination/image links are part of it. Views opt out per request
+    through `use_cache()`.
+
+    The ETag comes from `validator_fields` of the rows the response is made
+    of (the requested page, or the object), read with one narrow query, plus
+    the catalog version. A matching If-None-Match gets a 304 before anything
+    is serialized. The ETag is also part of the cache key, so a cached body
+    always matches its ETag.
+
+    There is no Last-Modified: stock moves, category renames and deleted
+    rows change a response without moving any timestamp.
+    """
+    cache_prefix = None
+    validator_fields = ("id",)
+
+    def use_cache(self):
+        return True
+
+    def list(self, request, *args, **kwargs):
+        def rows():
+            queryset = self.filter_queryset(self.get_queryset()).values_list(*self.validator_fields)
+            if self.paginator is None:
+                return queryset
+            return self.paginator.page_queryset(queryset, request, view=self)
+
+        return self.conditional_response(
+            request, rows, f"{self.cache_prefix}_list",
+            lambda: super(CachedReadMixin, self).list(request, *args, **kwargs).data,
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup = {self.lookup_field: kwargs[self.lookup_url_kwarg or self.lookup_field]}
+        rows = lambda: self.filter_queryset(self.get_queryset()).filter(**lookup).values_list(*self.validator_fields)
+        return self.conditional_response(
+            request, rows, f"{self.cache_prefix}_detail",
+            lambda: super(CachedReadMixin, self).retrieve(request, *args, **kwargs).data,
+        )
 
-class CategoryViewSet(viewsets.ModelViewSet):
+    def conditional_response(self, request, rows, kind, compute):
+        try:
+            etag = self.get_etag(request, list(rows()))
+        except (ValueError, TypeError, RedisError):
+            # Malformed lookup, or no catalog version: no validator
+            etag = None
+
+        if etag is not None:
+            not_modified = get_conditional_response(request, etag=etag)
+            if not_modified is not None:
+                return self.set_validators(not_modified, etag)
+
+        if not self.use_cache():
+            response = compute()
+        else:
+            response = cache.get_or_compute(kind, (request.build_absolute_uri(), etag), compute)
+        return self.set_validators(Response(response), etag)
+
+    def get_etag(self, request, rows):
+        if not rows:
+            return None
+        digest = hashlib.md5(repr((
+            request.build_absolute_uri(),
+            request.accepted_media_type,
+            cache.current_version(),
+            rows,
+        )).encode()).hexdigest()
+        return f'W/"{digest}"'
+
+    def set_validators(self, response, etag):
+        if etag is None:
+            return response
+        response["ETag"] = etag
+        # Shared caches may store it, but must revalidate every time
+        patch_cache_control(response, no_cache=True)
+        patch_vary_headers(response, ("Authorization",))
+        return response
+
+
+class CategoryViewSet(CachedReadMixin, viewsets.ModelViewSet):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
     permission_classes = [IsAdminOrReadOnly]
+    cache_prefix = "category"
+    # Category has no timestamp: renames are caught by the catalog version
+    validator_fields = ("id", "name", "slug")
     
-class ProductViewSet(viewsets.ModelViewSet):
+class ProductViewSet(CachedReadMixin, viewsets.ModelViewSet):
     serializer_class  = ProductSerializer
-    filter_backends = [filters.SearchFilter, filters.OrderingFilter]
-    search_fields = ["title","discription"]
+    cache_prefix = "product"
+    # Stock moves (reserve/commit) don't touch updated_at, so the ETag includes them
+    validator_fields = ("id", "updated_at", "stock", "reserved")
+    pagination_class = ProductPagination
+    filter_backends = [ProductSearchFilter, filters.OrderingFilter]
     ordering_fields = ["price","created_at"]
 
     def get_queryset(self):
         # Check if filtering by created_by (user's own products)
         created_by = self.request.query_params.get("created_by")
         
+        # Serializer reads category and created_by.username for every row
+        queryset = Product.objects.select_related("category", "created_by")
+
         if created_by:
             # Filter products by the specified user ID
-            queryset = Product.objects.filter(created_by_id=created_by)
-        elif self.request.user.is_authenticated and getattr(self.request.user, 'is_admin', False):
-            # Admin users can see all products (including inactive)
-            queryset = Product.objects.all()
-        else:
-            # Regular users only see active products
-            queryset = Product.objects.filter(is_active=True)
+            queryset = queryset.filter(created_by_id=created_by)
+        elif not (self.request.user.is_authenticated and getattr(self.request.user, 'is_admin', False)):
+            # Regular users only see active products, admins see all (including inactive)
+            queryset = queryset.filter(is_active=True)
         
         category_id = self.request.query_params.get("category_id")
         if category_id:
             queryset = queryset.filter(category_id=category_id)
         return queryset
     
+    def use_cache(self):
+        # Only the public view (active products) is shared between users
+        if self.request.query_params.get("created_by"):
+            return False
+        return not (self.request.user.is_authenticated and getattr(self.request.user, 'is_admin', False))
+
     def get_permissions(self):
         if self.action in ["create", "update", "partial_update", "destroy"]:
             return [IsAdminOrCreator()]   # only admin or creator can update/delete
         return [IsAuthenticatedOrReadOnly()]       # safe methods allowed for all
 
     def perform_create(self,serializer):
-        serializer.save(created_by = self.request.user)
\ No newline at end of file
+        serializer.save(created_by = self.request.user)
+
+
+# Admin: catalog cache hit/miss counters
+class CatalogCacheStatsView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        if not request.user.is_admin:
+            return Response({"error": "Admin only"}, status=403)
+        return Response(cache.stats())
+
+
+# (column, lookup) of the product export
+PRODUCT_EXPORT_FIELDS = [
+    ("id", "id"),
+    ("title", "title"),
+    ("category", "category__name"),
+    ("price", "price"),
+    ("stock", "stock"),
+    ("reserved", "reserved"),
+    ("is_active", "is_active"),
+    ("created_by", "created_by__username"),
+    ("created_at", "created_at"),
+    ("updated_at", "updated_at"),
+]
+
+
+# Admin: the catalog as a streamed CSV / NDJSON file
+class ProductExportView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, fmt):
+        if not request.user.is_admin:
+            return Response({"error": "Admin only"}, status=403)
+        if fmt not in CONTENT_TYPES:
+            return Response({"error": f"Invalid format. Valid formats are: {', '.join(CONTENT_TYPES)}"}, status=400)
+
+        filters = ProductExportFilterSerializer(data=request.query_params)
+        filters.is_valid(raise_exception=True)
+        params = filters.validated_data
+
+        products = created_between(Product.objects.all(), params.get("date_from"), params.get("date_to"))
+        if params.get("category") is not None:
+            products = products.filter(category_id=params["category"])
+        if params.get("is_active") is not None:
+            products = products.filter(is_active=params["is_active"])
+
+        columns = [column for column, _ in PRODUCT_EXPORT_FIELDS]
+        rows = (
+            products.order_by("created_at", "id")
+            .values_list(*[lookup for _, lookup in PRODUCT_EXPORT_FIELDS])
+            .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+        )
+        if fmt == "csv":
+            lines = csv_lines(columns, rows)
+        else:
+            lines = ndjson_lines(dict(zip(columns, row)) for row in rows)
+        return export_response(request, fmt, "products", lines)
+
+
+# Admin: upsert products by SKU from an uploaded CSV / JSON / NDJSON feed
+# (multipart `file`) or a JSON array body, see products/importer.py
+class ProductImportView(APIView):
+    permission_classes = [IsAuthenticated]
+    # Rejected rows listed in the response, all of them are counted
+    max_rejected = 100
+
+    def post(self, request):
+        if not request.user.is_admin:
+            return Response({"error": "Admin only"}, status=403)
+
+        try:
+            batch_size = int(request.query_params.get("batch_size", DEFAULT_BATCH_SIZE))
+        except ValueError:
+            batch_size = 0
+        if batch_size < 1:
+            return Response({"error": "batch_size must be a positive integer"}, status=400)
+
+        upload = request.FILES.get("file")
+        if upload is not None:
+            rows = read_rows(upload.file, detect_format(upload.name))
+        elif isinstance(request.data, list):
+            rows = request.data
+        else:
+            return Response({"error": "Upload a CSV, JSON or NDJSON file as 'file' or post a JSON array"}, status=400)
+
+        try:
+            result = import_products(rows, request.user, batch_size)
+        except (ValueError, UnicodeDecodeError, csv.Error) as e:
+            return Response({"error": f"Could not read the file: {e}"}, status=400)
+
+        return Response(result.as_dict(max_rejected=self.max_rejected))
@@ -0,0 +1,208 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.utils import timezone
+from redis.exceptions import RedisError
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from .models import User
+
+logger = logging.getLogger(__name__)
+
+# JWT authentication without a users row per request.
+#
+# Login tokens carry `username` and `is_admin` (CustomTokenObtainPairSerializer),
+# so request.user is built from the verified claims. Only fields in the token
+# are loaded, anything else (email, ...) is fetched on first access; use
+# load_user() where the full row is needed.
+#
+# Claims can go stale, so tokens are revoked instead: deactivating a user,
+# removing admin rights or changing the password sets User.tokens_revoked_at
+# (users/signals.py) and every token issued up to then is rejected. The mark
+# is read from Redis on each request (one GET, "0" when never revoked) and
+# from the database on a cache miss.
+#
+# load_user() rows are cached without the password hash: it stays deferred,
+# read from the database only by code that checks or sets a password.
+
+REVOKED_PREFIX = "auth:revoked"
+USER_PREFIX = "auth:user"
+
+# Not cached, see load_user()
+UNCACHED_FIELDS = ("password",)
+
+# user id -> (expires at, field values), per process, least recently used first
+_local_users = OrderedDict()
+_local_users_lock = threading.Lock()
+
+
+def user_cache_ttl():
+    return getattr(settings, "AUTH_USER_CACHE_TTL", 30)
+
+
+def local_user_cache_ttl():
+    return getattr(settings, "AUTH_USER_LOCAL_CACHE_TTL", 5)
+
+
+def local_user_cache_size():
+    return getattr(settings, "AUTH_USER_LOCAL_CACHE_SIZE", 1000)
+
+
+def revoked_key(user_id):
+    return f"{REVOKED_PREFIX}:{user_id}"
+
+
+def user_key(user_id):
+    return f"{USER_PREFIX}:{user_id}"
+
+
+def _epoch(moment):
+    return int(moment.timestamp()) if moment else 0
+
+
+def _build_user(values):
+    names = [field.attname for field in User._meta.concrete_fields if field.attname in values]
+    # Fields left out are deferred, i.e. loaded on first access
+    return User.from_db(DEFAULT_DB_ALIAS, names, [values[name] for name in names])
+
+
+def revoked_in_db(user_id):
+    try:
+        moment = User.objects.filter(pk=user_id).values_list("tokens_revoked_at", flat=True).get()
+    except User.DoesNotExist as e:
+        raise AuthenticationFailed("User not found", code="user_not_found") from e
+    return _epoch(moment)
+
+
+def revoked_at(user_id):
+    """Epoch second up to which the user's tokens are revoked, 0 if never."""
+    mark = cache.get(revoked_key(user_id))
+    if mark is None:
+        mark = revoked_in_db(user_id)
+        cache.set(revoked_key(user_id), mark, timeout=api_settings.REFRESH_TOKEN_LIFETIME.total_seconds())
+    return mark
+
+
+def check_not_revoked(token, mark):
+    # iat has whole seconds: a token from the same second as the revocation is refused too
+    if token.get("iat", 0) <= mark:
+        raise AuthenticationFailed("Token has been revoked", code="token_revoked")
+
+
+def revoke_tokens(user):
+    """Reject every token issued to the user so far. Call after changes the signals don't see (queryset updates)."""
+    now = timezone.now()
+    User.objects.filter(pk=user.pk).update(tokens_revoked_at=now)
+    user.tokens_revoked_at = now
+    forget_user(user.pk)
+    try:
+        cache.set(revoked_key(user.pk), _epoch(now), timeout=api_settings.REFRESH_TOKEN_LIFETIME.total_seconds())
+    except RedisError:
+        # A stale "0" would let the old tokens through until it expires
+        logger.exception("Could not publish the token revocation of user %s", user.pk)
+
+
+def _local_user(user_id, now):
+    with _local_users_lock:
+        cached = _local_users.get(user_id)
+        if cached is None:
+            return None
+        if cached[0] <= now:
+            del _local_users[user_id]
+            return None
+        _local_users.move_to_end(user_id)
+        return cached[1]
+
+
+def _keep_local_user(user_id, values, now):
+    with _local_users_lock:
+        _local_users[user_id] = (now + local_user_cache_ttl(), values)
+        _local_users.move_to_end(user_id)
+        while len(_local_users) > local_user_cache_size():
+            _local_users.popitem(last=False)
+
+
+def forget_user(user_id):
+    with _local_users_lock:
+        _local_users.pop(user_id, None)
+    try:
+        cache.delete(user_key(user_id))
+    except RedisError:
+        logger.exception("Could not drop the cached user %s", user_id)
+
+
+def load_user(user_id):
+    """
+    The User row, cached for AUTH_USER_LOCAL_CACHE_TTL seconds in this
+    process (the AUTH_USER_LOCAL_CACHE_SIZE most recently used users) and
+    AUTH_USER_CACHE_TTL seconds in Redis. The password is left deferred.
+    Raises User.DoesNotExist.
+    """
+    now = time.monotonic()
+    values = _local_user(user_id, now)
+    if values is not None:
+        return _build_user(values)
+
+    try:
+        values = cache.get(user_key(user_id))
+    except RedisError:
+        logger.exception("Could not read the cached user %s", user_id)
+        values = None
+    if values is None:
+        names = [field.attname for field in User._meta.concrete_fields if field.attname not in UNCACHED_FIELDS]
+        values = User.objects.filter(pk=user_id).values(*names).get()
+        try:
+            cache.set(user_key(user_id), values, timeout=user_cache_ttl())
+        except RedisError:
+            logger.exception("Could not cache user %s", user_id)
+
+    _keep_local_user(user_id, values, now)
+    return _build_user(values)
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """
+    simplejwt's JWTAuthentication, but request.user comes from the token
+    claims instead of a users query (see the notes above).
+    """
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken("Token contained no recognizable user identification") from e
+
+        try:
+            mark = revoked_at(user_id)
+        except RedisError:
+            logger.exception("Could not check token revocation, loading user %s from the database", user_id)
+            user = super().get_user(validated_token)
+            check_not_revoked(validated_token, _epoch(user.tokens_revoked_at))
+            return user
+        check_not_revoked(validated_token, mark)
+
+        if "username" in validated_token and "is_admin" in validated_token:
+            return _build_user({
+                "id": user_id,
+                "username": validated_token["username"],
+                "is_admin": validated_token["is_admin"],
+                # Deactivation revokes the tokens
+                "is_active": True,
+            })
+
+        # Tokens issued without our claims
+        try:
+            user = load_user(user_id)
+        except User.DoesNotExist as e:
+            raise AuthenticationFailed("User not found", code="user_not_found") from e
+        if not user.is_active:
+            raise AuthenticationFailed("User is inactive", code="user_inactive")
+        return user
@@ -2,4 +2,6 @@ from django.db import models
 from django.contrib.auth.models import AbstractUser
 
 class User(AbstractUser):
-    is_admin = models.BooleanField(default=False)
\ No newline at end of file
+    is_admin = models.BooleanField(default=False)
+    # Tokens issued up to this moment are rejected (users/authentication.py)
+    tokens_revoked_at = models.DateTimeField(null=True, blank=True, editable=False)
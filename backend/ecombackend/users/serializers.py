@@ -1,7 +1,18 @@
+import logging
+
+from django.db import DatabaseError
+from redis.exceptions import RedisError
 from rest_framework import serializers
 from .models import User
 from django.contrib.auth.hashers import make_password
-from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+from .authentication import check_not_revoked, revoked_at, revoked_in_db
+from cart import guest
+
+logger = logging.getLogger(__name__)
+
 
 class RegisterSerializer(serializers.ModelSerializer):
     class Meta:
@@ -40,4 +51,29 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
             'email': self.user.email,
             'is_admin': self.user.is_admin,
         }
-        return data
\ No newline at end of file
+
+        # Carry over what the user put in the cart before logging in
+        request = self.context.get("request")
+        token = guest.token_from(request) if request else None
+        if token:
+            try:
+                data['cart'] = {'merged_items': guest.merge_into(self.user, token)}
+            except (RedisError, DatabaseError):
+                # The guest cart is kept, the next login merges it
+                logger.exception("Could not merge guest cart %s", token)
+        return data
+
+
+class CustomTokenRefreshSerializer(TokenRefreshSerializer):
+    def validate(self, attrs):
+        # No new access tokens for revoked sessions (deactivated, demoted, password changed)
+        refresh = RefreshToken(attrs["refresh"])
+        user_id = refresh.payload.get(api_settings.USER_ID_CLAIM)
+        if user_id:
+            try:
+                mark = revoked_at(user_id)
+            except RedisError:
+                logger.exception("Could not check token revocation in the cache")
+                mark = revoked_in_db(user_id)
+            check_not_revoked(refresh, mark)
+        return super().validate(attrs)
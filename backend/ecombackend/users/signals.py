@@ -0,0 +1,41 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .authentication import forget_user, revoke_tokens
+from .models import User
+
+# Changes that make the claims of issued tokens wrong or unwanted
+REVOKING_FIELDS = ("is_active", "is_admin", "password")
+
+
+@receiver(pre_save, sender=User)
+def note_revoking_changes(sender, instance, update_fields=None, **kwargs):
+    instance._revoke_tokens = False
+    if instance._state.adding or instance.pk is None:
+        return
+    if update_fields is not None and not set(update_fields) & set(REVOKING_FIELDS):
+        # e.g. the last_login update on every login
+        return
+
+    previous = User.objects.filter(pk=instance.pk).values(*REVOKING_FIELDS).first()
+    if previous is None:
+        return
+    instance._revoke_tokens = (
+        (previous["is_active"] and not instance.is_active)
+        or (previous["is_admin"] and not instance.is_admin)
+        or previous["password"] != instance.password
+    )
+
+
+@receiver(post_save, sender=User)
+def revoke_or_forget(sender, instance, created, **kwargs):
+    if getattr(instance, "_revoke_tokens", False):
+        instance._revoke_tokens = False
+        revoke_tokens(instance)
+    elif not created:
+        forget_user(instance.pk)
+
+
+@receiver(post_delete, sender=User)
+def revoke_on_delete(sender, instance, **kwargs):
+    revoke_tokens(instance)
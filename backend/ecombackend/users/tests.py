@@ -1,3 +1,70 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.test import TestCase, override_settings
+from redis.exceptions import RedisError
+from rest_framework.test import APIClient
+
+from ecombackend import throttling
+from ecombackend.testing import require_redis, reset_throttles
+from .models import User
+
+THROTTLED = {
+    **settings.REST_FRAMEWORK,
+    "DEFAULT_THROTTLE_RATES": {**settings.REST_FRAMEWORK["DEFAULT_THROTTLE_RATES"], "login": "2/min"},
+}
+
+
+@override_settings(REST_FRAMEWORK=THROTTLED)
+
+
+class LoginThrottleTests(TestCase):
+
+    def setUp(self):
+        reset_throttles()
+        self.addCleanup(reset_throttles)
+        User.objects.create_user(username="alice", password="correct horse")
+        self.client = APIClient()
+
+    def login(self, password="wrong", ip="10.0.0.1"):
+        return self.client.post(
+            "/api/users/login/", {"username": "alice", "password": password}, format="json", REMOTE_ADDR=ip,
+        )
+
+    def test_login_is_throttled_per_client_ip(self):
+        require_redis(self, throttling.client())
+        self.assertEqual([self.login().status_code for _ in range(2)], [401, 401])
+
+        response = self.login(password="correct horse")
+        self.assertEqual(response.status_code, 429)
+        self.assertGreater(int(response["Retry-After"]), 0)
+
+        self.assertEqual(self.login(password="correct horse", ip="10.0.0.2").status_code, 200)
+
+    def test_requests_go_through_without_redis(self):
+        with mock.patch.object(throttling, "take", side_effect=RedisError("down")):
+            with self.assertLogs("ecombackend.throttling", "ERROR"):
+                self.assertEqual([self.login().status_code for _ in range(4)], [401] * 4)
+
+
+class TokenBucketTests(TestCase):
+
+    def setUp(self):
+        require_redis(self, throttling.client())
+        self.key = f"{throttling.KEY_PREFIX}:test:bucket"
+        throttling.client().delete(self.key)
+        self.addCleanup(throttling.client().delete, self.key)
+
+    def test_bucket_holds_capacity_tokens(self):
+        # One token back every 1000 s
+        results = [throttling.take(self.key, 2, 0.001) for _ in range(3)]
+
+        self.assertEqual([allowed for allowed, _ in results], [True, True, False])
+        self.assertAlmostEqual(results[2][1], 1000, delta=1)
+
+    def test_bucket_refills_at_its_rate(self):
+        self.assertTrue(throttling.take(self.key, 1, 1000)[0])
+        # A millisecond is enough for the next token
+        throttling.client().hset(self.key, "ts", float(throttling.client().hget(self.key, "ts")) - 0.01)
+
+        self.assertTrue(throttling.take(self.key, 1, 1000)[0])
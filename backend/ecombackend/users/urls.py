@@ -1,11 +1,8 @@
 from django.urls import path
-from .views import RegisterView, CustomTokenObtainPairView
-from rest_framework_simplejwt.views import (
-    TokenRefreshView,
-)
+from .views import RegisterView, CustomTokenObtainPairView, CustomTokenRefreshView
 
 urlpatterns = [
     path("register/",RegisterView.as_view(),name="register"),
     path("login/",CustomTokenObtainPairView.as_view(),name="login"),
-    path("refresh/",TokenRefreshView.as_view(),name="refresh")
+    path("refresh/",CustomTokenRefreshView.as_view(),name="refresh")
 ]
\ No newline at end of file
@@ -15,7 +15,10 @@ export default function ProductCard({ data, index = 0 }) {
     >
       <div className="relative overflow-hidden aspect-square bg-gradient-to-br from-gray-50 to-gray-100">
         <motion.img
-          src={data.image}
+          src={data.image_variants?.thumbnail || data.image}
+          srcSet={data.image_variants?.srcset}
+          sizes="(min-width: 1024px) 25vw, (min-width: 640px) 50vw, 100vw"
+          loading="lazy"
           alt={data.title}
           className="w-full h-full object-contain mix-blend-multiply p-4"
           whileHover={{ scale: 1.1 }}
@@ -4,7 +4,12 @@ import API from "../api/axiosClient";
 
 export default function Orders() {
   const [orders, setOrders] = useState([]);
+  const [nextPage, setNextPage] = useState(null);
   const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
+  // The list only has item counts; address and lines come from orders/<id>/ when opened
+  const [details, setDetails] = useState({});
+  const [expanded, setExpanded] = useState(null);
 
   useEffect(() => {
     loadOrders();
@@ -12,8 +17,9 @@ export default function Orders() {
 
   const loadOrders = async () => {
     try {
-      const res = await API.get("/orders/amy/");
+      const res = await API.get("orders/my/");
       setOrders(res.data.results || res.data || []);
+      setNextPage(res.data.next || null);
     } catch (err) {
       console.error("Failed to load orders", err);
     } finally {
@@ -21,6 +27,34 @@ export default function Orders() {
     }
   };
 
+  const loadMore = async () => {
+    setLoadingMore(true);
+    try {
+      const res = await API.get(nextPage);
+      setOrders((current) => [...current, ...(res.data.results || [])]);
+      setNextPage(res.data.next || null);
+    } catch (err) {
+      console.error("Failed to load more orders", err);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
+  const toggleDetails = async (orderId) => {
+    if (expanded === orderId) {
+      setExpanded(null);
+      return;
+    }
+    setExpanded(orderId);
+    if (details[orderId]) return;
+    try {
+      const res = await API.get(`orders/${orderId}/`);
+      setDetails((current) => ({ ...current, [orderId]: res.data }));
+    } catch (err) {
+      console.error("Failed to load order details", err);
+    }
+  };
+
   const getStatusColor = (status) => {
     switch (status?.toLowerCase()) {
       case "completed":
@@ -90,37 +124,68 @@ export default function Orders() {
                   </div>
                 </div>
 
-                <div className="bg-gray-50 rounded-lg p-4 mb-4">
-                  <p className="text-sm text-gray-700 mb-1">
-                    <strong className="text-gray-800">📍 Shipping Address:</strong> {order.shipping_address}
-                  </p>
-                  <p className="text-sm text-gray-700">
-                    <strong className="text-gray-800">💳 Payment Method:</strong>{" "}
-                    {order.payment_method?.replace("_", " ").toUpperCase() || "N/A"}
-                  </p>
+                <div className="bg-gray-50 rounded-lg p-4 mb-4 flex flex-col sm:flex-row sm:justify-between sm:items-center gap-2">
+                  <div>
+                    <p className="text-sm text-gray-700 mb-1">
+                      <strong className="text-gray-800">🧾 Items:</strong> {order.item_count ?? 0}
+                    </p>
+                    <p className="text-sm text-gray-700">
+                      <strong className="text-gray-800">💳 Payment Method:</strong>{" "}
+                      {order.payment_method?.replace("_", " ").toUpperCase() || "N/A"}
+                    </p>
+                  </div>
+                  <button
+                    onClick={() => toggleDetails(order.id)}
+                    className="text-indigo-600 hover:text-indigo-800 font-semibold text-sm"
+                  >
+                    {expanded === order.id ? "Hide details ▲" : "View details ▼"}
+                  </button>
                 </div>
 
-                <div className="mt-6">
-                  <h4 className="font-bold text-lg text-gray-800 mb-4">Order Items:</h4>
-                  <div className="space-y-3">
-                    {order.items?.map((item, idx) => (
-                      <div
-                        key={idx}
-                        className="flex justify-between items-center bg-gray-50 rounded-lg p-3"
-                      >
-                        <div className="flex-1">
-                          <span className="font-semibold text-gray-800">
-                            {item.product?.title || item.product_name}
-                          </span>
-                          <span className="text-gray-600 ml-2">x {item.quantity}</span>
+                {expanded === order.id && (
+                  <div className="mt-6">
+                    {!details[order.id] ? (
+                      <p className="text-sm text-gray-500">Loading details...</p>
+                    ) : (
+                      <>
+                        <p className="text-sm text-gray-700 mb-4">
+                          <strong className="text-gray-800">📍 Shipping Address:</strong>{" "}
+                          {details[order.id].shipping_address || "N/A"}
+                        </p>
+                        <h4 className="font-bold text-lg text-gray-800 mb-4">Order Items:</h4>
+                        <div className="space-y-3">
+                          {details[order.id].items?.map((item, idx) => (
+                            <div
+                              key={idx}
+                              className="flex justify-between items-center bg-gray-50 rounded-lg p-3"
+                            >
+                              <div className="flex-1">
+                                <span className="font-semibold text-gray-800">
+                                  {item.product?.title || item.product_name}
+                                </span>
+                                <span className="text-gray-600 ml-2">x {item.quantity}</span>
+                              </div>
+                              <span className="font-bold text-gray-800">₹{item.price * item.quantity}</span>
+                            </div>
+                          ))}
                         </div>
-                        <span className="font-bold text-gray-800">₹{item.price * item.quantity}</span>
-                      </div>
-                    ))}
+                      </>
+                    )}
                   </div>
-                </div>
+                )}
               </div>
             ))}
+            {nextPage && (
+              <div className="text-center">
+                <button
+                  onClick={loadMore}
+                  disabled={loadingMore}
+                  className="bg-indigo-600 hover:bg-indigo-700 text-white px-6 py-3 rounded-lg font-semibold transition-all duration-200 disabled:opacity-50"
+                >
+                  {loadingMore ? "Loading..." : "Load more orders"}
+                </button>
+              </div>
+            )}
           </div>
         )}
       </div>